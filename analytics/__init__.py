@@ -0,0 +1,2 @@
+# analytics package initializer
+# Offline queries over the Parquet snapshot archive.
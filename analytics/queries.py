@@ -0,0 +1,125 @@
+from __future__ import annotations
+from datetime import date, datetime
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+except ImportError:  # optional, like the archive itself
+    pa = pc = ds = None
+
+'''
+    Analytical queries over the Parquet snapshot archive (ingest.archive).
+
+    Every query prunes partitions by store and scrape date before any file is
+    opened, reads only the columns it needs, and filters product keys and
+    unit prices inside the scan. Aggregation runs in Arrow, so a year of
+    history never goes through Python row by row.
+
+    Result shapes match the repository's DB queries, which is what lets
+    ProductRepository answer from either source.
+'''
+
+RESOLUTIONS = ("day", "week")
+
+
+def _filter(product_keys=None, stores=None, start: date | None = None, end: date | None = None):
+    # store / scrape_date are partition fields: pyarrow skips whole directories on them
+    expr = pc.field("price_per_unit") > 0
+    if stores:
+        expr &= pc.field("store").isin(list(stores))
+    if start is not None:
+        expr &= pc.field("scrape_date") >= pa.scalar(_as_date(start), pa.date32())
+    if end is not None:
+        expr &= pc.field("scrape_date") <= pa.scalar(_as_date(end), pa.date32())
+    if product_keys is not None:
+        expr &= pc.field("product_key").isin(list(product_keys))
+    return expr
+
+
+def _as_date(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def scan(archive, columns: list[str], product_keys=None, stores=None,
+         start: date | None = None, end: date | None = None):
+    """Pruned, projected scan of the archive as an Arrow table."""
+    if not archive.exists():
+        return pa.table({name: pa.array([], type=archive.dataset().schema.field(name).type) for name in columns})
+    return archive.dataset().to_table(columns=columns, filter=_filter(product_keys, stores, start, end))
+
+
+def _bucket(scrape_date, resolution: str):
+    if resolution == "day":
+        return scrape_date
+    # Monday of the week; day 0 (1970-01-01) was a Thursday
+    days = scrape_date.cast(pa.int32()).to_numpy(zero_copy_only=False)
+    return pa.array(days - (days + 3) % 7, type=pa.int32()).cast(pa.date32())
+
+
+def price_history(archive, product_keys=None, resolution: str = "day", stores=None,
+                  start: date | None = None, end: date | None = None) -> list[dict]:
+    """Same rows as ProductRepository.get_price_history, computed from the archive."""
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Unknown resolution {resolution!r}; expected one of {list(RESOLUTIONS)}")
+
+    table = scan(archive, ["store", "scrape_date", "price_per_unit"], product_keys, stores, start, end)
+    table = table.append_column("bucket", _bucket(table["scrape_date"].combine_chunks(), resolution))
+    grouped = table.group_by(["store", "bucket"]).aggregate([
+        ("price_per_unit", "mean"),
+        ("price_per_unit", "min"),
+        ("price_per_unit", "max"),
+        ("price_per_unit", "count"),
+    ]).sort_by([("bucket", "ascending"), ("store", "ascending")])
+
+    return [
+        {
+            "store_name": r["store"],
+            "scraped_at": datetime.combine(r["bucket"], datetime.min.time()),
+            "price_per_unit": r["price_per_unit_mean"],
+            "min_price_per_unit": r["price_per_unit_min"],
+            "max_price_per_unit": r["price_per_unit_max"],
+            "samples": r["price_per_unit_count"],
+        }
+        for r in grouped.to_pylist()
+    ]
+
+
+def store_comparison(archive, product_keys=None, start: date | None = None,
+                     end: date | None = None) -> list[dict]:
+    """Per-store unit-price summary over a date range, cheapest store first."""
+    table = scan(archive, ["store", "product_key", "price_per_unit"], product_keys, None, start, end)
+    grouped = table.group_by("store").aggregate([
+        ("price_per_unit", "mean"),
+        ("price_per_unit", "min"),
+        ("price_per_unit", "max"),
+        ("price_per_unit", "count"),
+        ("product_key", "count_distinct"),
+    ]).sort_by([("price_per_unit_mean", "ascending")])
+
+    return [
+        {
+            "store_name": r["store"],
+            "price_per_unit": r["price_per_unit_mean"],
+            "min_price_per_unit": r["price_per_unit_min"],
+            "max_price_per_unit": r["price_per_unit_max"],
+            "samples": r["price_per_unit_count"],
+            "products": r["product_key_count_distinct"],
+        }
+        for r in grouped.to_pylist()
+    ]
+
+
+def daily_series(archive, product_keys=None, start: date | None = None,
+                 end: date | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Mean unit price per (product_key, day): forecasting inputs as NumPy arrays."""
+    table = scan(archive, ["product_key", "scrape_date", "price_per_unit"], product_keys, None, start, end)
+    grouped = table.group_by(["product_key", "scrape_date"]).aggregate([("price_per_unit", "mean")])
+    grouped = grouped.sort_by([("product_key", "ascending"), ("scrape_date", "ascending")])
+    return (
+        grouped["product_key"].to_numpy(zero_copy_only=False),
+        grouped["scrape_date"].cast(pa.int32()).to_numpy(zero_copy_only=False),
+        grouped["price_per_unit_mean"].to_numpy(zero_copy_only=False),
+    )
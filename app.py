@@ -1,7 +1,6 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
-from db.session import SessionLocal
 from db.repository import ProductRepository
 
 # ---------------------
@@ -24,20 +23,63 @@ def load_css(filepath: str):
 load_css("web/css/main.css")
 
 # ---------------------
-# DB Init
+# DB Init (shared by every session and rerun)
 # ---------------------
-db = SessionLocal()
-repo = ProductRepository(db)
+# Query results are cached per (product, query, data version). The ingest
+# pipeline bumps the data version on each committed batch, so new data shows
+# up within DATA_VERSION_TTL seconds; TTL/max_entries bound the cache.
+DATA_VERSION_TTL = 5
+QUERY_CACHE_TTL = 600
+QUERY_CACHE_ENTRIES = 256
+
+@st.cache_resource
+def get_session_factory():
+    # Imported here so the engine and its pool are built once per process. Read-only
+    # pool: each query runs in one snapshot and never waits for ingest (db.concurrency)
+    from db.session import ReadSessionLocal
+    return ReadSessionLocal
+
+def run_query(fn):
+    db = get_session_factory()()
+    try:
+        return fn(ProductRepository(db))
+    finally:
+        db.close()
+
+@st.cache_data(ttl=DATA_VERSION_TTL, show_spinner=False)
+def current_data_version() -> int:
+    return run_query(lambda repo: repo.get_data_version())
+
+@st.cache_data(ttl=QUERY_CACHE_TTL, max_entries=QUERY_CACHE_ENTRIES, show_spinner=False)
+def load_summary(product: str, query: str, data_version: int) -> dict:
+    return run_query(lambda repo: repo.get_ranking_summary(product, query))
+
+@st.cache_data(ttl=QUERY_CACHE_TTL, max_entries=QUERY_CACHE_ENTRIES, show_spinner=False)
+def load_page(product: str, query: str | None, limit: int, after, data_version: int):
+    rows, cursor = run_query(lambda repo: repo.get_ranking_page(product, query, limit=limit, after=after))
+    return pd.DataFrame(rows), cursor
+
+@st.cache_data(ttl=QUERY_CACHE_TTL, max_entries=QUERY_CACHE_ENTRIES, show_spinner=False)
+def load_history(product: str, resolution: str, data_version: int) -> list[dict]:
+    return run_query(lambda repo: repo.get_price_history(product, resolution=resolution))
+
+@st.cache_data(ttl=QUERY_CACHE_TTL, max_entries=QUERY_CACHE_ENTRIES, show_spinner=False)
+def load_forecast(product: str, horizon: int, data_version: int) -> list[dict]:
+    # Reads stored model state only; fitting happens in the ingest pipeline
+    return run_query(lambda repo: repo.get_price_forecast(product, horizon=horizon))
+
+@st.cache_data(ttl=QUERY_CACHE_TTL, max_entries=QUERY_CACHE_ENTRIES, show_spinner=False)
+def load_matches(product: str, data_version: int) -> list[dict]:
+    return run_query(lambda repo: repo.get_matched_products(product))
+
+@st.cache_data(ttl=QUERY_CACHE_TTL, show_spinner=False)
+def load_categories(data_version: int) -> list[str]:
+    return [row["category"] for row in run_query(lambda repo: repo.get_categories())]
 
 # ---------------------
-# Product List
+# Product List (categories assigned at ingest)
 # ---------------------
-PRODUCT_OPTIONS = [
-    "Toilet Paper",
-    "Protein Bar",
-    "Paper Towel",
-    "Chicken Breast",
-]
+PRODUCT_OPTIONS = load_categories(current_data_version())
 
 # ---------------------
 # Helper: store color class
@@ -73,6 +115,14 @@ st.markdown(
 # ---------------------
 # Product Selection & Search
 # ---------------------
+if not PRODUCT_OPTIONS:
+    st.warning("No categorised products yet.")
+    st.info(
+        "💡 **Tip:** Ingest data with `python scripts/run_ingest_pipeline.py dataset/`, or add "
+        "`--rebuild-latest --rebuild-categories` to classify products ingested before categories existed."
+    )
+    st.stop()
+
 filter_col1, filter_col2 = st.columns([2, 3])
 
 with filter_col1:
@@ -92,42 +142,36 @@ with filter_col2:
 # ---------------------
 # Load Data
 # ---------------------
-raw_data = repo.get_latest_prices_by_product(selected_product)
+data_version = current_data_version()
+summary = load_summary(selected_product, search_query, data_version)
 
-if not raw_data:
+if summary["total"] == 0:
     st.warning(f"No data available for **{selected_product}**.")
-    db.close()
     st.stop()
 
-df = pd.DataFrame(raw_data)
-df = df[df["price_per_unit"] > 0].copy()
-
-# Apply keyword filter if user typed something
-if search_query:
-    mask = df["product_name"].str.lower().str.contains(search_query.lower(), na=False)
-    if mask.any():
-        df = df[mask].copy()
-
-if df.empty:
+if summary["count"] == 0:
     st.warning("No valid price data available for comparison.")
-    db.close()
     st.stop()
 
-df = df.sort_values("price_per_unit").reset_index(drop=True)
+# The keyword filter only applies if it matches something
+effective_query = search_query if summary["query_applied"] else None
+
+TOP_N = 10
+MORE_PAGE_SIZE = 50
+
+# First paint only transfers the top rows; the rest is paged on demand
+df, top_cursor = load_page(selected_product, effective_query, TOP_N, None, data_version)
 
 # ---------------------
 # Compute Stats
 # ---------------------
 best = df.iloc[0]
-worst = df.iloc[-1]
 unit_label = best["normalized_unit"] or "unit"
-total_products = len(df)
+total_products = summary["count"]
 
-# Max savings: use only rows with valid price_per_unit (not None, NaN, or 0)
-valid_prices = df["price_per_unit"].dropna()
-valid_prices = valid_prices[valid_prices > 0]
-if len(valid_prices) >= 2:
-    savings_pct = round((1 - valid_prices.min() / valid_prices.max()) * 100)
+# Max savings: bounds come from the same aggregate query (price_per_unit > 0 only)
+if total_products >= 2:
+    savings_pct = round((1 - summary["min_price_per_unit"] / summary["max_price_per_unit"]) * 100)
 else:
     savings_pct = 0
 
@@ -151,10 +195,11 @@ st.markdown(metric_html, unsafe_allow_html=True)
 # ---------------------
 # Tabs
 # ---------------------
-tab_compare, tab_trend, tab_forecast = st.tabs([
+tab_compare, tab_trend, tab_forecast, tab_matches = st.tabs([
     "🏆  Unit Price Comparison",
     "📈  Price Trend",
     "🔮  Price Forecast",
+    "🔗  Same Product",
 ])
 
 # =====================
@@ -188,9 +233,6 @@ with tab_compare:
     st.markdown('<p class="section-title">All options ranked</p>', unsafe_allow_html=True)
 
     best_price = df.iloc[0]["price_per_unit"]
-    worst_price = df.iloc[-1]["price_per_unit"]
-
-    TOP_N = 10
 
     def build_table_rows(data, start_rank=1):
         rows = ""
@@ -198,7 +240,7 @@ with tab_compare:
             rank = start_rank + idx
             rank_cls = "best" if rank == 1 else ""
             pill_cls = store_class(row["store_name"])
-            price_cls = "price-best" if rank == 1 else ("price-worst" if rank == len(df) else "")
+            price_cls = "price-best" if rank == 1 else ("price-worst" if rank == total_products else "")
 
             if rank == 1:
                 vs_text = "—"
@@ -242,13 +284,21 @@ with tab_compare:
     top_table_html = table_header + f'<tbody>{top_rows}</tbody></table>'
     st.markdown(top_table_html, unsafe_allow_html=True)
 
-    # Remaining rows in expander
-    if len(df) > TOP_N:
-        df_rest = df.iloc[TOP_N:].copy()
-        with st.expander(f"Show more ({len(df_rest)} more options)"):
+    # Remaining rows, fetched page by page only when asked for
+    if top_cursor is not None:
+        remaining = total_products - TOP_N
+        if st.toggle(f"Show more ({remaining} more options)"):
+            pages_key = f"more_pages:{selected_product}:{effective_query}"
+            pages = st.session_state.setdefault(pages_key, 1)
+            df_rest, more_cursor = load_page(
+                selected_product, effective_query, MORE_PAGE_SIZE * pages, top_cursor, data_version
+            )
             rest_rows = build_table_rows(df_rest, start_rank=TOP_N + 1)
             rest_table_html = table_header + f'<tbody>{rest_rows}</tbody></table>'
             st.markdown(rest_table_html, unsafe_allow_html=True)
+            if more_cursor is not None and st.button("Load more"):
+                st.session_state[pages_key] = pages + 1
+                st.rerun()
 
     # ── Horizontal Bar Chart — price per unit comparison ──
     st.markdown('<p class="section-title">Price per unit comparison</p>', unsafe_allow_html=True)
@@ -315,15 +365,22 @@ with tab_compare:
 # TAB: Price Trend
 # =====================
 with tab_trend:
+    resolution = st.radio(
+        "Resolution",
+        options=["day", "week"],
+        format_func=lambda r: "Daily" if r == "day" else "Weekly",
+        horizontal=True,
+        label_visibility="collapsed",
+    )
+
     # Try to load historical data if available
     has_history = False
     try:
-        if hasattr(repo, "get_price_history"):
-            history_data = repo.get_price_history(selected_product)
-            if history_data:
-                hist_df = pd.DataFrame(history_data)
-                if not hist_df.empty and "scraped_at" in hist_df.columns:
-                    has_history = True
+        history_data = load_history(selected_product, resolution, data_version)
+        if history_data:
+            hist_df = pd.DataFrame(history_data)
+            if not hist_df.empty and "scraped_at" in hist_df.columns:
+                has_history = True
     except Exception:
         has_history = False
 
@@ -405,9 +462,9 @@ with tab_trend:
         )
 
         st.info(
-            "💡 **Tip:** To enable this feature, add a `get_price_history(product_name)` method "
-            "to your `ProductRepository` that returns rows with `store_name`, `price_per_unit`, "
-            "and `scraped_at` columns."
+            "💡 **Tip:** Trends are read from the daily/weekly price rollups that the ingest "
+            "pipeline maintains. For data ingested before rollups existed, run "
+            "`python scripts/run_ingest_pipeline.py dataset/ --rebuild-rollups`."
         )
 
 
@@ -415,16 +472,152 @@ with tab_trend:
 # TAB: Price Forecast
 # =====================
 with tab_forecast:
-    st.markdown(
-        '<div class="trend-placeholder">'
-        '<p style="font-size:2rem;margin:0 0 0.5rem;">🔮</p>'
-        '<p style="font-weight:600;margin:0 0 0.5rem;">Price forecast coming soon</p>'
-        '<p style="font-size:0.85rem;margin:0;">Time-series forecasting models will be added<br>'
-        'after sufficient historical data is collected.</p>'
-        '</div>',
-        unsafe_allow_html=True,
+    horizon = st.radio(
+        "Horizon",
+        options=[7, 14, 28],
+        index=1,
+        format_func=lambda days: f"{days} days",
+        horizontal=True,
+        label_visibility="collapsed",
     )
 
+    try:
+        forecast_data = load_forecast(selected_product, horizon, data_version)
+    except Exception:
+        forecast_data = []
+
+    if forecast_data:
+        fc_df = pd.DataFrame(forecast_data)
+        fc_df["forecast_date"] = pd.to_datetime(fc_df["forecast_date"])
+        try:
+            recent_df = pd.DataFrame(load_history(selected_product, "day", data_version))
+        except Exception:
+            recent_df = pd.DataFrame()
+
+        fig_forecast = go.Figure()
+        store_colors = {
+            "Walmart": "#059669",
+            "Target": "#ef4444",
+            "Amazon": "#f59e0b",
+        }
+
+        for store in fc_df["store_name"].unique():
+            color = store_colors.get(store, "#6b7280")
+            store_fc = fc_df[fc_df["store_name"] == store].sort_values("forecast_date")
+            if not recent_df.empty:
+                store_hist = recent_df[recent_df["store_name"] == store].copy()
+                store_hist["scraped_at"] = pd.to_datetime(store_hist["scraped_at"])
+                store_hist = store_hist.sort_values("scraped_at").tail(30)
+                fig_forecast.add_trace(go.Scatter(
+                    x=store_hist["scraped_at"],
+                    y=store_hist["price_per_unit"],
+                    mode="lines",
+                    name=f"{store} (actual)",
+                    line=dict(color=color, width=2.5),
+                ))
+            fig_forecast.add_trace(go.Scatter(
+                x=store_fc["forecast_date"],
+                y=store_fc["price_per_unit"],
+                mode="lines",
+                name=f"{store} (forecast)",
+                line=dict(color=color, width=2.5, dash="dash"),
+            ))
+
+        fig_forecast.update_layout(
+            height=380,
+            margin=dict(l=0, r=20, t=20, b=40),
+            xaxis=dict(showgrid=True, gridcolor="#f3f4f6", title="Date"),
+            yaxis=dict(
+                showgrid=True,
+                gridcolor="#f3f4f6",
+                title=f"Price per {unit_label}",
+                tickprefix="$",
+            ),
+            plot_bgcolor="white",
+            paper_bgcolor="white",
+            font=dict(family="DM Sans", size=12),
+            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="left", x=0),
+            hovermode="x unified",
+        )
+        st.plotly_chart(fig_forecast, use_container_width=True)
+
+        # Cheapest store at the end of the horizon
+        final = fc_df[fc_df["forecast_date"] == fc_df["forecast_date"].max()]
+        cheapest = final.loc[final["price_per_unit"].idxmin()]
+        fc1, fc2 = st.columns(2)
+        with fc1:
+            st.metric(f"Cheapest in {horizon} days", cheapest["store_name"])
+        with fc2:
+            st.metric("Forecast unit price", f"${cheapest['price_per_unit']:.4f}")
+    else:
+        st.markdown(
+            '<div class="trend-placeholder">'
+            '<p style="font-size:2rem;margin:0 0 0.5rem;">🔮</p>'
+            '<p style="font-weight:600;margin:0 0 0.5rem;">No forecast yet</p>'
+            '<p style="font-size:0.85rem;margin:0;">Forecasts are fitted after each ingest run<br>'
+            'once daily price rollups exist for this product.</p>'
+            '</div>',
+            unsafe_allow_html=True,
+        )
+
+        st.info(
+            "💡 **Tip:** To fit forecasts for data that is already in the DB, run "
+            "`python scripts/run_ingest_pipeline.py dataset/ --refit-forecasts`."
+        )
+
+
+
+# =====================
+# TAB: Same Product
+# =====================
+with tab_matches:
+    try:
+        match_groups = load_matches(selected_product, data_version)
+    except Exception:
+        match_groups = []
+
+    if match_groups:
+        st.markdown(
+            '<p class="section-title">Sold at more than one store</p>',
+            unsafe_allow_html=True,
+        )
+        for group in match_groups:
+            label = f"{group['title']} — {group['stores']} stores"
+            if group["savings_pct"]:
+                label += f" · save {group['savings_pct']}%"
+            with st.expander(label):
+                offers_df = pd.DataFrame(group["offers"])[
+                    ["store_name", "product_name", "price", "price_per_unit", "product_url"]
+                ]
+                st.dataframe(
+                    offers_df,
+                    hide_index=True,
+                    use_container_width=True,
+                    column_config={
+                        "store_name": "Store",
+                        "product_name": "Title",
+                        "price": st.column_config.NumberColumn("Price", format="$%.2f"),
+                        "price_per_unit": st.column_config.NumberColumn(
+                            f"Price per {unit_label}", format="$%.4f"
+                        ),
+                        "product_url": st.column_config.LinkColumn("Link", display_text="View"),
+                    },
+                )
+    else:
+        st.markdown(
+            '<div class="trend-placeholder">'
+            '<p style="font-size:2rem;margin:0 0 0.5rem;">🔗</p>'
+            '<p style="font-weight:600;margin:0 0 0.5rem;">No cross-store matches yet</p>'
+            '<p style="font-size:0.85rem;margin:0;">Matches are found at ingest time<br>'
+            'when the pipeline runs with --match-products.</p>'
+            '</div>',
+            unsafe_allow_html=True,
+        )
+
+        st.info(
+            "💡 **Tip:** To match products already in the DB, run "
+            "`python scripts/run_ingest_pipeline.py dataset/ --rebuild-matches`."
+        )
 
 # ---------------------
 # Footer
@@ -435,8 +628,3 @@ st.markdown(
     '</div>',
     unsafe_allow_html=True,
 )
-
-# ---------------------
-# Cleanup
-# ---------------------
-db.close()
\ No newline at end of file
@@ -0,0 +1,459 @@
+from __future__ import annotations
+import os
+from abc import ABC, abstractmethod
+
+from sqlalchemy import and_, bindparam, func, insert, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from db.models import (Base, DimProduct, DimStatus, DimStore, DimUnit, PriceFact, PriceInterval, Product, Scrape,
+                       ScrapeDay)
+
+'''
+    Normalized snapshot history layouts, instead of one wide row of repeated
+    strings per snapshot (the "legacy" `products` table).
+
+    Both share the dimension tables:
+
+        dim_stores / dim_units / dim_statuses   (id, name)
+        dim_products   (id, product_key, store_id, title, url, unit, category)
+
+    "compact": every observation is a numeric fact of its scrape.
+
+        scrapes        (id, scraped_at)           one row per ingest batch
+        price_facts    (scrape_id, product_id, price, qty, unit_id, ppu, status_id)
+
+    "intervals": only changes are stored. A product's run of scrape days with
+    the same price / quantity / unit / status is one row; ingest extends the
+    run while nothing changes and starts a new one when something does.
+
+        scrape_days      (id, store_id, day, scraped_at)   days each store was scraped
+        price_intervals  (product_id, valid_from, valid_to, price, qty, unit_id, ppu, status_id)
+
+    Compatibility: `products` becomes a view over these tables with the legacy
+    columns, so every reader of db.models.Product keeps working unchanged. In
+    the interval layout the view expands each interval back into one point
+    per day its store was scraped between valid_from and valid_to, so history
+    is day-grained (the last price seen on a day wins) and a product missing
+    from some of its store's scrapes inside an unchanged run still gets points
+    for them. Writers come from history_writer() (ProductRepository does
+    this itself).
+
+    Titles, urls and unit text are kept per product, not per snapshot: the view
+    shows a product's newest values on all of its snapshots, and a product
+    seen twice in one scrape keeps its last row.
+
+    New databases get the compact layout unless DB_HISTORY_LAYOUT says
+    otherwise (legacy / compact / intervals); existing ones keep theirs until
+    scripts/migrate_compact.py converts them.
+'''
+
+LEGACY = "legacy"
+COMPACT = "compact"
+INTERVALS = "intervals"
+LAYOUTS = (LEGACY, COMPACT, INTERVALS)
+
+DIMENSION_TABLES = [t.__table__ for t in (DimStore, DimUnit, DimStatus, DimProduct)]
+LAYOUT_TABLES = {
+    LEGACY: [Product.__table__],
+    COMPACT: [*DIMENSION_TABLES, Scrape.__table__, PriceFact.__table__],
+    INTERVALS: [*DIMENSION_TABLES, ScrapeDay.__table__, PriceInterval.__table__],
+}
+HISTORY_TABLES = [Product.__table__, *DIMENSION_TABLES, Scrape.__table__, PriceFact.__table__,
+                  ScrapeDay.__table__, PriceInterval.__table__]
+
+_HISTORY_VIEW = """
+CREATE VIEW products AS
+SELECT {id} AS id,
+       p.title AS title,
+       f.price AS price,
+       p.unit AS unit,
+       f.qty AS normalized_unit_qty,
+       u.name AS normalized_unit,
+       f.ppu AS price_per_unit,
+       st.name AS price_per_unit_status,
+       s.name AS store,
+       p.url AS url,
+       sc.scraped_at AS timestamp,
+       p.category AS category,
+       f.product_id AS product_ref,
+       sc.id AS scrape_ref
+FROM {facts} f
+JOIN dim_products p ON p.id = f.product_id
+JOIN {points}
+LEFT JOIN dim_stores s ON s.id = p.store_id
+LEFT JOIN dim_units u ON u.id = f.unit_id
+LEFT JOIN dim_statuses st ON st.id = f.status_id
+"""
+
+HISTORY_VIEWS = {
+    COMPACT: _HISTORY_VIEW.format(
+        id="CAST(f.scrape_id AS VARCHAR(20)) || '-' || CAST(f.product_id AS VARCHAR(20))",
+        facts="price_facts",
+        points="scrapes sc ON sc.id = f.scrape_id",
+    ),
+    INTERVALS: _HISTORY_VIEW.format(
+        id="CAST(f.product_id AS VARCHAR(20)) || '-' || CAST(sc.id AS VARCHAR(20))",
+        facts="price_intervals",
+        points="scrape_days sc ON sc.store_id = p.store_id AND sc.day BETWEEN f.valid_from AND f.valid_to",
+    ),
+}
+
+# Product keys per IN (...) lookup of dimension ids
+DIM_LOOKUP_BATCH = 2000
+
+# Fields that start a new interval when they change (ppu follows from price / qty)
+INTERVAL_FIELDS = ("price", "qty", "unit_id", "status_id")
+_FACT_FIELDS = ("price", "qty", "unit_id", "ppu", "status_id")
+
+_INSERT_IGNORE = {
+    "sqlite": lambda table: sqlite.insert(table).on_conflict_do_nothing(),
+    "postgresql": lambda table: postgresql.insert(table).on_conflict_do_nothing(),
+}
+_UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+# engine url -> layout
+_layouts: dict[str, str] = {}
+
+
+def create_layout_tables(engine, layout: str):
+    Base.metadata.create_all(bind=engine, tables=LAYOUT_TABLES[layout])
+
+
+def create_history_view(connection, layout: str = COMPACT):
+    connection.exec_driver_sql(HISTORY_VIEWS[layout])
+
+
+def ensure_history_layout(engine, default: str | None = None) -> str:
+    """The history layout of this database, creating it for a new one; returns LEGACY, COMPACT or INTERVALS."""
+    key = str(engine.url)
+    if key in _layouts:
+        return _layouts[key]
+
+    inspector = inspect(engine)
+    if "products" in inspector.get_table_names():
+        layout = LEGACY
+    elif "products" in inspector.get_view_names():
+        layout = INTERVALS if "price_intervals" in inspector.get_table_names() else COMPACT
+    else:
+        layout = default or os.getenv("DB_HISTORY_LAYOUT") or COMPACT
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown history layout {layout!r}; expected one of {', '.join(LAYOUTS)}")
+        create_layout_tables(engine, layout)
+        if layout != LEGACY:
+            with engine.begin() as connection:
+                create_history_view(connection, layout)
+
+    _layouts[key] = layout
+    return layout
+
+
+def history_layout(bind) -> str:
+    return ensure_history_layout(bind)
+
+
+def forget_layout(engine):
+    """Drop the cached layout (after a migration changed it)."""
+    _layouts.pop(str(engine.url), None)
+
+
+def history_writer(db_session, layout: str):
+    """The writer for a normalized layout; None for LEGACY (rows go straight into `products`)."""
+    if layout == COMPACT:
+        return CompactHistoryWriter(db_session)
+    if layout == INTERVALS:
+        return IntervalHistoryWriter(db_session)
+    return None
+
+
+def fact_id(scrape_id: int, product_id: int) -> str:
+    """The `products` view id of a compact fact."""
+    return f"{scrape_id}-{product_id}"
+
+
+def day_number(timestamp) -> int:
+    """Scrape day of a timestamp as stored in scrape_days.day and price_intervals (date ordinal)."""
+    return timestamp.toordinal() if timestamp is not None else 0
+
+
+class HistoryWriter(ABC):
+    """Shared by the normalized layouts: resolves (and creates) dimension ids for snapshot rows.
+
+    Small dimensions (store, unit, status) are cached by name for the writer's
+    lifetime; call forget() after a rollback so ids created in the rolled-back
+    transaction are not reused.
+    """
+
+    def __init__(self, db_session):
+        self.db = db_session
+        self._names = {DimStore: {}, DimUnit: {}, DimStatus: {}}
+
+    def forget(self):
+        for cache in self._names.values():
+            cache.clear()
+
+    @abstractmethod
+    def append(self, rows: list[dict], keys: list[str]) -> int:
+        """Record rows (with their product keys) at their own "timestamp"; sets each row's "id".
+
+        Returns the number of history rows written.
+        """
+
+    def _dimensions(self, rows: list[dict], keys: list[str]):
+        stores = self._name_ids(DimStore, [row["store"] for row in rows])
+        units = self._name_ids(DimUnit, [row["normalized_unit"] for row in rows])
+        statuses = self._name_ids(DimStatus, [row["price_per_unit_status"] for row in rows])
+        products = self._product_ids(rows, keys, stores)
+        return stores, units, statuses, products
+
+    @staticmethod
+    def _fact(row: dict, units: dict, statuses: dict) -> dict:
+        return {
+            "price": row["price"],
+            "qty": row["normalized_unit_qty"],
+            "unit_id": units.get(row["normalized_unit"]),
+            "ppu": row["price_per_unit"],
+            "status_id": statuses.get(row["price_per_unit_status"]),
+        }
+
+    def _upsert(self, table, key_columns: list, rows: list[dict]):
+        """Insert rows, replacing the non-key columns of rows whose key exists."""
+        dialect_insert = _UPSERT_DIALECTS.get(self.db.get_bind().dialect.name)
+        if dialect_insert is None:
+            self.db.execute(insert(table), rows)
+            return
+        statement = dialect_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={c: statement.excluded[c] for c in rows[0] if c not in {k.name for k in key_columns}},
+        )
+        self.db.execute(statement, rows)
+
+    def _name_ids(self, model, names: list) -> dict:
+        cache = self._names[model]
+        missing = {name for name in names if name is not None and name not in cache}
+        if missing:
+            table = model.__table__
+            make = _INSERT_IGNORE.get(self.db.get_bind().dialect.name)
+            self.db.execute(make(table) if make else insert(table), [{"name": name} for name in sorted(missing)])
+            cache.update(self.db.execute(select(table.c.name, table.c.id).where(table.c.name.in_(missing))).all())
+        return cache
+
+    def _product_ids(self, rows: list[dict], keys: list[str], stores: dict) -> dict:
+        """product_key -> dim_products.id, inserting new products and refreshing changed ones."""
+        table = DimProduct.__table__
+        latest = dict(zip(keys, rows))
+        wanted = list(latest)
+        found = {}
+        for offset in range(0, len(wanted), DIM_LOOKUP_BATCH):
+            batch = wanted[offset:offset + DIM_LOOKUP_BATCH]
+            found.update(
+                (r.product_key, r) for r in self.db.execute(
+                    select(table.c.product_key, table.c.id, table.c.title, table.c.url, table.c.unit, table.c.category)
+                    .where(table.c.product_key.in_(batch))
+                )
+            )
+
+        def attributes(row):
+            return {"title": row["title"], "url": row["url"], "unit": row["unit"], "category": row.get("category")}
+
+        new = [key for key in wanted if key not in found]
+        if new:
+            self.db.execute(insert(table), [
+                {"product_key": key, "store_id": stores.get(latest[key]["store"]), **attributes(latest[key])}
+                for key in new
+            ])
+            for offset in range(0, len(new), DIM_LOOKUP_BATCH):
+                batch = new[offset:offset + DIM_LOOKUP_BATCH]
+                found.update(
+                    (r.product_key, r) for r in self.db.execute(
+                        select(table.c.product_key, table.c.id).where(table.c.product_key.in_(batch))
+                    )
+                )
+            new_set = set(new)
+        else:
+            new_set = set()
+
+        # A product's newest title / url / unit / category replace the stored ones
+        changed = []
+        for key, row in latest.items():
+            if key in new_set:
+                continue
+            current, values = found[key], attributes(row)
+            if (current.title, current.url, current.unit, current.category) != tuple(values.values()):
+                changed.append({"dim_id": current.id, **values})
+        if changed:
+            self.db.execute(update(table).where(table.c.id == bindparam("dim_id")), changed)
+
+        return {key: found[key].id for key in wanted}
+
+
+class CompactHistoryWriter(HistoryWriter):
+    """Writes snapshot rows as price_facts of their scrape."""
+
+    def __init__(self, db_session):
+        super().__init__(db_session)
+        self._scrapes = {}
+
+    def forget(self):
+        super().forget()
+        self._scrapes.clear()
+
+    def append(self, rows: list[dict], keys: list[str]) -> int:
+        scrapes = self.scrape_ids({row["timestamp"] for row in rows})
+        return self.write(rows, keys, [scrapes[row["timestamp"]] for row in rows])
+
+    def new_scrape(self, timestamp) -> int:
+        return self.db.execute(insert(Scrape.__table__).values(scraped_at=timestamp)).inserted_primary_key[0]
+
+    def scrape_ids(self, timestamps) -> dict:
+        """timestamp -> scrape id, reusing existing scrapes and creating the rest in time order."""
+        table = Scrape.__table__
+        found = self._scrapes
+        wanted = set(timestamps) - found.keys()
+        if None in wanted:
+            existing = self.db.execute(select(func.max(table.c.id)).where(table.c.scraped_at.is_(None))).scalar()
+            found[None] = existing if existing is not None else self.new_scrape(None)
+        stamped = sorted(ts for ts in wanted if ts is not None)
+
+        def lookup(batch):
+            found.update(self.db.execute(
+                select(table.c.scraped_at, func.max(table.c.id))
+                .where(table.c.scraped_at.in_(batch))
+                .group_by(table.c.scraped_at)
+            ).all())
+
+        for offset in range(0, len(stamped), DIM_LOOKUP_BATCH):
+            lookup(stamped[offset:offset + DIM_LOOKUP_BATCH])
+        missing = [ts for ts in stamped if ts not in found]
+        if missing:
+            # executemany in time order, so ids ascend with time
+            self.db.execute(insert(table), [{"scraped_at": ts} for ts in missing])
+            for offset in range(0, len(missing), DIM_LOOKUP_BATCH):
+                lookup(missing[offset:offset + DIM_LOOKUP_BATCH])
+        return found
+
+    def write(self, rows: list[dict], keys: list[str], scrape_ids) -> int:
+        """Append rows (with their product keys) to scrape_ids (one id, or one per row).
+
+        Sets each row's "id" to its fact id; returns the number of facts written.
+        """
+        if not rows:
+            return 0
+        if isinstance(scrape_ids, int):
+            scrape_ids = [scrape_ids] * len(rows)
+        _, units, statuses, products = self._dimensions(rows, keys)
+
+        # (scrape, product) is the key: a product seen twice in one scrape keeps its last row
+        facts = {}
+        for row, key, scrape_id in zip(rows, keys, scrape_ids):
+            product_id = products[key]
+            row["id"] = fact_id(scrape_id, product_id)
+            facts[(scrape_id, product_id)] = {
+                "scrape_id": scrape_id, "product_id": product_id, **self._fact(row, units, statuses),
+            }
+
+        table = PriceFact.__table__
+        self._upsert(table, [table.c.scrape_id, table.c.product_id], list(facts.values()))
+        return len(facts)
+
+
+class IntervalHistoryWriter(HistoryWriter):
+    """Writes snapshot rows as changes to price_intervals.
+
+    Each row is compared with its product's interval covering (or preceding)
+    the row's scrape day: unchanged values extend that interval's valid_to
+    (no write when it already reaches the day), changed values start a new
+    interval. A change inside an existing interval (an older dump ingested
+    late, or a second price on the same day) splits it, so a product's
+    intervals never overlap.
+    """
+
+    def __init__(self, db_session):
+        super().__init__(db_session)
+        self._days = {}
+
+    def forget(self):
+        super().forget()
+        self._days.clear()
+
+    def append(self, rows: list[dict], keys: list[str]) -> int:
+        if not rows:
+            return 0
+        stores, units, statuses, products = self._dimensions(rows, keys)
+
+        # Last row per (day, product) wins
+        by_day = {}
+        for row, key in zip(rows, keys):
+            day = day_number(row["timestamp"])
+            product_id = products[key]
+            scrape_day = self._scrape_day(stores.get(row["store"]), day, row["timestamp"])
+            row["id"] = f"{product_id}-{scrape_day}"
+            by_day.setdefault(day, {})[product_id] = {"product_id": product_id, **self._fact(row, units, statuses)}
+
+        return sum(self._apply_day(day, by_day[day]) for day in sorted(by_day))
+
+    def _scrape_day(self, store_id: int | None, day: int, timestamp) -> int:
+        key = (store_id, day)
+        if key not in self._days:
+            table = ScrapeDay.__table__
+            found = self.db.execute(
+                select(table.c.id).where(and_(table.c.store_id == store_id, table.c.day == day))
+            ).scalar()
+            if found is None:
+                found = self.db.execute(
+                    insert(table).values(store_id=store_id, day=day, scraped_at=timestamp)
+                ).inserted_primary_key[0]
+            self._days[key] = found
+        return self._days[key]
+
+    def _current(self, day: int, product_ids: list[int]) -> dict:
+        """product_id -> its interval with the latest valid_from on or before `day`."""
+        table = PriceInterval.__table__
+        earlier = table.alias("earlier")
+        latest_start = (
+            select(func.max(earlier.c.valid_from))
+            .where(earlier.c.product_id == table.c.product_id, earlier.c.valid_from <= day)
+            .scalar_subquery()
+        )
+        found = {}
+        for offset in range(0, len(product_ids), DIM_LOOKUP_BATCH):
+            batch = product_ids[offset:offset + DIM_LOOKUP_BATCH]
+            found.update(
+                (r.product_id, r) for r in self.db.execute(
+                    select(table).where(table.c.product_id.in_(batch), table.c.valid_from == latest_start)
+                )
+            )
+        return found
+
+    def _apply_day(self, day: int, points: dict) -> int:
+        current = self._current(day, list(points))
+        extend, starts = [], []
+        for product_id, point in points.items():
+            interval = current.get(product_id)
+            if interval is None:
+                starts.append({**point, "valid_from": day, "valid_to": day})
+            elif all(getattr(interval, f) == point[f] for f in INTERVAL_FIELDS):
+                if interval.valid_to < day:
+                    extend.append({"pid": product_id, "start": interval.valid_from, "valid_to": day})
+            elif interval.valid_to < day:
+                starts.append({**point, "valid_from": day, "valid_to": day})
+            else:
+                # A different value inside the interval: [start, day - 1] + [day, day] + [day + 1, end]
+                if interval.valid_from < day:
+                    extend.append({"pid": product_id, "start": interval.valid_from, "valid_to": day - 1})
+                starts.append({**point, "valid_from": day, "valid_to": day})
+                if interval.valid_to > day:
+                    starts.append({
+                        "product_id": product_id, **{f: getattr(interval, f) for f in _FACT_FIELDS},
+                        "valid_from": day + 1, "valid_to": interval.valid_to,
+                    })
+
+        table = PriceInterval.__table__
+        if extend:
+            self.db.execute(
+                update(table).where(table.c.product_id == bindparam("pid"), table.c.valid_from == bindparam("start")),
+                extend,
+            )
+        if starts:
+            self._upsert(table, [table.c.product_id, table.c.valid_from], starts)
+        return len(extend) + len(starts)
@@ -0,0 +1,139 @@
+from __future__ import annotations
+import os
+import random
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+
+'''
+    Running ingest and dashboard reads against the same database at once.
+
+    SQLite, on every connection:
+
+        journal_mode=WAL       readers see the last commit and never wait for
+                               the writer; the writer never waits for readers
+        synchronous=NORMAL     no fsync per commit in WAL (still corruption-safe)
+        busy_timeout           a writer meeting another writer waits this long
+                               for the lock instead of failing at once
+
+    Writers keep short transactions: ProductRepository commits every chunk
+    (chunk_size rows) and retries a chunk that still hits a lock with
+    RetryPolicy's jittered backoff.
+
+    The dashboard reads through its own pool (db.session.ReadSessionLocal)
+    whose connections are read-only and run each session as one snapshot
+    transaction: every query of a session sees the same commit, even while
+    ingest commits in between. On SQLite that takes an explicit BEGIN, as
+    pysqlite otherwise runs each SELECT in its own implicit transaction; on
+    PostgreSQL it is a READ ONLY, REPEATABLE READ transaction.
+
+    DB_SQLITE_JOURNAL_MODE (default WAL) and DB_BUSY_TIMEOUT_MS (default 5000)
+    override the SQLite settings; DB_READ_URL points the read pool at another
+    database (e.g. a replica) and DB_READ_POOL_SIZE sizes it.
+'''
+
+SQLITE_JOURNAL_MODE = os.getenv("DB_SQLITE_JOURNAL_MODE") or "WAL"
+BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS") or 5000)
+READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE") or 5)
+
+# Truncate the WAL back to this size after a checkpoint (bytes)
+SQLITE_JOURNAL_SIZE_LIMIT = 64 * 1024 * 1024
+
+# Errors that mean "another connection holds the lock", worth retrying
+_SQLITE_BUSY_MESSAGES = ("database is locked", "database is busy", "database table is locked")
+# serialization_failure, deadlock_detected, lock_not_available
+_POSTGRES_BUSY_CODES = {"40001", "40P01", "55P03"}
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How often, and how long apart, a write that hit a lock is retried.
+
+    Delays double from base_delay up to max_delay, each scaled by a random
+    factor in [0.5, 1) so writers that collided do not retry in lockstep.
+    """
+    attempts: int = 5
+    base_delay: float = 0.05
+    max_delay: float = 2.0
+
+    def delays(self):
+        for attempt in range(self.attempts - 1):
+            yield min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def run(self, fn, on_retry=None):
+        """fn() until it succeeds or raises something other than a lock error.
+
+        on_retry(error) runs before each retry (e.g. to roll the session back).
+        """
+        delays = self.delays()
+        while True:
+            try:
+                return fn()
+            except Exception as e:
+                delay = next(delays, None) if is_busy_error(e) else None
+                if delay is None:
+                    raise
+                if on_retry is not None:
+                    on_retry(e)
+                time.sleep(delay)
+
+
+def is_busy_error(error: BaseException) -> bool:
+    if not isinstance(error, OperationalError):
+        return False
+    if getattr(error.orig, "pgcode", None) in _POSTGRES_BUSY_CODES:
+        return True
+    message = str(error.orig).lower()
+    return any(busy in message for busy in _SQLITE_BUSY_MESSAGES)
+
+
+def connect_args(url: str) -> dict:
+    if not url.startswith("sqlite"):
+        return {}
+    # pysqlite's own busy wait, in seconds; the pragma below sets the same
+    return {"check_same_thread": False, "timeout": BUSY_TIMEOUT_MS / 1000}
+
+
+def configure_sqlite_writes(engine):
+    """Apply WAL, synchronous and busy_timeout to every new connection of a SQLite engine."""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, _record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        if engine.url.database not in (None, "", ":memory:"):
+            cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+            cursor.execute(f"PRAGMA journal_size_limit={SQLITE_JOURNAL_SIZE_LIMIT}")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+
+def create_read_engine(url: str, pool_size: int = READ_POOL_SIZE):
+    """An engine for read-only, snapshot-consistent sessions (one transaction per session)."""
+    if not url.startswith("sqlite"):
+        return create_engine(url, pool_size=pool_size, execution_options={
+            "isolation_level": "REPEATABLE READ",
+            "postgresql_readonly": True,
+        })
+
+    engine = create_engine(url, connect_args=connect_args(url), pool_size=pool_size)
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, _record):
+        # Take transaction control from pysqlite; BEGIN is issued below
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _on_begin(conn):
+        # Deferred: the WAL snapshot is taken by the session's first read
+        conn.exec_driver_sql("BEGIN")
+
+    return engine
@@ -1,9 +1,16 @@
-from sqlalchemy import Column, Float, String, DateTime, create_engine
+from sqlalchemy import (BigInteger, Column, DateTime, Float, Index, Integer, LargeBinary, SmallInteger, String,
+                        create_engine)
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
 
 class Product(Base):
+    """One row per scraped snapshot.
+
+    In the compact and interval history layouts (see db.compact) `products`
+    is a read-only view over the dimension and fact tables below, with the
+    same columns.
+    """
     __tablename__ = 'products'
 
     id = Column(String(100), primary_key=True)
@@ -17,3 +24,249 @@ class Product(Base):
     store = Column(String(64))
     url = Column(String(512))
     timestamp = Column(DateTime)
+    category = Column(String(64))
+
+
+class IngestManifest(Base):
+    """One row per dataset file that has been fully ingested."""
+    __tablename__ = 'ingest_manifest'
+
+    path = Column(String(1024), primary_key=True)
+    size = Column(BigInteger)
+    mtime = Column(Float)
+    content_hash = Column(String(64))
+    rows = Column(Integer)
+    ingested_at = Column(DateTime)
+
+
+class IngestProgress(Base):
+    """How far into a dataset file ingest has committed (see run_ingest_pipeline.resume_point).
+
+    Written in the same transaction as the rows it counts, so a failed run or
+    a restarted daemon resumes after the last committed chunk.
+    """
+    __tablename__ = 'ingest_progress'
+
+    path = Column(String(1024), primary_key=True)
+    records = Column(Integer)      # raw records consumed
+    rows = Column(Integer)         # rows inserted
+    size = Column(BigInteger)      # file size at the checkpoint
+    content_hash = Column(String(64))  # sha256 of the file's first `size` bytes
+    updated_at = Column(DateTime)
+
+
+class LatestPrice(Base):
+    """Current price per product identity (see transformers.identity.product_key)."""
+    __tablename__ = 'latest_prices'
+    # Ranking order + keyset pagination cursor, overall and within a category
+    __table_args__ = (
+        Index('ix_latest_prices_ppu_key', 'price_per_unit', 'product_key'),
+        Index('ix_latest_prices_category_ppu_key', 'category', 'price_per_unit', 'product_key'),
+    )
+
+    product_key = Column(String(600), primary_key=True)
+    product_id = Column(String(100))
+    title = Column(String(512))
+    price = Column(Float)
+    unit = Column(String(64))
+    normalized_unit_qty = Column(Float)
+    normalized_unit = Column(String(32))
+    price_per_unit = Column(Float)
+    price_per_unit_status = Column(String(32))
+    store = Column(String(64))
+    url = Column(String(512))
+    timestamp = Column(DateTime)
+    category = Column(String(64))
+
+
+class PriceRollup(Base):
+    """Unit-price aggregates per product identity and time bucket (day / week)."""
+    __tablename__ = 'price_rollups'
+
+    resolution = Column(String(8), primary_key=True)
+    product_key = Column(String(600), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    store = Column(String(64))
+    min_ppu = Column(Float)
+    max_ppu = Column(Float)
+    sum_ppu = Column(Float)
+    samples = Column(Integer)
+
+
+class DataVersion(Base):
+    """Single-row counter bumped on every committed ingest batch (cache invalidation)."""
+    __tablename__ = 'data_version'
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime)
+
+
+class PriceForecast(Base):
+    """Fitted Holt smoother per product identity (see forecast.holt).
+
+    prev_* is the state just before the last observed day, so a refresh can
+    replay that day when later snapshots add to its rollup.
+    """
+    __tablename__ = 'price_forecasts'
+
+    product_key = Column(String(600), primary_key=True)
+    store = Column(String(64))
+    alpha = Column(Float)
+    beta = Column(Float)
+    level = Column(Float)
+    trend = Column(Float)
+    n_obs = Column(Integer)
+    sse = Column(Float)
+    last_bucket = Column(DateTime)
+    prev_level = Column(Float)
+    prev_trend = Column(Float)
+    prev_n_obs = Column(Integer)
+    prev_sse = Column(Float)
+    prev_bucket = Column(DateTime)
+    updated_at = Column(DateTime)
+
+
+class AlertOutbox(Base):
+    """Price-drop alerts waiting for a notifier (see ingest.alerts)."""
+    __tablename__ = 'alert_outbox'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    rule = Column(String(256))
+    product_key = Column(String(600))
+    store = Column(String(64))
+    title = Column(String(512))
+    url = Column(String(512))
+    old_price_per_unit = Column(Float)
+    new_price_per_unit = Column(Float)
+    drop_pct = Column(Float)
+    price = Column(Float)
+    created_at = Column(DateTime)
+    delivered_at = Column(DateTime, index=True)
+
+
+class ProductMatch(Base):
+    """Cross-store match cluster per product identity (see matching.lsh).
+
+    cluster_id is the smallest product_key in the cluster; signature holds
+    the title MinHash so later batches can be verified against this product.
+    """
+    __tablename__ = 'product_matches'
+
+    product_key = Column(String(600), primary_key=True)
+    cluster_id = Column(String(600), index=True)
+    store = Column(String(64))
+    brand = Column(String(128))
+    title = Column(String(512))
+    normalized_unit_qty = Column(Float)
+    normalized_unit = Column(String(32))
+    signature = Column(LargeBinary)
+    matched_at = Column(DateTime)
+
+
+class MatchBand(Base):
+    """LSH band keys: products sharing a key are match candidates."""
+    __tablename__ = 'match_bands'
+
+    band_key = Column(BigInteger, primary_key=True, autoincrement=False)
+    product_key = Column(String(600), primary_key=True)
+
+
+# ---- compact history layout (see db.compact) ----
+
+class DimStore(Base):
+    __tablename__ = 'dim_stores'
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(64), unique=True, nullable=False)
+
+
+class DimUnit(Base):
+    __tablename__ = 'dim_units'
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(32), unique=True, nullable=False)
+
+
+class DimStatus(Base):
+    __tablename__ = 'dim_statuses'
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(32), unique=True, nullable=False)
+
+
+class DimProduct(Base):
+    """One row per product identity; its newest title, url, unit text and category."""
+    __tablename__ = 'dim_products'
+
+    id = Column(Integer, primary_key=True)
+    product_key = Column(String(600), unique=True, nullable=False)
+    store_id = Column(Integer)
+    title = Column(String(512))
+    url = Column(String(512))
+    unit = Column(String(64))
+    category = Column(String(64))
+
+
+class Scrape(Base):
+    """One row per ingest batch: every snapshot written by it shares this timestamp."""
+    __tablename__ = 'scrapes'
+
+    id = Column(Integer, primary_key=True)
+    scraped_at = Column(DateTime, index=True)
+
+
+class PriceFact(Base):
+    """One price observation of a product in a scrape, all numeric.
+
+    The primary key is the clustering key (WITHOUT ROWID on SQLite): scrape ids
+    only grow, so ingest appends at the end of the tree and a time range is
+    one contiguous slice. The (product, scrape) index serves per-product history.
+    """
+    __tablename__ = 'price_facts'
+    __table_args__ = (
+        Index('ix_price_facts_product_scrape', 'product_id', 'scrape_id'),
+        {'sqlite_with_rowid': False},
+    )
+
+    scrape_id = Column(Integer, primary_key=True, autoincrement=False)
+    product_id = Column(Integer, primary_key=True, autoincrement=False)
+    price = Column(Float)
+    qty = Column(Float)
+    unit_id = Column(SmallInteger)
+    ppu = Column(Float)
+    status_id = Column(SmallInteger)
+
+
+# ---- interval history layout (see db.compact) ----
+
+class ScrapeDay(Base):
+    """One row per store per day it was scraped: the points interval history expands to."""
+    __tablename__ = 'scrape_days'
+    __table_args__ = (
+        Index('ux_scrape_days_store_day', 'store_id', 'day', unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    store_id = Column(Integer, nullable=False)
+    day = Column(Integer, nullable=False)          # date ordinal
+    scraped_at = Column(DateTime, index=True)      # first scrape of the store that day
+
+
+class PriceInterval(Base):
+    """A run of scrape days over which a product's price, quantity, unit and status did not change.
+
+    valid_from / valid_to are the first and last scrape day (date ordinals)
+    the product was seen with these values; a change opens a new interval.
+    """
+    __tablename__ = 'price_intervals'
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    product_id = Column(Integer, primary_key=True, autoincrement=False)
+    valid_from = Column(Integer, primary_key=True, autoincrement=False)
+    valid_to = Column(Integer, nullable=False)
+    price = Column(Float)
+    qty = Column(Float)
+    unit_id = Column(SmallInteger)
+    ppu = Column(Float)
+    status_id = Column(SmallInteger)
@@ -1,7 +1,18 @@
-from db.models import Product
-from datetime import datetime
-from sqlalchemy import func
+from db.models import (AlertOutbox, DataVersion, IngestManifest, IngestProgress, LatestPrice, MatchBand, PriceForecast, PriceRollup,
+                       DimProduct, Product, ProductMatch)
+from db.compact import history_layout, history_writer
+from db.concurrency import RetryPolicy
+from db.search import FTS_TABLE, fts_all_prefixes, fts_phrase_prefix, search_backend, search_key_column, tokenize
+from datetime import datetime, timedelta
+from sqlalchemy import and_, bindparam, case, func, insert, or_, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from forecast.holt import MIN_FIT_OBS, HoltState, build_matrix, from_days, holt_fit, holt_forecast, holt_update, to_days
+from matching.lsh import MAX_BUCKET, MatchFeatures, UnionFind, band_keys, candidate_pairs, verify
+from transformers.categories import canonical_category, classify_title
+from transformers.identity import product_key
+import numpy as np
 import uuid
+from collections import defaultdict
 from types import SimpleNamespace
 
 '''
@@ -9,6 +20,76 @@ from types import SimpleNamespace
     It provides a method to insert products and another to retrieve the latest prices by product.
 '''
 
+BULK_CHUNK_SIZE = 5000
+
+# Pragmas applied before bulk loads on SQLite; journal_mode (WAL) and busy_timeout
+# are set on every connection (see db.concurrency). Negative cache_size is KiB.
+SQLITE_BULK_PRAGMAS = {
+    "synchronous": "NORMAL",
+    "cache_size": -65536,
+    "temp_store": "MEMORY",
+}
+
+
+LATEST_COLUMNS = (
+    "title", "price", "unit", "normalized_unit_qty", "normalized_unit",
+    "price_per_unit", "price_per_unit_status", "store", "url", "timestamp", "category",
+)
+
+_UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+# Trend rollup buckets: resolution -> bucket start for a timestamp
+ROLLUP_BUCKETS = {
+    "day": lambda ts: datetime(ts.year, ts.month, ts.day),
+    "week": lambda ts: datetime(ts.year, ts.month, ts.day) - timedelta(days=ts.weekday()),
+}
+
+# Product keys per IN (...) lookup of previous prices
+LOOKUP_BATCH = 2000
+
+# Series fitted per NumPy batch when refreshing forecasts
+FORECAST_BATCH_SERIES = 20000
+FORECAST_HORIZON_DAYS = 14
+# Series whose last price is older than this (vs the newest) are not extrapolated
+FORECAST_MAX_STALE_DAYS = 14
+
+# Band buckets holding more products than this are too generic to yield matches
+MATCH_MAX_BUCKET = MAX_BUCKET
+# Identities per batch when rebuilding match clusters from latest_prices
+MATCH_REBUILD_BATCH = 20000
+
+FORECAST_COLUMNS = (
+    "store", "alpha", "beta", "level", "trend", "n_obs", "sse", "last_bucket",
+    "prev_level", "prev_trend", "prev_n_obs", "prev_sse", "prev_bucket", "updated_at",
+)
+
+
+class BulkInsertError(Exception):
+    """Raised when one chunk of a bulk insert fails.
+
+    Chunks before `chunk_index` are already committed; `inserted` counts them.
+    """
+
+    def __init__(self, chunk_index: int, row_offset: int, inserted: int, cause: Exception):
+        self.chunk_index = chunk_index
+        self.row_offset = row_offset
+        self.inserted = inserted
+        self.cause = cause
+        super().__init__(
+            f"chunk {chunk_index} (rows {row_offset}+) failed after {inserted} rows committed: {cause}"
+        )
+
+
+def _apply_bulk_pragmas(connection):
+    # SQLite refuses some of these inside an open write transaction
+    if connection.dialect.name != "sqlite":
+        return
+    if connection.connection.driver_connection.in_transaction:
+        return
+    for name, value in SQLITE_BULK_PRAGMAS.items():
+        connection.exec_driver_sql(f"PRAGMA {name}={value}")
+
+
 class ProductRepository:
     """Repository wrapper to insert products using an external session.
 
@@ -17,13 +98,52 @@ class ProductRepository:
         repo = ProductRepository(db)
         repo.insert_products(data)
         db.close()
+
+    Pass alerts=AlertStage(...) (see ingest.alerts) to emit price-drop
+    alerts for inserted rows, and archive=ParquetArchive(...) (see
+    ingest.archive) to also append committed rows to the Parquet archive,
+    which the analytical queries (source="archive") then read. With
+    matching=True each batch's new product identities are also matched
+    into cross-store clusters (see matching.lsh). A chunk whose write hits
+    a database lock is rolled back and retried per `retry` (see
+    db.concurrency; RetryPolicy(attempts=1) disables retries).
     """
 
-    def __init__(self, db_session):
+    def __init__(self, db_session, alerts=None, archive=None, matching: bool = False,
+                 retry: RetryPolicy = RetryPolicy()):
         self.db = db_session
+        self.alerts = alerts
+        self.archive = archive
+        self.matching = matching
+        self.retry = retry
+        # Chunk writes retried after a lock error, for run metrics
+        self.write_retries = 0
+        self.layout = history_layout(db_session.get_bind())
+        # Normalized layouts: `products` is a view, snapshots go through a writer (see db.compact)
+        self._history = history_writer(db_session, self.layout)
+
+    def insert_products(self, data: list[dict], bulk: bool = True,
+                        chunk_size: int = BULK_CHUNK_SIZE, checkpoint: dict | None = None) -> int:
+        """Insert converted rows; returns the number of rows written.
+
+        The default bulk path uses Core executemany per chunk, committing each
+        chunk, and raises BulkInsertError naming the chunk that failed.
+        bulk=False keeps the original one-ORM-object-per-row path, which
+        commits all rows at once (a failure raises BulkInsertError for chunk 0).
+
+        checkpoint (bulk path only) is an IngestProgress row (path, records,
+        rows, size) written in the same transaction as the last chunk.
+        """
+        if bulk:
+            return self._bulk_insert_products(data, chunk_size, checkpoint)
+        if checkpoint is not None:
+            raise ValueError("checkpoint is only supported by the bulk insert path")
+
+        if self._history is not None:
+            return self._insert_normalized(data)
 
-    def insert_products(self, data: list[dict]):
         try:
+            products = []
             for item in data:
                 product = Product(
                     id=str(uuid.uuid4()),
@@ -36,33 +156,1127 @@ class ProductRepository:
                     price_per_unit_status=item.get("price_per_unit_status"),
                     store=item.get("store"),
                     url=item.get("url"),
-                    timestamp=datetime.now()
+                    timestamp=datetime.now(),
+                    category=self._category_of(item),
                 )
                 self.db.add(product)
+                products.append(product)
+            rows = [
+                {"id": p.id, **{column: getattr(p, column) for column in LATEST_COLUMNS}}
+                for p in products
+            ]
+            keys = self._row_keys(rows)
+            events = self._detect_drops(rows, keys)
+            self._upsert_latest(rows, keys)
+            self._update_rollups(rows, keys)
+            if self.matching:
+                self._match_products(rows, keys)
+            self._bump_data_version()
+            self._emit_alerts(events, committed=False)
             self.db.commit()
+            self._emit_alerts(events, committed=True)
+            if self.archive is not None:
+                self.archive.write(rows, keys)
+            return len(data)
         except Exception as e:
             self.db.rollback()
-            print("❌ Error inserting to DB:", e)
+            # Surface the failure to the caller (and its run metrics) instead of returning 0
+            raise BulkInsertError(0, 0, 0, e) from e
+
+    def _bulk_insert_products(self, data: list[dict], chunk_size: int, checkpoint: dict | None = None) -> int:
+        if not data:
+            return 0
+
+        _apply_bulk_pragmas(self.db.connection())
+
+        # One timestamp and one id prefix per batch instead of per row
+        timestamp = datetime.now()
+        batch_id = uuid.uuid4().hex
+
+        inserted = 0
+        for chunk_index, offset in enumerate(range(0, len(data), chunk_size)):
+            chunk = data[offset:offset + chunk_size]
+            rows = [self._snapshot_row(item, f"{batch_id}-{offset + i}", timestamp) for i, item in enumerate(chunk)]
+            last = offset + chunk_size >= len(data)
+            try:
+                keys = self._row_keys(rows)
+                events = self._with_retry(lambda: self._write_chunk(rows, keys, checkpoint if last else None))
+            except Exception as e:
+                raise BulkInsertError(chunk_index, offset, inserted, e) from e
+            inserted += len(rows)
+            self._emit_alerts(events, committed=True)
+            if self.archive is not None:
+                # Derived copy: appended only once the chunk is durable in the DB
+                self.archive.write(rows, keys)
+
+        return inserted
+
+    def _write_chunk(self, rows: list[dict], keys: list[str], checkpoint: dict | None = None) -> list[dict]:
+        """Write one chunk and everything derived from it in one transaction; returns its alert events."""
+        if self._history is None:
+            self.db.execute(insert(Product.__table__), rows)
+        else:
+            self._history.append(rows, keys)
+        events = self._detect_drops(rows, keys)
+        self._upsert_latest(rows, keys)
+        self._update_rollups(rows, keys)
+        if self.matching:
+            self._match_products(rows, keys)
+        self._bump_data_version()
+        self._emit_alerts(events, committed=False)
+        if checkpoint is not None:
+            self.db.merge(IngestProgress(**checkpoint, updated_at=datetime.now()))
+        self.db.commit()
+        return events
+
+    def _with_retry(self, write):
+        """write() (which commits); rolled back on failure and retried per self.retry while the DB is locked."""
+        def attempt():
+            try:
+                return write()
+            except Exception:
+                self._rollback()
+                raise
+
+        def retried(_error):
+            self.write_retries += 1
+
+        return self.retry.run(attempt, on_retry=retried)
+
+    def insert_history(self, rows: list[dict]) -> int:
+        """Append converted rows that carry their own "timestamp" to the snapshot history only.
+
+        For backfills and benchmarks: latest_prices, rollups, alerts and
+        matching are not touched (rebuild them afterwards). Rows need an "id"
+        in the legacy layout; the normalized layouts assign their own.
+        """
+        if not rows:
+            return 0
+        if self._history is not None:
+            rows = [{**row, "category": self._category_of(row)} for row in rows]
+
+        def write():
+            if self._history is None:
+                columns = Product.__table__.columns.keys()
+                self.db.execute(insert(Product.__table__), [
+                    {column: row.get(column) for column in columns} for row in rows
+                ])
+            else:
+                self._history.append(rows, self._row_keys(rows))
+            self._bump_data_version()
+            self.db.commit()
+
+        self._with_retry(write)
+        return len(rows)
+
+    def _insert_normalized(self, data: list[dict]) -> int:
+        """bulk=False in a normalized layout: the whole batch as one scrape, one commit."""
+        if not data:
+            return 0
+        timestamp = datetime.now()
+        rows = [self._snapshot_row(item, None, timestamp) for item in data]
+        try:
+            keys = self._row_keys(rows)
+            events = self._with_retry(lambda: self._write_chunk(rows, keys))
+        except Exception as e:
+            raise BulkInsertError(0, 0, 0, e) from e
+        self._emit_alerts(events, committed=True)
+        if self.archive is not None:
+            self.archive.write(rows, keys)
+        return len(data)
+
+    def _snapshot_row(self, item: dict, row_id: str | None, timestamp: datetime) -> dict:
+        return {
+            "id": row_id,
+            "title": item.get("title"),
+            "price": item.get("price"),
+            "unit": item.get("unit"),
+            "normalized_unit_qty": item.get("normalized_unit_qty"),
+            "normalized_unit": item.get("normalized_unit"),
+            "price_per_unit": item.get("price_per_unit"),
+            "price_per_unit_status": item.get("price_per_unit_status"),
+            "store": item.get("store"),
+            "url": item.get("url"),
+            "timestamp": timestamp,
+            "category": self._category_of(item),
+        }
+
+    def _rollback(self):
+        self.db.rollback()
+        if self._history is not None:
+            # Dimension ids created in the rolled-back transaction are gone
+            self._history.forget()
+
+    def _bump_data_version(self):
+        """Tell readers (e.g. dashboard caches) that committed data changed."""
+        result = self.db.execute(
+            update(DataVersion)
+            .where(DataVersion.id == 1)
+            .values(version=DataVersion.version + 1, updated_at=datetime.now())
+        )
+        if result.rowcount == 0:
+            self.db.add(DataVersion(id=1, version=1, updated_at=datetime.now()))
+
+    def get_data_version(self) -> int:
+        version = self.db.query(DataVersion.version).filter(DataVersion.id == 1).scalar()
+        return version or 0
+
+    @staticmethod
+    def _category_of(item: dict) -> str | None:
+        # The ingest classify stage sets it; rows from other callers are classified here
+        return item["category"] if "category" in item else classify_title(item.get("title"))
+
+    @staticmethod
+    def _row_keys(rows: list[dict]) -> list[str]:
+        # Computed once per chunk and shared by latest/rollups/alerts
+        return [product_key(row["store"], row["url"], row["title"]) for row in rows]
+
+    def _lookup(self, columns, key_column, keys: list) -> list:
+        """Rows of a Core select, filtered by key_column IN keys in LOOKUP_BATCH slices."""
+        found = []
+        for offset in range(0, len(keys), LOOKUP_BATCH):
+            found.extend(self.db.execute(select(*columns).where(key_column.in_(keys[offset:offset + LOOKUP_BATCH]))))
+        return found
+
+    def _detect_drops(self, rows: list[dict], keys: list[str]) -> list[dict]:
+        """Price-drop events for rows about to replace their latest_prices entries."""
+        if self.alerts is None or not rows:
+            return []
+        table = LatestPrice.__table__
+        found = self._lookup((table.c.product_key, table.c.price_per_unit, table.c.timestamp),
+                             table.c.product_key, list(set(keys)))
+        previous = {key: (ppu, ts) for key, ppu, ts in found}
+        return self.alerts.detect(rows, keys, previous)
+
+    def _emit_alerts(self, events: list[dict], committed: bool):
+        # Transactional sinks write with the chunk, the rest only once it is durable
+        if events and self.alerts.sink.transactional != committed:
+            self.alerts.sink.write(events, self.db)
+
+    def _upsert_latest(self, rows: list[dict], keys: list[str] | None = None):
+        """Point each product identity at its newest snapshot row (same transaction)."""
+        if not rows:
+            return
+        keys = keys or self._row_keys(rows)
+        # One row per identity: a multi-row ON CONFLICT DO UPDATE (PostgreSQL)
+        # cannot touch the same key twice. Keep the newest, the later on a tie.
+        newest = {}
+        for row, key in zip(rows, keys):
+            kept = newest.get(key)
+            if kept is None or kept["timestamp"] is None or (
+                    row["timestamp"] is not None and row["timestamp"] >= kept["timestamp"]):
+                newest[key] = row
+        latest = [
+            {
+                "product_key": key,
+                "product_id": row["id"],
+                **{column: row[column] for column in LATEST_COLUMNS},
+            }
+            for key, row in newest.items()
+        ]
+
+        dialect_insert = _UPSERT_DIALECTS.get(self.db.get_bind().dialect.name)
+        if dialect_insert is None:
+            for row in latest:
+                current = self.db.get(LatestPrice, row["product_key"])
+                if current is None or current.timestamp is None or current.timestamp <= row["timestamp"]:
+                    self.db.merge(LatestPrice(**row))
+            return
+
+        table = LatestPrice.__table__
+        statement = dialect_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.product_key],
+            set_={column: statement.excluded[column] for column in ("product_id", *LATEST_COLUMNS)},
+            # Re-ingesting an older dump must not roll the current price back
+            where=statement.excluded.timestamp >= table.c.timestamp,
+        )
+        self.db.execute(statement, latest)
+
+    def rebuild_latest_prices(self, batch_size: int = BULK_CHUNK_SIZE) -> int:
+        """Recompute latest_prices from the full products history; returns identities kept."""
+        self.db.query(LatestPrice).delete()
+        query = (
+            self.db.query(Product)
+            .order_by(Product.timestamp.asc())
+            .yield_per(batch_size)
+        )
+        batch = []
+        for p in query:
+            batch.append({"id": p.id, **{column: getattr(p, column) for column in LATEST_COLUMNS}})
+            if len(batch) >= batch_size:
+                self._upsert_latest(batch)
+                batch = []
+        self._upsert_latest(batch)
+        self._bump_data_version()
+        self.db.commit()
+        return self.db.query(LatestPrice).count()
+
+    def backfill_derived_tables(self) -> dict[str, int]:
+        """Derive latest_prices and price_rollups from the history on a DB created before them.
+
+        Only a table that is empty while the history is not is rebuilt, so after
+        the first time this is two existence checks. Returns {table: rows kept}
+        for the tables rebuilt (and "categories": rows reclassified).
+        """
+        if self.db.query(Product.id).first() is None:
+            return {}
+        rebuilt = {}
+        if self.db.query(LatestPrice.product_key).first() is None:
+            rebuilt["latest_prices"] = self.rebuild_latest_prices()
+            # History from before categories existed has none to copy
+            rebuilt["categories"] = self.rebuild_categories()
+        if self.db.query(PriceRollup.product_key).first() is None:
+            rebuilt["price_rollups"] = self.rebuild_price_rollups()
+        return rebuilt
+
+    def _update_rollups(self, rows: list[dict], keys: list[str] | None = None):
+        """Fold valid unit prices into the day/week rollups (same transaction)."""
+        keys = keys or self._row_keys(rows)
+        # Pre-aggregate the batch so each bucket is upserted once
+        buckets = {}
+        for row, key in zip(rows, keys):
+            ppu = row["price_per_unit"]
+            if ppu is None or ppu <= 0 or row["timestamp"] is None:
+                continue
+            for resolution, bucket_of in ROLLUP_BUCKETS.items():
+                bucket = (resolution, key, bucket_of(row["timestamp"]))
+                agg = buckets.get(bucket)
+                if agg is None:
+                    buckets[bucket] = {
+                        "resolution": resolution,
+                        "product_key": key,
+                        "bucket_start": bucket[2],
+                        "store": row["store"],
+                        "min_ppu": ppu,
+                        "max_ppu": ppu,
+                        "sum_ppu": ppu,
+                        "samples": 1,
+                    }
+                else:
+                    agg["min_ppu"] = min(agg["min_ppu"], ppu)
+                    agg["max_ppu"] = max(agg["max_ppu"], ppu)
+                    agg["sum_ppu"] += ppu
+                    agg["samples"] += 1
+        if not buckets:
+            return
+
+        dialect = self.db.get_bind().dialect.name
+        dialect_insert = _UPSERT_DIALECTS.get(dialect)
+        if dialect_insert is None:
+            for agg in buckets.values():
+                current = self.db.get(PriceRollup, (agg["resolution"], agg["product_key"], agg["bucket_start"]))
+                if current is None:
+                    self.db.add(PriceRollup(**agg))
+                else:
+                    current.min_ppu = min(current.min_ppu, agg["min_ppu"])
+                    current.max_ppu = max(current.max_ppu, agg["max_ppu"])
+                    current.sum_ppu += agg["sum_ppu"]
+                    current.samples += agg["samples"]
+            return
+
+        # Two-argument min()/max() are scalar in SQLite; PostgreSQL spells them least/greatest
+        smaller, larger = (func.min, func.max) if dialect == "sqlite" else (func.least, func.greatest)
+        table = PriceRollup.__table__
+        statement = dialect_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.resolution, table.c.product_key, table.c.bucket_start],
+            set_={
+                "store": statement.excluded.store,
+                "min_ppu": smaller(table.c.min_ppu, statement.excluded.min_ppu),
+                "max_ppu": larger(table.c.max_ppu, statement.excluded.max_ppu),
+                "sum_ppu": table.c.sum_ppu + statement.excluded.sum_ppu,
+                "samples": table.c.samples + statement.excluded.samples,
+            },
+        )
+        self.db.execute(statement, list(buckets.values()))
+
+    def rebuild_price_rollups(self, batch_size: int = BULK_CHUNK_SIZE) -> int:
+        """Recompute price_rollups from the full products history; returns buckets kept."""
+        self.db.query(PriceRollup).delete()
+        query = self.db.query(Product).yield_per(batch_size)
+        batch = []
+        for p in query:
+            batch.append({column: getattr(p, column) for column in LATEST_COLUMNS})
+            if len(batch) >= batch_size:
+                self._update_rollups(batch)
+                batch = []
+        self._update_rollups(batch)
+        self._bump_data_version()
+        self.db.commit()
+        return self.db.query(PriceRollup).count()
+
+    def _match_products(self, rows: list[dict], keys: list[str]):
+        """Put new (or retitled) product identities into cross-store clusters (same transaction).
+
+        Candidates come from stored LSH band keys plus the batch itself; only
+        verified pairs merge clusters, and a merge relabels the absorbed
+        cluster's members with the surviving cluster_id.
+        """
+        latest = dict(zip(keys, rows))
+        matches, bands_table = ProductMatch.__table__, MatchBand.__table__
+        known = dict(self._lookup((matches.c.product_key, matches.c.title), matches.c.product_key, list(latest)))
+        todo = [key for key, row in latest.items() if key not in known or known[key] != row["title"]]
+        if not todo:
+            return
+        self._unmatch_retitled([key for key in todo if key in known])
+
+        new = [latest[key] for key in todo]
+        features = MatchFeatures.from_products(
+            [row["store"] for row in new], [row["title"] for row in new],
+            [row["normalized_unit_qty"] for row in new], [row["normalized_unit"] for row in new],
+        )
+        bands = band_keys(features)
+        valid = np.flatnonzero(features.valid)
+
+        # Stored candidates: products already filed under any of the batch's band keys
+        buckets = defaultdict(list)
+        for band_key, key in self._lookup((bands_table.c.band_key, bands_table.c.product_key),
+                                          bands_table.c.band_key, np.unique(bands[valid]).tolist()):
+            buckets[band_key].append(key)
+        usable = np.array([k for k, members in buckets.items() if len(members) <= MATCH_MAX_BUCKET], dtype=np.int64)
+        hit_rows, hit_bands = np.nonzero(np.isin(bands[valid], usable))
+        pairs = {
+            (i, key)
+            for i, band_key in zip(valid[hit_rows].tolist(), bands[valid][hit_rows, hit_bands].tolist())
+            for key in buckets[band_key]
+        }
+        clusters = UnionFind()
+        for key in todo:
+            clusters.add(key)
+        stored_clusters = set()
+        if pairs:
+            stored = self._lookup(
+                (matches.c.product_key, matches.c.cluster_id, matches.c.store, matches.c.title,
+                 matches.c.normalized_unit, matches.c.normalized_unit_qty, matches.c.signature),
+                matches.c.product_key, sorted({key for _, key in pairs}),
+            )
+            index = {r.product_key: j for j, r in enumerate(stored)}
+            stored_features = MatchFeatures.from_stored(
+                [r.store for r in stored], [r.title for r in stored], [r.normalized_unit for r in stored],
+                [r.normalized_unit_qty for r in stored], [r.signature for r in stored],
+            )
+            li = np.array([i for i, _ in pairs], dtype=np.int64)
+            rj = np.array([index[key] for _, key in pairs], dtype=np.int64)
+            matched = verify(features, li, stored_features, rj)
+            for i, j in zip(li[matched].tolist(), rj[matched].tolist()):
+                clusters.union(todo[i], stored[j].cluster_id)
+                stored_clusters.add(stored[j].cluster_id)
+
+        # Matches within the batch
+        ni, nj = candidate_pairs(bands[valid], MATCH_MAX_BUCKET)
+        ni, nj = valid[ni], valid[nj]
+        matched = verify(features, ni, features, nj)
+        for i, j in zip(ni[matched].tolist(), nj[matched].tolist()):
+            clusters.union(todo[i], todo[j])
+
+        # Absorbed stored clusters take the surviving id
+        for cluster_id in stored_clusters:
+            root = clusters.find(cluster_id)
+            if root != cluster_id:
+                self.db.execute(update(matches).where(matches.c.cluster_id == cluster_id).values(cluster_id=root))
+
+        now = datetime.now()
+        self.db.execute(insert(matches), [
+            {
+                "product_key": key,
+                "cluster_id": clusters.find(key),
+                "store": features.stores[i],
+                "brand": features.brands[i],
+                "title": row["title"],
+                "normalized_unit_qty": row["normalized_unit_qty"],
+                "normalized_unit": row["normalized_unit"],
+                "signature": features.signature_bytes(i),
+                "matched_at": now,
+            }
+            for i, (key, row) in enumerate(zip(todo, new))
+        ])
+        band_rows = [
+            {"band_key": band_key, "product_key": todo[i]}
+            for i in valid.tolist() for band_key in set(bands[i].tolist())
+        ]
+        if band_rows:
+            self.db.execute(insert(bands_table), band_rows)
+
+    def _unmatch_retitled(self, retitled: list[str]):
+        """Take retitled products out of their clusters before they are matched again.
+
+        The members left behind may only have been linked through a retitled
+        product, so each former cluster is re-verified pairwise and split into
+        the groups that still match; every group is renamed to its smallest
+        key, so no cluster keeps the id of a product that left it.
+        """
+        if not retitled:
+            return
+        matches, bands_table = ProductMatch.__table__, MatchBand.__table__
+        former = {cluster_id for _, cluster_id in self._lookup(
+            (matches.c.product_key, matches.c.cluster_id), matches.c.product_key, retitled)}
+        for offset in range(0, len(retitled), LOOKUP_BATCH):
+            batch = retitled[offset:offset + LOOKUP_BATCH]
+            self.db.execute(bands_table.delete().where(bands_table.c.product_key.in_(batch)))
+            self.db.execute(matches.delete().where(matches.c.product_key.in_(batch)))
+
+        stayed = self._lookup(
+            (matches.c.product_key, matches.c.cluster_id, matches.c.store, matches.c.title,
+             matches.c.normalized_unit, matches.c.normalized_unit_qty, matches.c.signature),
+            matches.c.cluster_id, sorted(former),
+        )
+        if not stayed:
+            return
+        features = MatchFeatures.from_stored(
+            [r.store for r in stayed], [r.title for r in stayed], [r.normalized_unit for r in stayed],
+            [r.normalized_unit_qty for r in stayed], [r.signature for r in stayed],
+        )
+        members = defaultdict(list)
+        for j, r in enumerate(stayed):
+            members[r.cluster_id].append(j)
+        # Clusters hold one product per store or so: every pair is cheap to check
+        li, rj = [], []
+        for indexes in members.values():
+            a, b = np.triu_indices(len(indexes), 1)
+            li.extend(np.array(indexes)[a].tolist())
+            rj.extend(np.array(indexes)[b].tolist())
+        li, rj = np.array(li, dtype=np.int64), np.array(rj, dtype=np.int64)
+        clusters = UnionFind()
+        for r in stayed:
+            clusters.add(r.product_key)
+        matched = verify(features, li, features, rj)
+        for i, j in zip(li[matched].tolist(), rj[matched].tolist()):
+            clusters.union(stayed[i].product_key, stayed[j].product_key)
+
+        relabel = defaultdict(list)
+        for r in stayed:
+            if clusters.find(r.product_key) != r.cluster_id:
+                relabel[clusters.find(r.product_key)].append(r.product_key)
+        for cluster_id, keys in relabel.items():
+            for offset in range(0, len(keys), LOOKUP_BATCH):
+                self.db.execute(update(matches).where(matches.c.product_key.in_(keys[offset:offset + LOOKUP_BATCH]))
+                                .values(cluster_id=cluster_id))
+
+    def rebuild_matches(self, batch_size: int = MATCH_REBUILD_BATCH) -> int:
+        """Recompute every match cluster from latest_prices; returns clusters spanning 2+ stores."""
+        self.db.query(MatchBand).delete()
+        self.db.query(ProductMatch).delete()
+        query = self.db.query(LatestPrice).order_by(LatestPrice.product_key).yield_per(batch_size)
+        rows, keys = [], []
+        for p in query:
+            rows.append({column: getattr(p, column) for column in LATEST_COLUMNS})
+            keys.append(p.product_key)
+            if len(rows) >= batch_size:
+                self._match_products(rows, keys)
+                rows, keys = [], []
+        self._match_products(rows, keys)
+        self._bump_data_version()
+        self.db.commit()
+        return (
+            self.db.query(ProductMatch.cluster_id)
+            .group_by(ProductMatch.cluster_id)
+            .having(func.count(ProductMatch.store.distinct()) > 1)
+            .count()
+        )
+
+    def get_matched_products(self, category: str, min_stores: int = 2, limit: int = 20) -> list[dict]:
+        """Like-for-like groups: the same product at several stores, for products in `category`.
+
+        Each group has cluster_id, title, stores, offers (one dict per listing,
+        cheapest unit price first, shaped like get_latest_prices_by_product) and
+        savings_pct between the cheapest and dearest valid unit price (shelf
+        price when fewer than two listings have one).
+        """
+        clusters = (
+            self.db.query(ProductMatch.cluster_id)
+            .filter(ProductMatch.product_key.in_(self._category_keys(category).scalar_subquery()))
+            .distinct()
+            .scalar_subquery()
+        )
+        wanted = (
+            self.db.query(ProductMatch.cluster_id)
+            .filter(ProductMatch.cluster_id.in_(clusters))
+            .group_by(ProductMatch.cluster_id)
+            .having(func.count(ProductMatch.store.distinct()) >= min_stores)
+            .order_by(func.count(ProductMatch.store.distinct()).desc(), ProductMatch.cluster_id)
+            .limit(limit)
+            .all()
+        )
+        cluster_ids = [cluster_id for cluster_id, in wanted]
+        if not cluster_ids:
+            return []
+        members = (
+            self.db.query(ProductMatch.cluster_id, LatestPrice)
+            .join(LatestPrice, LatestPrice.product_key == ProductMatch.product_key)
+            .filter(ProductMatch.cluster_id.in_(cluster_ids))
+            .all()
+        )
+        offers = defaultdict(list)
+        for cluster_id, latest in members:
+            offers[cluster_id].append(self._to_dict(latest))
+
+        groups = []
+        for cluster_id in cluster_ids:
+            group = sorted(offers[cluster_id], key=lambda o: (o["price_per_unit"] is None or o["price_per_unit"] <= 0,
+                                                               o["price_per_unit"] or 0))
+            prices = [o["price_per_unit"] for o in group if o["price_per_unit"] and o["price_per_unit"] > 0]
+            if len(prices) < 2:
+                # Same product, so shelf prices compare like-for-like when units did not parse
+                prices = [o["price"] for o in group if o["price"] and o["price"] > 0]
+            groups.append({
+                "cluster_id": cluster_id,
+                "title": group[0]["product_name"],
+                "stores": len({o["store_name"] for o in group}),
+                "offers": group,
+                "savings_pct": round((1 - min(prices) / max(prices)) * 100) if len(prices) >= 2 else 0,
+            })
+        return groups
+
+    @staticmethod
+    def _in_category(category: str):
+        # Equality on the indexed column; names are matched case-insensitively
+        return LatestPrice.category == canonical_category(category)
+
+    def _category_keys(self, category: str):
+        """Query for the product keys currently in `category` (an index-only lookup)."""
+        return self.db.query(LatestPrice.product_key).filter(self._in_category(category))
+
+    def get_categories(self) -> list[dict]:
+        """Categories present in latest_prices with their product counts, largest first."""
+        results = (
+            self.db.query(LatestPrice.category, func.count().label("products"))
+            .filter(LatestPrice.category.isnot(None))
+            .group_by(LatestPrice.category)
+            .all()
+        )
+        return [
+            {"category": r.category, "products": r.products}
+            for r in sorted(results, key=lambda r: (-r.products, r.category))
+        ]
+
+    def rebuild_categories(self, batch_size: int = BULK_CHUNK_SIZE) -> int:
+        """Reclassify every stored title (after adding or changing a category rule); returns rows changed."""
+        changed = 0
+        # In the normalized layouts titles and categories are stored once per product
+        history = (DimProduct, DimProduct.id) if self._history is not None else (Product, Product.id)
+        for model, key in (history, (LatestPrice, LatestPrice.product_key)):
+            table = model.__table__
+            statement = (
+                update(table)
+                .where(table.c[key.key] == bindparam("row_key"))
+                .values(category=bindparam("new_category"))
+            )
+            # Keyset pages, so no read cursor stays open across the updates
+            last = None
+            while True:
+                page = select(key, model.title, model.category).order_by(key).limit(batch_size)
+                if last is not None:
+                    page = page.where(key > last)
+                rows = self.db.execute(page).all()
+                if not rows:
+                    break
+                last = rows[-1][0]
+                updates = [
+                    {"row_key": row_key, "new_category": new_category}
+                    for row_key, title, category in rows
+                    if (new_category := classify_title(title)) != category
+                ]
+                if updates:
+                    self.db.execute(statement, updates)
+                changed += len(updates)
+        if changed:
+            self._bump_data_version()
+        self.db.commit()
+        return changed
+
+    def _require_archive(self):
+        if self.archive is None:
+            raise ValueError("source='archive' needs ProductRepository(..., archive=ParquetArchive(root))")
+        return self.archive
+
+    def get_price_history(self, category: str, resolution: str = "day", source: str = "db",
+                          start: datetime | None = None, end: datetime | None = None) -> list[dict]:
+        """Per-store unit-price trend for products in `category`.
+
+        resolution is "day" or "week". Each row has store_name, scraped_at
+        (bucket start), price_per_unit (mean), min/max_price_per_unit and samples.
+        source="db" reads the rollups; source="archive" scans the Parquet
+        archive for the same products, leaving the DB alone past the key lookup.
+        """
+        if resolution not in ROLLUP_BUCKETS:
+            raise ValueError(f"Unknown resolution {resolution!r}; expected one of {sorted(ROLLUP_BUCKETS)}")
+
+        if source == "archive":
+            from analytics.queries import price_history
+            keys = [key for key, in self._category_keys(category)]
+            return price_history(self._require_archive(), keys, resolution, start=start, end=end)
+
+        query = (
+            self.db.query(
+                PriceRollup.store,
+                PriceRollup.bucket_start,
+                func.min(PriceRollup.min_ppu).label("min_ppu"),
+                func.max(PriceRollup.max_ppu).label("max_ppu"),
+                func.sum(PriceRollup.sum_ppu).label("sum_ppu"),
+                func.sum(PriceRollup.samples).label("samples"),
+            )
+            .filter(PriceRollup.resolution == resolution)
+            .filter(PriceRollup.product_key.in_(self._category_keys(category).scalar_subquery()))
+        )
+        if start is not None:
+            query = query.filter(PriceRollup.bucket_start >= ROLLUP_BUCKETS[resolution](start))
+        if end is not None:
+            query = query.filter(PriceRollup.bucket_start <= end)
+        results = (
+            query
+            .group_by(PriceRollup.store, PriceRollup.bucket_start)
+            .order_by(PriceRollup.bucket_start.asc())
+            .all()
+        )
+
+        return [
+            {
+                "store_name": r.store,
+                "scraped_at": r.bucket_start,
+                "price_per_unit": r.sum_ppu / r.samples,
+                "min_price_per_unit": r.min_ppu,
+                "max_price_per_unit": r.max_ppu,
+                "samples": r.samples,
+            }
+            for r in results
+        ]
+
+    def get_store_comparison(self, category: str, source: str = "db",
+                             start: datetime | None = None, end: datetime | None = None) -> list[dict]:
+        """Unit-price summary per store for products in `category`, cheapest first.
+
+        Rows have store_name, price_per_unit (mean), min/max_price_per_unit,
+        samples and products. source is "db" (daily rollups) or "archive".
+        """
+        if source == "archive":
+            from analytics.queries import store_comparison
+            keys = [key for key, in self._category_keys(category)]
+            return store_comparison(self._require_archive(), keys, start=start, end=end)
+
+        query = (
+            self.db.query(
+                PriceRollup.store,
+                func.min(PriceRollup.min_ppu).label("min_ppu"),
+                func.max(PriceRollup.max_ppu).label("max_ppu"),
+                func.sum(PriceRollup.sum_ppu).label("sum_ppu"),
+                func.sum(PriceRollup.samples).label("samples"),
+                func.count(PriceRollup.product_key.distinct()).label("products"),
+            )
+            .filter(PriceRollup.resolution == "day")
+            .filter(PriceRollup.product_key.in_(self._category_keys(category).scalar_subquery()))
+        )
+        if start is not None:
+            query = query.filter(PriceRollup.bucket_start >= ROLLUP_BUCKETS["day"](start))
+        if end is not None:
+            query = query.filter(PriceRollup.bucket_start <= end)
+        results = query.group_by(PriceRollup.store).all()
+
+        rows = [
+            {
+                "store_name": r.store,
+                "price_per_unit": r.sum_ppu / r.samples,
+                "min_price_per_unit": r.min_ppu,
+                "max_price_per_unit": r.max_ppu,
+                "samples": r.samples,
+                "products": r.products,
+            }
+            for r in results
+        ]
+        return sorted(rows, key=lambda row: row["price_per_unit"])
+
+    def export_archive(self, batch_size: int = BULK_CHUNK_SIZE) -> int:
+        """Append the full products history to the Parquet archive; returns rows written."""
+        archive = self._require_archive()
+        query = self.db.query(Product).yield_per(batch_size)
+        written = 0
+        batch = []
+        for p in query:
+            batch.append({"id": p.id, **{column: getattr(p, column) for column in LATEST_COLUMNS}})
+            if len(batch) >= batch_size:
+                written += archive.write(batch, self._row_keys(batch))
+                batch = []
+        written += archive.write(batch, self._row_keys(batch))
+        return written
+
+    def refresh_forecasts(self, refit: bool = False,
+                          batch_series: int = FORECAST_BATCH_SERIES) -> int:
+        """Fold new daily rollups into the stored forecasts; returns series updated.
+
+        Known series are rewound to the state before their last observed day
+        and fed every day bucket from there on, so a day that gained snapshots
+        since the last refresh is replayed, not counted twice. Series without
+        fitted parameters yet (new, or under MIN_FIT_OBS days) are refit from
+        their full history; refit=True refits everything.
+        """
+        if refit:
+            self.db.query(PriceForecast).delete()
+
+        f, r = PriceForecast, PriceRollup
+        query = (
+            self.db.query(
+                r.product_key, r.store, r.bucket_start, (r.sum_ppu / r.samples).label("ppu"),
+                f.alpha, f.beta, f.n_obs, f.prev_level, f.prev_trend, f.prev_n_obs, f.prev_sse, f.prev_bucket,
+            )
+            .outerjoin(f, f.product_key == r.product_key)
+            .filter(r.resolution == "day")
+            .filter(or_(f.product_key.is_(None), f.n_obs < MIN_FIT_OBS, r.bucket_start > f.prev_bucket))
+            .order_by(r.product_key, r.bucket_start)
+            .yield_per(BULK_CHUNK_SIZE)
+        )
+
+        # Computed first, written after the read cursor is done
+        fitted = []
+        batch = []
+        for row in query:
+            if len(batch) >= batch_series and row.product_key != batch[-1][-1].product_key:
+                fitted.extend(self._fit_forecast_batch(batch))
+                batch = []
+            if not batch or row.product_key != batch[-1][-1].product_key:
+                batch.append([])
+            batch[-1].append(row)
+        fitted.extend(self._fit_forecast_batch(batch))
+
+        for offset in range(0, len(fitted), BULK_CHUNK_SIZE):
+            self._upsert_forecasts(fitted[offset:offset + BULK_CHUNK_SIZE])
+        if fitted:
+            self._bump_data_version()
+        self.db.commit()
+        return len(fitted)
+
+    @staticmethod
+    def _fit_forecast_batch(series: list[list]) -> list[dict]:
+        """Run the smoother over one batch of series (each a list of day rows)."""
+        known = [rows for rows in series if rows[0].n_obs is not None and rows[0].n_obs >= MIN_FIT_OBS]
+        fresh = [rows for rows in series if rows[0].n_obs is None or rows[0].n_obs < MIN_FIT_OBS]
+        now = datetime.now()
+        fitted = []
+
+        for group in (known, fresh):
+            if not group:
+                continue
+            flat = [row for rows in group for row in rows]
+            keys, first_day, matrix = build_matrix(
+                [row.product_key for row in flat],
+                to_days([row.bucket_start for row in flat]),
+                [row.ppu for row in flat],
+            )
+            # build_matrix keeps first-seen order, which is group order
+            heads = [rows[0] for rows in group]
+            if group is known:
+                start = HoltState(
+                    level=np.array([h.prev_level for h in heads], dtype=float),
+                    trend=np.array([h.prev_trend for h in heads], dtype=float),
+                    n_obs=np.array([h.prev_n_obs for h in heads], dtype=np.int64),
+                    sse=np.array([h.prev_sse for h in heads], dtype=float),
+                    last_day=to_days([h.prev_bucket for h in heads]).astype(float),
+                )
+                alpha = np.array([h.alpha for h in heads], dtype=float)
+                beta = np.array([h.beta for h in heads], dtype=float)
+                state, before = holt_update(start, alpha, beta, matrix, first_day)
+            else:
+                alpha, beta, state, before = holt_fit(matrix, first_day)
+
+            last_bucket = from_days(state.last_day.astype(np.int64)).astype("datetime64[s]").tolist()
+            has_before = before.n_obs > 0
+            prev_bucket = from_days(np.where(has_before, before.last_day, 0).astype(np.int64)).astype("datetime64[s]").tolist()
+            columns = {
+                "alpha": alpha.tolist(), "beta": beta.tolist(),
+                "level": state.level.tolist(), "trend": state.trend.tolist(),
+                "n_obs": state.n_obs.tolist(), "sse": state.sse.tolist(),
+                "prev_level": [v if ok else None for v, ok in zip(before.level.tolist(), has_before)],
+                "prev_trend": before.trend.tolist(),
+                "prev_n_obs": before.n_obs.tolist(), "prev_sse": before.sse.tolist(),
+            }
+            for i, key in enumerate(keys.tolist()):
+                fitted.append({
+                    "product_key": key,
+                    "store": heads[i].store,
+                    **{name: values[i] for name, values in columns.items()},
+                    "last_bucket": last_bucket[i],
+                    "prev_bucket": prev_bucket[i] if has_before[i] else None,
+                    "updated_at": now,
+                })
+        return fitted
+
+    def _upsert_forecasts(self, rows: list[dict]):
+        dialect_insert = _UPSERT_DIALECTS.get(self.db.get_bind().dialect.name)
+        if dialect_insert is None:
+            for row in rows:
+                self.db.merge(PriceForecast(**row))
+            return
+
+        table = PriceForecast.__table__
+        statement = dialect_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.product_key],
+            set_={column: statement.excluded[column] for column in FORECAST_COLUMNS},
+        )
+        self.db.execute(statement, rows)
+
+    def get_price_forecast(self, category: str, horizon: int = FORECAST_HORIZON_DAYS) -> list[dict]:
+        """Per-store mean unit-price forecast for products in `category`.
+
+        Reads the stored smoother state only (see refresh_forecasts). Rows have
+        store_name, forecast_date, price_per_unit and series (products averaged),
+        for the `horizon` days after the newest observed day.
+        """
+        results = (
+            self.db.query(PriceForecast)
+            .filter(PriceForecast.product_key.in_(self._category_keys(category).scalar_subquery()))
+            .all()
+        )
+        if not results:
+            return []
+
+        last_day = to_days([r.last_bucket for r in results])
+        newest = int(last_day.max())
+        current = last_day >= newest - FORECAST_MAX_STALE_DAYS
+        days = np.arange(newest + 1, newest + horizon + 1)
+        values = holt_forecast(
+            [r.level for r in results], [r.trend for r in results], last_day, days,
+        )
+        dates = from_days(days).astype("datetime64[s]").tolist()
+        stores = np.array([r.store for r in results], dtype=object)
+
+        forecast = []
+        for store in sorted(set(stores[current].tolist())):
+            mask = current & (stores == store)
+            means = values[mask].mean(axis=0)
+            for date, value in zip(dates, means.tolist()):
+                forecast.append({
+                    "store_name": store,
+                    "forecast_date": date,
+                    "price_per_unit": value,
+                    "series": int(mask.sum()),
+                })
+        return forecast
+
+    @staticmethod
+    def _contains(column, query: str):
+        escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return column.ilike(f"%{escaped}%", escape="\\")
+
+    def get_ranking_summary(self, category: str, query: str | None = None) -> dict:
+        """Counts and unit-price bounds for the ranking, from one aggregate query.
+
+        Mirrors the dashboard filter: only priced rows (price_per_unit > 0)
+        count, and `query` narrows them only if it matches something
+        (query_applied tells the caller whether to pass it to get_ranking_page).
+        """
+        valid = LatestPrice.price_per_unit > 0
+        columns = [
+            func.count().label("total"),
+            func.sum(case((valid, 1), else_=0)).label("count"),
+            func.min(case((valid, LatestPrice.price_per_unit))).label("min_ppu"),
+            func.max(case((valid, LatestPrice.price_per_unit))).label("max_ppu"),
+        ]
+        if query:
+            matched = and_(valid, self._contains(LatestPrice.title, query))
+            columns += [
+                func.sum(case((matched, 1), else_=0)).label("q_count"),
+                func.min(case((matched, LatestPrice.price_per_unit))).label("q_min_ppu"),
+                func.max(case((matched, LatestPrice.price_per_unit))).label("q_max_ppu"),
+            ]
+
+        r = (
+            self.db.query(*columns)
+            .filter(self._in_category(category))
+            .one()
+        )
+
+        query_applied = bool(query) and (r.q_count or 0) > 0
+        prefix = "q_" if query_applied else ""
+        return {
+            "total": r.total or 0,
+            "count": getattr(r, f"{prefix}count") or 0,
+            "min_price_per_unit": getattr(r, f"{prefix}min_ppu"),
+            "max_price_per_unit": getattr(r, f"{prefix}max_ppu"),
+            "query_applied": query_applied,
+        }
+
+    def get_ranking_page(self, category: str, query: str | None = None, limit: int = 10,
+                         after: tuple[float, str] | None = None) -> tuple[list[dict], tuple[float, str] | None]:
+        """One page of the unit-price ranking, cheapest first.
+
+        Keyset pagination: pass the returned cursor as `after` to get the next
+        page; the cursor is None on the last page.
+        """
+        q = (
+            self.db.query(LatestPrice)
+            .filter(self._in_category(category))
+            .filter(LatestPrice.price_per_unit > 0)
+        )
+        if query:
+            q = q.filter(self._contains(LatestPrice.title, query))
+        if after is not None:
+            after_ppu, after_key = after
+            q = q.filter(or_(
+                LatestPrice.price_per_unit > after_ppu,
+                and_(LatestPrice.price_per_unit == after_ppu, LatestPrice.product_key > after_key),
+            ))
+
+        results = (
+            q.order_by(LatestPrice.price_per_unit.asc(), LatestPrice.product_key.asc())
+            .limit(limit + 1)
+            .all()
+        )
+
+        page = results[:limit]
+        cursor = None
+        if len(results) > limit:
+            last = page[-1]
+            cursor = (last.price_per_unit, last.product_key)
+        return [self._to_dict(r) for r in page], cursor
+
+    def get_current_prices_by_product(self, category: str) -> list[dict]:
+        """One row per product in `category`: its newest price, cheapest unit price first."""
+        results = (
+            self.db.query(LatestPrice)
+            .filter(self._in_category(category))
+            .order_by(LatestPrice.price_per_unit.asc())
+            .all()
+        )
+        return [self._to_dict(r) for r in results]
+
+    def _title_filter(self, query, keyword: str):
+        """Restrict `query` to titles containing `keyword`, via the search index if present."""
+        if search_backend(self.db) == "fts5":
+            match = fts_phrase_prefix(keyword)
+            if match is None:
+                return query
+            return query.filter(
+                text(f"{search_key_column(self.db)} IN "
+                     f"(SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :title_match)")
+            ).params(title_match=match)
+        # pg_trgm makes this an index scan on PostgreSQL
+        return query.filter(Product.title.ilike(f"%{keyword}%"))
+
+    @staticmethod
+    def _to_dict(r) -> dict:
+        return {
+            "product_name": r.title,
+            "store_name": r.store,
+            "product_url": r.url,
+            "price_per_unit": r.price_per_unit,
+            "normalized_unit": r.normalized_unit,
+            "normalized_unit_qty": r.normalized_unit_qty,
+            "price": r.price,
+            "timestamp": r.timestamp
+        }
 
     def get_latest_prices_by_product(self, keyword: str):
 
         results = (
-            self.db.query(Product)
-            .filter(Product.title.ilike(f"%{keyword}%"))
+            self._title_filter(self.db.query(Product), keyword)
             .order_by(Product.price_per_unit.asc())
             .all()
         )
 
-        mapped = []
-        for r in results:
-            mapped.append({
-                "product_name": r.title,
-                "store_name": r.store,
-                "product_url": r.url,
-                "price_per_unit": r.price_per_unit,
-                "normalized_unit": r.normalized_unit,
-                "price": r.price,
-                "timestamp": r.timestamp
-            })
+        return [self._to_dict(r) for r in results]
+
+    def search_products(self, query: str, limit: int = 50) -> list[dict]:
+        """Ranked title search: every word matches as a prefix, best matches first.
+
+        Uses FTS5 bm25 ranking on SQLite; other backends fall back to
+        AND-ed ILIKE terms ordered by unit price.
+        """
+        if search_backend(self.db) == "fts5":
+            match = fts_all_prefixes(query)
+            if match is None:
+                return []
+            ranked = text(
+                f"SELECT rowid AS product_rowid, rank AS score FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH :match ORDER BY rank LIMIT :limit"
+            ).columns().subquery()
+            results = (
+                self.db.query(Product)
+                .join(ranked, text(f"{search_key_column(self.db)} = product_rowid"))
+                .params(match=match, limit=limit)
+                .order_by(text("score"))
+                .limit(limit)
+                .all()
+            )
+        else:
+            tokens = tokenize(query)
+            if not tokens:
+                return []
+            q = self.db.query(Product)
+            for token in tokens:
+                q = q.filter(Product.title.ilike(f"%{token}%"))
+            results = q.order_by(Product.price_per_unit.asc()).limit(limit).all()
+
+        return [self._to_dict(r) for r in results]
+
+
+class ManifestRepository:
+    """Tracks which dataset files have been ingested (path, size, mtime, hash),
+    and how far the ingest daemon got into files it has not finished.
 
-        return mapped
+    Usage:
+        manifest = ManifestRepository(db)
+        entries = manifest.load_all()
+        manifest.record(path, size, mtime, content_hash, rows)
+    """
+
+    def __init__(self, db_session):
+        self.db = db_session
+
+    def load_all(self) -> dict[str, IngestManifest]:
+        return {entry.path: entry for entry in self.db.query(IngestManifest).all()}
+
+    def get(self, path: str) -> IngestManifest | None:
+        return self.db.get(IngestManifest, path)
+
+    def progress(self, path: str) -> IngestProgress | None:
+        """The daemon's last committed checkpoint in `path` (see ProductRepository.insert_products)."""
+        return self.db.get(IngestProgress, path)
+
+    def record(self, path: str, size: int, mtime: float, content_hash: str, rows: int):
+        self.db.merge(IngestManifest(
+            path=path,
+            size=size,
+            mtime=mtime,
+            content_hash=content_hash,
+            rows=rows,
+            ingested_at=datetime.now(),
+        ))
+        self.db.commit()
+
+
+class AlertRepository:
+    """Reads and acknowledges price-drop alerts in the outbox.
+
+    Usage:
+        alerts = AlertRepository(db)
+        for alert in alerts.pending():
+            notify(alert)
+        alerts.mark_delivered([alert["id"] for alert in batch])
+    """
+
+    def __init__(self, db_session):
+        self.db = db_session
+
+    def pending(self, limit: int = 100) -> list[dict]:
+        results = (
+            self.db.query(AlertOutbox)
+            .filter(AlertOutbox.delivered_at.is_(None))
+            .order_by(AlertOutbox.id.asc())
+            .limit(limit)
+            .all()
+        )
+        return [
+            {column.name: getattr(r, column.name) for column in AlertOutbox.__table__.columns}
+            for r in results
+        ]
+
+    def mark_delivered(self, ids: list[int]) -> int:
+        if not ids:
+            return 0
+        result = self.db.execute(
+            update(AlertOutbox)
+            .where(AlertOutbox.id.in_(ids))
+            .values(delivered_at=datetime.now())
+        )
+        self.db.commit()
+        return result.rowcount
@@ -0,0 +1,131 @@
+from __future__ import annotations
+import re
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from db.compact import COMPACT, INTERVALS, ensure_history_layout
+
+'''
+    Title search index maintained at write time.
+
+    SQLite: an external-content FTS5 table (products_fts) kept in sync with
+    products by triggers, so every insert path (bulk Core or ORM) indexes its
+    rows. PostgreSQL: a pg_trgm GIN index, which lets ILIKE '%kw%' use an index.
+    Anything else (or SQLite built without FTS5) falls back to ILIKE scans.
+
+    In the normalized history layouts (db.compact) titles live once per product,
+    so the index covers dim_products and matches join on products.product_ref
+    instead of products.rowid.
+'''
+
+FTS_TABLE = "products_fts"
+
+# layout -> (content table, its key column, the `products` column holding that key)
+_CONTENT = {
+    COMPACT: ("dim_products", "id", "products.product_ref"),
+    INTERVALS: ("dim_products", "id", "products.product_ref"),
+}
+_LEGACY_CONTENT = ("products", "rowid", "products.rowid")
+
+
+def _sqlite_ddl(content: str, key: str) -> list[str]:
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+        f"USING fts5(title, content='{content}', content_rowid='{key}')",
+        f"""CREATE TRIGGER IF NOT EXISTS {content}_fts_ai AFTER INSERT ON {content} BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, title) VALUES (new.{key}, new.title);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {content}_fts_ad AFTER DELETE ON {content} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title) VALUES ('delete', old.{key}, old.title);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {content}_fts_au AFTER UPDATE OF title ON {content} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title) VALUES ('delete', old.{key}, old.title);
+            INSERT INTO {FTS_TABLE}(rowid, title) VALUES (new.{key}, new.title);
+        END""",
+    ]
+
+
+def _postgres_ddl(content: str) -> list[str]:
+    return [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        f"CREATE INDEX IF NOT EXISTS ix_{content}_title_trgm ON {content} USING gin (title gin_trgm_ops)",
+    ]
+
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# engine url -> "fts5" | "trgm" | None
+_backends: dict[str, str | None] = {}
+
+
+def ensure_search_index(engine) -> str | None:
+    """Create the search index for this engine if possible; returns the backend used."""
+    key = str(engine.url)
+    if key in _backends:
+        return _backends[key]
+
+    content, content_key, _ = _CONTENT.get(ensure_history_layout(engine), _LEGACY_CONTENT)
+    backend = None
+    try:
+        with engine.begin() as conn:
+            if engine.dialect.name == "sqlite":
+                existed = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": FTS_TABLE}
+                ).first()
+                for ddl in _sqlite_ddl(content, content_key):
+                    conn.exec_driver_sql(ddl)
+                if not existed:
+                    # Index rows that were written before the index existed
+                    conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+                backend = "fts5"
+            elif engine.dialect.name == "postgresql":
+                for ddl in _postgres_ddl(content):
+                    conn.exec_driver_sql(ddl)
+                backend = "trgm"
+    except DBAPIError:
+        # No FTS5 module / no permission for the extension: plain ILIKE it is
+        backend = None
+
+    _backends[key] = backend
+    return backend
+
+
+def drop_search_index(engine):
+    """Drop the SQLite FTS table and its triggers (before the content table changes)."""
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            for content, _, _ in (_LEGACY_CONTENT, *_CONTENT.values()):
+                for suffix in ("ai", "ad", "au"):
+                    conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {content}_fts_{suffix}")
+            conn.exec_driver_sql(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    _backends.pop(str(engine.url), None)
+
+
+def search_backend(session) -> str | None:
+    return ensure_search_index(session.get_bind())
+
+
+def search_key_column(session) -> str:
+    """The `products` column that matches the search index rowid / key."""
+    return _CONTENT.get(ensure_history_layout(session.get_bind()), _LEGACY_CONTENT)[2]
+
+
+def tokenize(query: str) -> list[str]:
+    return _TOKEN.findall(query.lower())
+
+
+def fts_phrase_prefix(query: str) -> str | None:
+    """'chicken breast' -> '"chicken breast"*' (adjacent words, last one a prefix)."""
+    tokens = tokenize(query)
+    if not tokens:
+        return None
+    return '"' + " ".join(tokens) + '"*'
+
+
+def fts_all_prefixes(query: str) -> str | None:
+    """'tp 12 rol' -> '"tp"* "12"* "rol"*' (every word as a prefix, any order)."""
+    tokens = tokenize(query)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
@@ -2,18 +2,67 @@ import os
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
+from db.concurrency import configure_sqlite_writes, connect_args, create_read_engine
+
 # Use environment DB_URL or fall back to local SQLite for development
 DB_URL = os.getenv("DB_URL") or "sqlite:///./basket.db"
+# Dashboard reads; defaults to the same database through its own pool
+DB_READ_URL = os.getenv("DB_READ_URL") or DB_URL
 
-ENGINE_KWARGS = {"check_same_thread": False} if "sqlite" in DB_URL else {}
+ENGINE_KWARGS = connect_args(DB_URL)
 
 engine = create_engine(DB_URL, connect_args=ENGINE_KWARGS)
+configure_sqlite_writes(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Read-only sessions, each one snapshot of the data (see db.concurrency)
+read_engine = create_read_engine(DB_READ_URL)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+
+def add_missing_columns(engine, metadata) -> list[str]:
+    """Add model columns (and their indexes) that an older DB lacks; returns "table.column" names added.
+
+    create_all only creates missing tables, so new nullable columns such as
+    products.category would otherwise never reach an existing database.
+    """
+    from sqlalchemy import inspect
+    inspector = inspect(engine)
+    # Views (the compact layout's `products`) are not altered
+    existing = set(inspector.get_table_names())
+    added = []
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in existing:
+                continue
+            have = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in have:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+                    added.append(f"{table.name}.{column.name}")
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+    return added
+
+
 # Ensure models are created when the session module is imported
 try:
     from db.models import Base
-    Base.metadata.create_all(bind=engine)
-except Exception:
+    from db.compact import HISTORY_TABLES, ensure_history_layout
+    from db.search import ensure_search_index
+    from db.repository import ProductRepository
+except ImportError:
     # If models cannot be imported yet, ignore and allow repository to create later
     pass
+else:
+    # Schema and migration errors propagate: the app would otherwise fail later on missing tables
+    # Snapshot history is either the legacy `products` table or the compact tables
+    Base.metadata.create_all(bind=engine, tables=[t for t in Base.metadata.sorted_tables if t not in HISTORY_TABLES])
+    ensure_history_layout(engine)
+    add_missing_columns(engine, Base.metadata)
+    ensure_search_index(engine)
+    # Databases whose history predates latest_prices / price_rollups: derive them once
+    with SessionLocal() as db:
+        for table, rows in ProductRepository(db).backfill_derived_tables().items():
+            print(f"Backfilled {table} from the existing history ({rows} rows)")
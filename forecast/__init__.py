@@ -0,0 +1,2 @@
+# forecast package initializer
+# Price forecasting models fitted over the price rollups.
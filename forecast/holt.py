@@ -0,0 +1,149 @@
+from __future__ import annotations
+from dataclasses import dataclass, fields
+
+import numpy as np
+import pandas as pd
+
+'''
+    Batched Holt (level + trend) exponential smoothing in NumPy.
+
+    Every series in a batch advances together: observations are laid out as a
+    (series x day) matrix with NaN for days without a price, and the smoother
+    walks the day axis once, updating all series with array operations. Days
+    without an observation are skipped rather than imputed - the next update
+    extrapolates across the gap (level + gap * trend) - so irregular scrape
+    schedules need no resampling.
+
+    Smoothing parameters are picked per series from a small grid by one-step
+    ahead squared error; the grid is just another leading array axis.
+'''
+
+DEFAULT_ALPHA = 0.5
+DEFAULT_BETA = 0.1
+ALPHA_GRID = (0.2, 0.5, 0.8)
+BETA_GRID = (0.02, 0.1, 0.3)
+# Series with fewer observations keep the default parameters
+MIN_FIT_OBS = 4
+
+EPOCH = np.datetime64("1970-01-01", "D")
+
+
+@dataclass
+class HoltState:
+    """Smoother state per series; last_day is the day number of the last observation."""
+    level: np.ndarray
+    trend: np.ndarray
+    n_obs: np.ndarray
+    sse: np.ndarray
+    last_day: np.ndarray
+
+    @classmethod
+    def empty(cls, shape) -> HoltState:
+        return cls(
+            level=np.full(shape, np.nan),
+            trend=np.zeros(shape),
+            n_obs=np.zeros(shape, dtype=np.int64),
+            sse=np.zeros(shape),
+            last_day=np.full(shape, np.nan),
+        )
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+    def copy(self) -> HoltState:
+        return HoltState(**{name: a.copy() for name, a in self.arrays().items()})
+
+    def take(self, index: np.ndarray) -> HoltState:
+        """Pick one grid row per series: arrays (K, S) -> (S,)."""
+        return HoltState(**{
+            name: np.take_along_axis(a, index[None, :], axis=0)[0]
+            for name, a in self.arrays().items()
+        })
+
+
+def to_days(timestamps) -> np.ndarray:
+    """Datetimes -> integer day numbers."""
+    return (np.asarray(timestamps, dtype="datetime64[D]") - EPOCH).astype(np.int64)
+
+
+def from_days(days) -> np.ndarray:
+    return EPOCH + np.asarray(days, dtype=np.int64)
+
+
+def build_matrix(keys, days, values) -> tuple[np.ndarray, int, np.ndarray]:
+    """Long (key, day, value) rows -> (unique keys, first day, series x day matrix)."""
+    codes, unique_keys = pd.factorize(np.asarray(keys, dtype=object))
+    days = np.asarray(days, dtype=np.int64)
+    first_day = int(days.min()) if len(days) else 0
+    matrix = np.full((len(unique_keys), int(days.max()) - first_day + 1 if len(days) else 0), np.nan)
+    matrix[codes, days - first_day] = values
+    return np.asarray(unique_keys, dtype=object), first_day, matrix
+
+
+def holt_update(state: HoltState, alpha, beta, observations: np.ndarray,
+                first_day: int) -> tuple[HoltState, HoltState]:
+    """
+    Feed `observations` (series x day, NaN = no data) into `state`.
+
+    state arrays may carry a leading grid axis, (K, S), with alpha/beta shaped
+    (K, 1). Days must come after each series' last_day. Returns the new state
+    and the state just before each series' last observation, so the most
+    recent day can be replayed when it receives more data later.
+    """
+    state = state.copy()
+    before = state.copy()
+    alpha = np.asarray(alpha, dtype=float)
+    beta = np.asarray(beta, dtype=float)
+
+    for t in range(observations.shape[1]):
+        y = observations[:, t]
+        has = ~np.isnan(y)
+        if not has.any():
+            continue
+        day = first_day + t
+        seen = has & (state.n_obs > 0)
+        fresh = has & (state.n_obs == 0)
+
+        for name, a in before.arrays().items():
+            np.copyto(a, getattr(state, name), where=has)
+
+        gap = np.where(seen, day - state.last_day, 1.0)
+        pred = state.level + gap * state.trend
+        err = y - pred
+        level = alpha * y + (1 - alpha) * pred
+        trend = beta * (level - state.level) / gap + (1 - beta) * state.trend
+
+        state.level = np.where(seen, level, np.where(fresh, y, state.level))
+        state.trend = np.where(seen, trend, state.trend)
+        state.sse = np.where(seen, state.sse + err * err, state.sse)
+        state.n_obs = state.n_obs + has
+        state.last_day = np.where(has, float(day), state.last_day)
+
+    return state, before
+
+
+def holt_fit(observations: np.ndarray, first_day: int) -> tuple[np.ndarray, np.ndarray, HoltState, HoltState]:
+    """
+    Fit fresh series: run the whole parameter grid at once, keep the best per series.
+
+    Returns (alpha, beta, state, state before the last observation).
+    """
+    alphas, betas = np.meshgrid(ALPHA_GRID, BETA_GRID, indexing="ij")
+    alphas, betas = alphas.reshape(-1, 1), betas.reshape(-1, 1)
+    shape = (len(alphas), observations.shape[0])
+
+    state, before = holt_update(HoltState.empty(shape), alphas, betas, observations, first_day)
+
+    score = state.sse / np.maximum(state.n_obs - 1, 1)
+    best = np.argmin(score, axis=0)
+    default = int(np.flatnonzero((alphas[:, 0] == DEFAULT_ALPHA) & (betas[:, 0] == DEFAULT_BETA))[0])
+    best = np.where(state.n_obs[0] < MIN_FIT_OBS, default, best)
+
+    return alphas[best, 0], betas[best, 0], state.take(best), before.take(best)
+
+
+def holt_forecast(level, trend, last_day, days) -> np.ndarray:
+    """Point forecasts (series x days) for absolute day numbers; never below zero."""
+    ahead = np.asarray(days, dtype=float)[None, :] - np.asarray(last_day, dtype=float)[:, None]
+    values = np.asarray(level, dtype=float)[:, None] + ahead * np.asarray(trend, dtype=float)[:, None]
+    return np.maximum(values, 0.0)
@@ -0,0 +1,2 @@
+# ingest package initializer
+# Streaming readers and helpers used by the ingest pipeline.
@@ -0,0 +1,120 @@
+from __future__ import annotations
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+'''
+    Price-drop alerts, detected while rows are ingested.
+
+    Each incoming row is compared with its product's current entry in
+    latest_prices (a primary-key lookup per chunk), so detection costs
+    O(new rows) and never scans history. Watchlist rules are only evaluated
+    for rows whose unit price actually fell.
+
+    Sinks:
+    - OutboxSink: rows in alert_outbox, written in the same transaction as the
+      chunk that caused them (a notifier polls pending rows).
+    - JsonlSink: one JSON object per line, appended after the chunk commits;
+      handy for local testing.
+'''
+
+
+@dataclass(frozen=True)
+class WatchRule:
+    keyword: str                              # case-insensitive title substring
+    min_drop_pct: float = 5.0
+    store: str | None = None
+    max_price_per_unit: float | None = None   # only alert below this unit price
+    name: str | None = None
+
+    def matches(self, event: dict) -> bool:
+        if event["drop_pct"] < self.min_drop_pct:
+            return False
+        if self.store and (event["store"] or "").lower() != self.store.lower():
+            return False
+        if self.max_price_per_unit is not None and event["new_price_per_unit"] > self.max_price_per_unit:
+            return False
+        return self.keyword.lower() in (event["title"] or "").lower()
+
+    @property
+    def label(self) -> str:
+        return self.name or self.keyword
+
+
+def load_watchlist(path: str | Path) -> list[WatchRule]:
+    """Read watchlist rules from a JSON list of objects with WatchRule fields."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [WatchRule(**rule) for rule in json.load(f)]
+
+
+class OutboxSink:
+    transactional = True
+
+    def write(self, events: list[dict], db):
+        from sqlalchemy import insert
+        from db.models import AlertOutbox
+
+        db.execute(insert(AlertOutbox.__table__), events)
+
+
+class JsonlSink:
+    transactional = False
+
+    def __init__(self, path: str | Path):
+        self.path = str(path)
+
+    def write(self, events: list[dict], db=None):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event, default=_json_default) + "\n")
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+@dataclass
+class AlertStage:
+    rules: list[WatchRule]
+    sink: OutboxSink | JsonlSink = field(default_factory=OutboxSink)
+
+    def detect(self, rows: list[dict], keys: list[str], previous: dict[str, tuple]) -> list[dict]:
+        """
+        Drop events for `rows` (with their product `keys`) against `previous`,
+        {product_key: (price_per_unit, timestamp)}. `previous` is updated in
+        place, so repeats of a product within the batch compare to each other.
+        """
+        events = []
+        for row, key in zip(rows, keys):
+            ppu = row["price_per_unit"]
+            if ppu is None or ppu <= 0:
+                continue
+            before = previous.get(key)
+            previous_ppu, previous_ts = before if before else (None, None)
+            timestamp = row["timestamp"]
+            if previous_ts is not None and timestamp is not None and timestamp < previous_ts:
+                # An older dump being re-ingested: not a price change now
+                continue
+            previous[key] = (ppu, timestamp)
+            if previous_ppu is None or previous_ppu <= 0 or ppu >= previous_ppu:
+                continue
+
+            event = {
+                "product_key": key,
+                "store": row["store"],
+                "title": row["title"],
+                "url": row["url"],
+                "old_price_per_unit": previous_ppu,
+                "new_price_per_unit": ppu,
+                "drop_pct": round((previous_ppu - ppu) / previous_ppu * 100, 2),
+                "price": row["price"],
+                "created_at": timestamp,
+            }
+            matched = [rule.label for rule in self.rules if rule.matches(event)]
+            if matched:
+                event["rule"] = ", ".join(matched)
+                events.append(event)
+        return events
@@ -0,0 +1,103 @@
+from __future__ import annotations
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import quote
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # optional: the archive is only needed for offline analytics
+    pa = ds = pq = None
+
+'''
+    Columnar archive of normalized snapshots: a Parquet dataset partitioned by
+    store and scrape date (hive layout, store=<store>/scrape_date=<YYYY-MM-DD>).
+
+    Ingest appends one file per partition per committed chunk; analytics read
+    it with partition pruning and column projection (see analytics.queries),
+    so long-range scans never touch the OLTP database. compact() merges the
+    small per-chunk files of each partition.
+'''
+
+COMPRESSION = "zstd"
+
+if pa is not None:
+    # Columns stored in the files; store and scrape_date live in the path
+    FILE_SCHEMA = pa.schema([
+        ("id", pa.string()),
+        ("product_key", pa.string()),
+        ("title", pa.string()),
+        ("price", pa.float64()),
+        ("unit", pa.string()),
+        ("normalized_unit_qty", pa.float64()),
+        ("normalized_unit", pa.string()),
+        ("price_per_unit", pa.float64()),
+        ("price_per_unit_status", pa.string()),
+        ("url", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+    ])
+    PARTITIONING = ds.partitioning(
+        pa.schema([("store", pa.string()), ("scrape_date", pa.date32())]), flavor="hive",
+    )
+
+
+class ParquetArchive:
+    def __init__(self, root: str | Path):
+        if pa is None:
+            raise RuntimeError("The Parquet archive needs pyarrow (pip install pyarrow)")
+        self.root = Path(root)
+
+    def partition_dir(self, store: str | None, day) -> Path:
+        return self.root / f"store={quote(store or 'unknown', safe='')}" / f"scrape_date={day.isoformat()}"
+
+    def write(self, rows: list[dict], keys: list[str]) -> int:
+        """Append inserted rows (with their product keys); returns rows written."""
+        partitions = defaultdict(list)
+        for row, key in zip(rows, keys):
+            if row["timestamp"] is None:
+                continue
+            partitions[(row["store"], row["timestamp"].date())].append((row, key))
+
+        batch_id = uuid.uuid4().hex
+        written = 0
+        for (store, day), items in partitions.items():
+            columns = {name: [] for name in FILE_SCHEMA.names}
+            for row, key in items:
+                for name in FILE_SCHEMA.names:
+                    columns[name].append(key if name == "product_key" else row[name])
+            directory = self.partition_dir(store, day)
+            directory.mkdir(parents=True, exist_ok=True)
+            pq.write_table(
+                pa.Table.from_pydict(columns, schema=FILE_SCHEMA),
+                directory / f"part-{batch_id}.parquet",
+                compression=COMPRESSION,
+            )
+            written += len(items)
+        return written
+
+    def dataset(self):
+        return ds.dataset(self.root, format="parquet", partitioning=PARTITIONING,
+                          schema=pa.unify_schemas([FILE_SCHEMA, PARTITIONING.schema]))
+
+    def exists(self) -> bool:
+        return self.root.exists() and any(self.root.glob("store=*/scrape_date=*/*.parquet"))
+
+    def compact(self) -> int:
+        """Merge each partition's files into one; returns partitions rewritten."""
+        rewritten = 0
+        for directory in sorted(self.root.glob("store=*/scrape_date=*")):
+            parts = sorted(directory.glob("*.parquet"))
+            if len(parts) < 2:
+                continue
+            table = pa.concat_tables(pq.read_table(part, schema=FILE_SCHEMA) for part in parts)
+            target = directory / f"part-{uuid.uuid4().hex}.parquet"
+            tmp = directory / f".{target.name}.tmp"
+            pq.write_table(table.sort_by([("product_key", "ascending"), ("timestamp", "ascending")]),
+                           tmp, compression=COMPRESSION)
+            tmp.rename(target)
+            for part in parts:
+                part.unlink()
+            rewritten += 1
+        return rewritten
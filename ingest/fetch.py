@@ -0,0 +1,285 @@
+from __future__ import annotations
+import asyncio
+import queue
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterator
+
+try:
+    import httpx
+except ImportError:  # optional: only needed to pull datasets from the Apify API
+    httpx = None
+
+'''
+    Async fetch stage: pull dataset items straight from the Apify API.
+
+    One pooled httpx.AsyncClient per run keeps connections alive across
+    pages. A dataset is read in pages of `page_size` items, with up to
+    `concurrency` pages in flight and requests spaced by a token-bucket rate
+    limiter. 429 / 5xx responses and transport errors are retried with
+    exponential backoff (honouring Retry-After). Pages are yielded in offset
+    order, so the caller sees one ordered record stream and nothing is written
+    to disk.
+
+    iter_dataset_pages() runs the event loop in a background thread behind a
+    bounded queue: fetching overlaps with the (synchronous) clean / convert /
+    insert stages without buffering more than a few pages.
+'''
+
+APIFY_API = "https://api.apify.com/v2"
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_CONCURRENCY = 4
+# Apify allows 30 requests/s per resource; stay under it
+DEFAULT_RATE = 20.0
+DEFAULT_TIMEOUT = 30.0
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+TOTAL_HEADER = "x-apify-pagination-total"
+# Pages buffered between the fetch thread and the ingest loop
+PREFETCH_PAGES = 8
+
+
+class FetchError(Exception):
+    """A request failed for good: a non-retryable status, or retries ran out."""
+
+
+@dataclass(frozen=True)
+class DatasetSource:
+    """A store and where its items live: a dataset id, or an actor's last run."""
+    store: str
+    dataset_id: str | None = None
+    actor_id: str | None = None
+
+    @property
+    def label(self) -> str:
+        return f"apify://datasets/{self.dataset_id}" if self.dataset_id else f"apify://acts/{self.actor_id}"
+
+
+def parse_source(spec: str) -> DatasetSource:
+    """Parse a CLI spec: "amazon=<datasetId>" or "amazon=actor:<actorId>"."""
+    store, sep, target = spec.partition("=")
+    if not sep or not store or not target:
+        raise ValueError(f"Expected STORE=DATASET_ID or STORE=actor:ACTOR_ID, got {spec!r}")
+    if target.startswith("actor:"):
+        return DatasetSource(store.lower(), actor_id=target.removeprefix("actor:"))
+    return DatasetSource(store.lower(), dataset_id=target)
+
+
+class RateLimiter:
+    """Token bucket: at most `rate` acquisitions per second, bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: int | None = None):
+        self.rate = rate
+        self.capacity = float(burst or max(1, int(rate)))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def backoff_delay(attempt: int, retry_after: str | None = None) -> float:
+    """Seconds to wait before retry `attempt` (0-based): Retry-After, else full-jitter exponential."""
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass  # HTTP-date form: fall back to our own schedule
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+class ApifyFetcher:
+    """
+    Paginated, concurrent reader for Apify datasets.
+
+    Usage:
+        async with ApifyFetcher(token) as fetcher:
+            async for page in fetcher.iter_pages(dataset_id):
+                ...
+    """
+
+    def __init__(self, token: str | None = None, base_url: str = APIFY_API,
+                 page_size: int = DEFAULT_PAGE_SIZE, concurrency: int = DEFAULT_CONCURRENCY,
+                 rate: float = DEFAULT_RATE, max_retries: int = MAX_RETRIES,
+                 timeout: float = DEFAULT_TIMEOUT):
+        if httpx is None:
+            raise RuntimeError("Fetching from Apify needs httpx (pip install httpx)")
+        self.token = token
+        self.base_url = base_url.rstrip("/")
+        self.page_size = page_size
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate)
+        self.client = None
+        self.requests = 0
+        self.retries = 0
+
+    async def __aenter__(self):
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=headers,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.concurrency,
+                                max_keepalive_connections=self.concurrency),
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.client.aclose()
+        self.client = None
+
+    async def _get(self, path: str, params: dict | None = None):
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            self.requests += 1
+            try:
+                response = await self.client.get(path, params=params)
+            except httpx.TransportError as e:
+                error, retry_after = f"{type(e).__name__}: {e}", None
+            else:
+                if response.is_success:
+                    return response
+                if response.status_code not in RETRY_STATUSES:
+                    raise FetchError(f"GET {path} failed (HTTP {response.status_code}: {response.text[:200]})")
+                error, retry_after = f"HTTP {response.status_code}", response.headers.get("retry-after")
+            if attempt == self.max_retries:
+                raise FetchError(f"GET {path} failed after {attempt + 1} attempts ({error})")
+            self.retries += 1
+            await asyncio.sleep(backoff_delay(attempt, retry_after))
+
+    async def resolve(self, source: DatasetSource) -> DatasetSource:
+        """Pin an actor source to the default dataset of its last successful run."""
+        if source.dataset_id:
+            return source
+        response = await self._get(f"/acts/{source.actor_id}/runs/last", {"status": "SUCCEEDED"})
+        return DatasetSource(source.store, dataset_id=response.json()["data"]["defaultDatasetId"],
+                             actor_id=source.actor_id)
+
+    async def _get_page(self, dataset_id: str, offset: int,
+                        fields: tuple[str, ...] | None = None) -> tuple[list[dict], int | None]:
+        params = {"format": "json", "clean": "true", "offset": offset, "limit": self.page_size}
+        if fields:
+            # Server-side projection: unused payloads never cross the network
+            params["fields"] = ",".join(fields)
+        response = await self._get(f"/datasets/{dataset_id}/items", params)
+        total = response.headers.get(TOTAL_HEADER)
+        return response.json(), int(total) if total is not None else None
+
+    async def iter_pages(self, dataset_id: str,
+                         fields: tuple[str, ...] | None = None) -> AsyncIterator[list[dict]]:
+        """Yield the dataset's pages in order, keeping up to `concurrency` requests in flight.
+
+        `fields` limits items to those top-level keys (the API's fields parameter).
+        """
+        first, total = await self._get_page(dataset_id, 0, fields)
+        if first:
+            yield first
+        if total is None:
+            # No pagination header: walk sequentially until a short page
+            offset, page = len(first), first
+            while len(page) == self.page_size:
+                page, _ = await self._get_page(dataset_id, offset, fields)
+                offset += len(page)
+                if page:
+                    yield page
+            return
+
+        offsets = iter(range(self.page_size, total, self.page_size))
+        window = deque()
+        try:
+            for offset in offsets:
+                window.append(asyncio.create_task(self._get_page(dataset_id, offset, fields)))
+                if len(window) >= self.concurrency:
+                    break
+            while window:
+                page, _ = await window.popleft()
+                offset = next(offsets, None)
+                if offset is not None:
+                    window.append(asyncio.create_task(self._get_page(dataset_id, offset, fields)))
+                if page:
+                    yield page
+        finally:
+            for task in window:
+                task.cancel()
+            await asyncio.gather(*window, return_exceptions=True)
+
+
+def resolve_sources(sources: list[DatasetSource], **fetcher_kwargs) -> list[DatasetSource]:
+    """Pin every source to a dataset id (concurrently), so runs can be checked against the manifest."""
+    async def resolve_all():
+        async with ApifyFetcher(**fetcher_kwargs) as fetcher:
+            return await asyncio.gather(*(fetcher.resolve(source) for source in sources))
+
+    if all(source.dataset_id for source in sources):
+        return list(sources)
+    return asyncio.run(resolve_all())
+
+
+def iter_dataset_pages(source: DatasetSource, fields: tuple[str, ...] | None = None,
+                       prefetch: int = PREFETCH_PAGES, **fetcher_kwargs) -> Iterator[list[dict]]:
+    """
+    Synchronous view of ApifyFetcher.iter_pages for the ingest loop.
+
+    The fetcher runs on its own event loop in a background thread and hands
+    pages over through a queue of at most `prefetch` pages. Closing the
+    generator early stops the fetch.
+    """
+    pages = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+    done = object()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    async def produce():
+        async with ApifyFetcher(**fetcher_kwargs) as fetcher:
+            resolved = await fetcher.resolve(source)
+            async for page in fetcher.iter_pages(resolved.dataset_id, fields):
+                # Blocking put: a full queue pauses the loop, which is the backpressure we want
+                if not put(("page", page)):
+                    return
+
+    def run():
+        try:
+            asyncio.run(produce())
+        except BaseException as e:
+            put(("error", e))
+        else:
+            put(("end", done))
+
+    thread = threading.Thread(target=run, name=f"apify-fetch-{source.store}", daemon=True)
+    thread.start()
+    try:
+        while True:
+            kind, payload = pages.get()
+            if kind == "page":
+                yield payload
+            elif kind == "error":
+                raise payload
+            else:
+                return
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,54 @@
+from __future__ import annotations
+import hashlib
+from dataclasses import dataclass
+from pathlib import Path
+
+'''
+    File fingerprints for the ingest manifest.
+
+    A file is skipped when its size and mtime match the manifest (a single
+    dict lookup, no I/O beyond stat). Only when those differ is the content
+    hashed, so a touched-but-identical file is still recognised as unchanged.
+'''
+
+HASH_BLOCK_SIZE = 1 << 20  # 1 MiB
+
+
+@dataclass(frozen=True)
+class FileFingerprint:
+    path: str
+    size: int
+    mtime: float
+
+
+def fingerprint(file_path: str | Path) -> FileFingerprint:
+    path = Path(file_path).resolve()
+    stat = path.stat()
+    return FileFingerprint(str(path), stat.st_size, stat.st_mtime)
+
+
+def hash_file(file_path: str | Path, size: int | None = None) -> str:
+    """sha256 of the file, or of its first `size` bytes."""
+    digest = hashlib.sha256()
+    remaining = size
+    with open(file_path, "rb") as f:
+        while block := f.read(HASH_BLOCK_SIZE if remaining is None else min(HASH_BLOCK_SIZE, remaining)):
+            digest.update(block)
+            if remaining is not None:
+                remaining -= len(block)
+    return digest.hexdigest()
+
+
+def is_unchanged(entry, fp: FileFingerprint) -> tuple[bool, str | None]:
+    """
+    Compare a manifest entry (or None) with the file on disk.
+
+    Returns (unchanged, content_hash); the hash is None when it did not need
+    to be computed.
+    """
+    if entry is None:
+        return False, None
+    if entry.size == fp.size and entry.mtime == fp.mtime:
+        return True, None
+    content_hash = hash_file(fp.path)
+    return content_hash == entry.content_hash, content_hash
@@ -0,0 +1,177 @@
+from __future__ import annotations
+import json
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator
+
+'''
+    Ingest run metrics: per-stage wall/CPU time and row counts, unit-price
+    status counts and a sample of titles whose unit did not parse.
+
+    Stages are timed per chunk, not per row, so instrumentation stays cheap.
+    Metrics from worker processes are plain dicts (to_dict) that merge into
+    the parent run. A run can be written as a JSON report or in the
+    Prometheus textfile-collector format.
+'''
+
+STAGES = ("fetch", "load", "clean", "convert", "classify", "insert", "forecast")
+UNPARSED_SAMPLE_SIZE = 20
+PROMETHEUS_PREFIX = "basket_ingest"
+
+
+class RunMetrics:
+    def __init__(self):
+        self.started_at = datetime.now()
+        self._wall_start = time.perf_counter()
+        self.finished_at = None
+        self.wall_seconds = None
+        self.stages = {}
+        self.statuses = Counter()
+        self.unparsed = 0
+        self.unparsed_sample = []
+        self.files = []
+        self.skipped = 0
+
+    # ---- collection ----
+
+    def _add(self, name: str, wall: float, cpu: float, rows: int):
+        stage = self.stages.setdefault(name, {"wall_seconds": 0.0, "cpu_seconds": 0.0, "rows": 0})
+        stage["wall_seconds"] += wall
+        stage["cpu_seconds"] += cpu
+        stage["rows"] += rows
+
+    @contextmanager
+    def stage(self, name: str, rows: int = 0):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self._add(name, time.perf_counter() - wall, time.process_time() - cpu, rows)
+
+    def timed_chunks(self, name: str, chunks: Iterable[list]) -> Iterator[list]:
+        """Charge the time spent producing each chunk to stage `name`."""
+        it = iter(chunks)
+        while True:
+            wall, cpu = time.perf_counter(), time.process_time()
+            chunk = next(it, None)
+            if chunk is None:
+                self._add(name, time.perf_counter() - wall, time.process_time() - cpu, 0)
+                return
+            self._add(name, time.perf_counter() - wall, time.process_time() - cpu, len(chunk))
+            yield chunk
+
+    def observe_converted(self, rows: list[dict]):
+        """Count unit-price outcomes and keep a sample of unparsed units."""
+        self.statuses.update(row["price_per_unit_status"] for row in rows)
+        for row in rows:
+            if row["normalized_unit_qty"] is None:
+                self.unparsed += 1
+                if len(self.unparsed_sample) < UNPARSED_SAMPLE_SIZE:
+                    self.unparsed_sample.append({"title": row["title"], "unit": row["unit"]})
+
+    def record_file(self, path, store: str, result: str, rows: int = 0, error: str | None = None):
+        entry = {"path": str(path), "store": store, "result": result, "rows": rows}
+        if error:
+            entry["error"] = error
+        self.files.append(entry)
+
+    def merge(self, other: dict):
+        """Fold in another process's to_dict() output."""
+        for name, stage in other.get("stages", {}).items():
+            self._add(name, stage["wall_seconds"], stage["cpu_seconds"], stage["rows"])
+        self.statuses.update(other.get("price_per_unit_status", {}))
+        unparsed = other.get("unparsed_units", {})
+        self.unparsed += unparsed.get("count", 0)
+        room = UNPARSED_SAMPLE_SIZE - len(self.unparsed_sample)
+        self.unparsed_sample.extend(unparsed.get("sample", [])[:max(room, 0)])
+        self.files.extend(other.get("files", []))
+        self.skipped += other.get("file_results", {}).get("skipped", 0)
+
+    def finish(self):
+        self.finished_at = datetime.now()
+        self.wall_seconds = time.perf_counter() - self._wall_start
+
+    # ---- export ----
+
+    def to_dict(self) -> dict:
+        stages = {}
+        for name in sorted(self.stages, key=lambda s: (STAGES.index(s) if s in STAGES else len(STAGES), s)):
+            stage = self.stages[name]
+            wall = stage["wall_seconds"]
+            stages[name] = {
+                "wall_seconds": round(wall, 6),
+                "cpu_seconds": round(stage["cpu_seconds"], 6),
+                "rows": stage["rows"],
+                "rows_per_sec": round(stage["rows"] / wall, 1) if wall else None,
+            }
+        results = Counter(f["result"] for f in self.files)
+        if self.skipped:
+            results["skipped"] += self.skipped
+        return {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "finished_at": self.finished_at.isoformat(timespec="seconds") if self.finished_at else None,
+            "wall_seconds": round(self.wall_seconds, 6) if self.wall_seconds is not None else None,
+            "files": self.files,
+            "file_results": dict(results),
+            "rows_inserted": sum(f["rows"] for f in self.files if f["result"] == "ingested"),
+            "stages": stages,
+            "price_per_unit_status": dict(self.statuses),
+            "unparsed_units": {"count": self.unparsed, "sample": self.unparsed_sample},
+        }
+
+    def write_json(self, path: str | Path):
+        _write_atomic(path, json.dumps(self.to_dict(), indent=2) + "\n")
+
+    def to_prometheus(self) -> str:
+        report = self.to_dict()
+        p = PROMETHEUS_PREFIX
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples: list[tuple[dict, float]]):
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f"{p}_{name}{{{label_text}}} {value}" if label_text else f"{p}_{name} {value}")
+
+        stages = report["stages"]
+        metric("stage_wall_seconds", "gauge", "Wall time spent per stage in the last run.",
+               [({"stage": s}, v["wall_seconds"]) for s, v in stages.items()])
+        metric("stage_cpu_seconds", "gauge", "CPU time spent per stage in the last run.",
+               [({"stage": s}, v["cpu_seconds"]) for s, v in stages.items()])
+        metric("stage_rows", "gauge", "Rows handled per stage in the last run.",
+               [({"stage": s}, v["rows"]) for s, v in stages.items()])
+        metric("stage_rows_per_second", "gauge", "Stage throughput in the last run.",
+               [({"stage": s}, v["rows_per_sec"] or 0) for s, v in stages.items()])
+        metric("price_per_unit_status_rows", "gauge", "Converted rows per price_per_unit_status in the last run.",
+               [({"status": s}, n) for s, n in sorted(report["price_per_unit_status"].items())])
+        metric("unparsed_unit_rows", "gauge", "Rows whose unit could not be normalized in the last run.",
+               [({}, report["unparsed_units"]["count"])])
+        metric("files", "gauge", "Dataset files per outcome in the last run.",
+               [({"result": r}, n) for r, n in sorted(report["file_results"].items())])
+        metric("rows_inserted", "gauge", "Rows inserted in the last run.", [({}, report["rows_inserted"])])
+        metric("run_duration_seconds", "gauge", "Wall time of the last run.", [({}, report["wall_seconds"] or 0)])
+        metric("last_run_timestamp_seconds", "gauge", "Unix time the last run finished.",
+               [({}, round((self.finished_at or datetime.now()).timestamp(), 3))])
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str | Path):
+        _write_atomic(path, self.to_prometheus())
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _write_atomic(path: str | Path, content: str):
+    # The textfile collector may read at any moment: never expose a half-written file
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp, path)
@@ -0,0 +1,179 @@
+from __future__ import annotations
+import multiprocessing as mp
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+from queue import Empty
+
+from ingest.manifest import FileFingerprint, hash_file
+from ingest.metrics import RunMetrics
+from ingest.reader import DEFAULT_CHUNK_SIZE
+from ingest.stages import iter_converted_chunks
+
+'''
+    Parallel ingest: producer processes read, clean and convert files, and a
+    single writer process owns the DB connection.
+
+    Producers take files in task order; at most FILES_AHEAD_PER_WORKER *
+    workers files are in flight (taken but not yet written), and each one
+    streams its converted chunks through its own bounded queue (a "lane",
+    reused by every lanes-th file). The writer commits files strictly in task
+    order, reading each file's lane to its end before the next, so it never
+    holds chunks of files further ahead: their producers block on a full lane
+    instead, and memory stays bounded by chunks in flight (lanes * queue_size),
+    not by file size. Rows therefore reach the DB in the same order, and with
+    the same checkpoints, for any worker count.
+
+    Every chunk commits its file's ingest_progress checkpoint and the manifest
+    entry is written only after the file's last chunk, so a file whose
+    producer or insert failed resumes after its committed chunks next run.
+'''
+
+# Chunks queued per file in flight
+QUEUE_CHUNKS_PER_FILE = 2
+FILES_AHEAD_PER_WORKER = 2
+
+
+@dataclass(frozen=True)
+class FileTask:
+    fingerprint: FileFingerprint
+    store: str
+    content_hash: str | None = None
+    # (records, rows) already committed by earlier runs, see run_ingest_pipeline.resume_point
+    resume: tuple[int, int] = (0, 0)
+
+
+def default_workers() -> int:
+    return max((os.cpu_count() or 2) - 1, 1)
+
+
+def _produce_file(index: int, task: FileTask, chunks, chunk_size: int, vectorized: bool):
+    """Convert one file into its lane, ending with a done or error message carrying its metrics."""
+    path = task.fingerprint.path
+    metrics = RunMetrics()
+    try:
+        content_hash = task.content_hash or hash_file(path)
+        for chunk in iter_converted_chunks(path, task.store, chunk_size, vectorized, metrics, skip=task.resume[0]):
+            chunks.put((index, "chunk", chunk))
+    except Exception as e:
+        chunks.put((index, "error", (f"{type(e).__name__}: {e}", metrics.to_dict())))
+        return
+    chunks.put((index, "done", (content_hash, metrics.to_dict())))
+
+
+def _produce_files(tasks, lanes, slots, chunk_size: int, vectorized: bool):
+    while True:
+        # Take a slot before the task: the files in flight are then always the
+        # next len(lanes) unwritten ones, so no two of them share a lane
+        slots.acquire()
+        item = tasks.get()
+        if item is None:
+            slots.release()
+            return
+        index, task = item
+        _produce_file(index, task, lanes[index % len(lanes)], chunk_size, vectorized)
+
+
+def _write_batches(lanes, slots, results, tasks: list[FileTask], chunk_size: int, alerts=None, archive=None,
+                   matching: bool = False):
+    from db.session import SessionLocal, engine
+    from db.repository import BulkInsertError, ManifestRepository, ProductRepository
+
+    # Never reuse pooled connections inherited from the parent process
+    engine.dispose(close=False)
+    db = SessionLocal()
+    repo = ProductRepository(db, alerts=alerts, archive=archive, matching=matching)
+    manifest = ManifestRepository(db)
+
+    metrics = RunMetrics()
+    inserted = defaultdict(int)
+    failed = {}
+
+    for index, task in enumerate(tasks):
+        fp = task.fingerprint
+        lane = lanes[index % len(lanes)]
+        records, rows = task.resume
+        content_hash = hash_file(fp.path, fp.size)
+        while (message := lane.get())[1] == "chunk":
+            chunk = message[2]
+            if fp.path in failed:
+                continue
+            # Conversion is one row per record, so records and rows advance together
+            records, rows = records + len(chunk), rows + len(chunk)
+            checkpoint = {"path": fp.path, "records": records, "rows": rows, "size": fp.size,
+                          "content_hash": content_hash}
+            try:
+                with metrics.stage("insert", rows=len(chunk)):
+                    inserted[fp.path] += repo.insert_products(chunk, chunk_size=chunk_size, checkpoint=checkpoint)
+            except BulkInsertError as e:
+                failed[fp.path] = str(e)
+
+        _, kind, (detail, file_metrics) = message
+        metrics.merge(file_metrics)
+        if kind == "error":
+            failed.setdefault(fp.path, detail)
+        elif fp.path not in failed:
+            manifest.record(fp.path, fp.size, fp.mtime, detail, rows)
+        slots.release()
+
+    db.close()
+    results.put({"inserted": dict(inserted), "failed": failed, "metrics": metrics.to_dict()})
+
+
+def run_parallel(tasks: list[FileTask], workers: int | None = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, vectorized: bool = True,
+                 queue_size: int | None = None, alerts=None, archive=None, matching: bool = False) -> dict:
+    """
+    Ingest `tasks` with `workers` producer processes and one writer process.
+
+    Returns {"inserted": {path: rows}, "failed": {path: reason}, "metrics": {...}},
+    where inserted counts this run's rows and metrics merges every process's
+    RunMetrics (stage times are summed over processes). `alerts` (an
+    ingest.alerts.AlertStage), `archive` (an ingest.archive.ParquetArchive)
+    and product matching run in the writer process. `queue_size` is the
+    number of converted chunks queued per file in flight.
+    """
+    workers = workers or default_workers()
+    queue_size = queue_size or QUEUE_CHUNKS_PER_FILE
+
+    ctx = mp.get_context()
+    task_queue = ctx.Queue()
+    for item in enumerate(tasks):
+        task_queue.put(item)
+    for _ in range(workers):
+        task_queue.put(None)
+    lanes = [ctx.Queue(maxsize=queue_size) for _ in range(workers * FILES_AHEAD_PER_WORKER)]
+    slots = ctx.Semaphore(len(lanes))
+    results = ctx.Queue()
+
+    writer = ctx.Process(target=_write_batches,
+                         args=(lanes, slots, results, tasks, chunk_size, alerts, archive, matching))
+    producers = [ctx.Process(target=_produce_files, args=(task_queue, lanes, slots, chunk_size, vectorized),
+                             daemon=True)
+                 for _ in range(workers)]
+    writer.start()
+    for producer in producers:
+        producer.start()
+
+    try:
+        while True:
+            try:
+                summary = results.get(timeout=1.0)
+                break
+            except Empty:
+                if not writer.is_alive():
+                    raise RuntimeError(f"DB writer exited unexpectedly (code {writer.exitcode})")
+                crashed = [p.exitcode for p in producers if p.exitcode not in (None, 0)]
+                if crashed:
+                    raise RuntimeError(f"ingest worker exited unexpectedly (code {crashed[0]})")
+    except BaseException:
+        # Producers may be blocked on a full lane or a slot the writer will never
+        # free, and the writer on a file whose producer died
+        for process in [writer, *producers]:
+            if process.is_alive():
+                process.terminate()
+        raise
+    finally:
+        for process in [writer, *producers]:
+            process.join()
+    return summary
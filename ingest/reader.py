@@ -0,0 +1,122 @@
+from __future__ import annotations
+import io
+import json
+from itertools import batched
+from pathlib import Path
+from typing import IO, Callable, Iterable, Iterator
+
+try:
+    import ijson
+except ImportError:  # optional: fall back to the stdlib incremental decoder
+    ijson = None
+
+'''
+    Streaming readers for Apify dataset exports.
+
+    Records are yielded one at a time, so memory stays bounded by the largest
+    single record instead of the whole file. Both JSON arrays (the default
+    Apify export) and JSON Lines files are supported.
+'''
+
+READ_SIZE = 1 << 16  # 64 KiB
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def _first_byte(f: IO[bytes]) -> bytes:
+    while True:
+        ch = f.read(1)
+        if not ch or not ch.isspace():
+            return ch
+
+
+def _iter_json_array(f: IO[str]) -> Iterator[dict]:
+    """Incrementally decode the items of a top-level JSON array (stdlib only)."""
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+    read_size = READ_SIZE
+
+    while True:
+        # Skip whitespace and the separator between items
+        while True:
+            while pos < len(buf) and (buf[pos].isspace() or buf[pos] == ","):
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            chunk = f.read(read_size)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+
+        if pos >= len(buf):
+            raise ValueError("Unexpected end of file inside JSON array")
+        if buf[pos] == "]":
+            return
+
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            item, end = None, -1
+
+        # A value that fails, or ends exactly at the buffer edge, may be cut off
+        if end == -1 or (end == len(buf) and not eof):
+            if eof:
+                raise ValueError(f"Malformed JSON near offset {pos}")
+            chunk = f.read(read_size)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            # Large records: grow the read size so retries stay linear
+            read_size = min(read_size * 2, 1 << 24)
+            continue
+
+        read_size = READ_SIZE
+        pos = end
+        yield item
+
+
+def _iter_json_lines(f: IO[str]) -> Iterator[dict]:
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_records(file_path: str | Path, project: Callable[[dict], dict] | None = None) -> Iterator[dict]:
+    """
+    Yield raw records from a dataset file without loading it all at once.
+
+    Uses ijson when installed, otherwise a chunked stdlib decoder. Files
+    whose first non-blank character is not '[' are read as JSON Lines.
+    With `project` (e.g. a StoreAdapter's project), each record is cut down
+    as soon as it is decoded, so large unused payloads never reach a chunk.
+    """
+    records = _iter_file(file_path)
+    if project is None:
+        return records
+    return map(project, records)
+
+
+def _iter_file(file_path: str | Path) -> Iterator[dict]:
+    with open(file_path, "rb") as f:
+        first = _first_byte(f)
+        if not first:
+            return
+
+        if first == b"[" and ijson is not None:
+            f.seek(0)
+            yield from ijson.items(f, "item", use_float=True)
+            return
+
+        text = io.TextIOWrapper(f, encoding="utf-8")
+        if first == b"[":
+            # The opening bracket has already been consumed
+            yield from _iter_json_array(text)
+        else:
+            text.seek(0)
+            yield from _iter_json_lines(text)
+
+
+def iter_chunks(items: Iterable[dict], chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[list[dict]]:
+    """Group a record stream into lists of at most chunk_size items."""
+    for chunk in batched(items, chunk_size):
+        yield list(chunk)
@@ -0,0 +1,63 @@
+from __future__ import annotations
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from ingest.reader import DEFAULT_CHUNK_SIZE, iter_chunks, iter_records
+from transformers.categories import classify_rows
+from transformers.cleaner import get_adapter
+from transformers.unit_converter import convert_row, convert_rows
+
+'''
+    Pure (DB-free) ingest stages: read -> clean -> convert -> classify, chunk
+    by chunk.
+
+    Shared by the serial pipeline script, the parallel workers and the Apify
+    fetch path.
+'''
+
+
+def convert_all(cleaned: list[dict], vectorized: bool = True) -> list[dict]:
+    if vectorized:
+        return convert_rows(cleaned)
+    return [convert_row(item) for item in cleaned]
+
+
+def iter_converted_chunks(file_path: str | Path, store: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                          vectorized: bool = True, metrics=None, skip: int = 0) -> Iterator[list[dict]]:
+    """
+    Stream a dataset file through cleaning and conversion, chunk by chunk.
+
+    Records are projected to the fields the store's adapter reads and chunked
+    before cleaning, so each stage runs once per chunk; pass an
+    ingest.metrics.RunMetrics to time the load/clean/convert/classify stages.
+    The first `skip` records (already ingested, see ingest_progress) are
+    read but not converted.
+    """
+    records = iter_records(file_path, get_adapter(store).project)
+    if skip:
+        records = islice(records, skip, None)
+    return convert_chunks(iter_chunks(records, chunk_size), store, vectorized, metrics)
+
+
+def convert_chunks(raw_chunks: Iterable[list[dict]], store: str, vectorized: bool = True,
+                   metrics=None) -> Iterator[list[dict]]:
+    """Clean, convert and classify a stream of raw record chunks (from a file or a fetched dataset)."""
+    # Resolved once for the whole stream
+    clean = get_adapter(store).clean
+    if metrics is None:
+        for raw in raw_chunks:
+            converted = convert_all([clean(item) for item in raw], vectorized)
+            classify_rows(converted)
+            yield converted
+        return
+
+    for raw in metrics.timed_chunks("load", raw_chunks):
+        with metrics.stage("clean", rows=len(raw)):
+            cleaned = [clean(item) for item in raw]
+        with metrics.stage("convert", rows=len(cleaned)):
+            converted = convert_all(cleaned, vectorized)
+        with metrics.stage("classify", rows=len(converted)):
+            classify_rows(converted)
+        metrics.observe_converted(converted)
+        yield converted
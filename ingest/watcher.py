@@ -0,0 +1,166 @@
+from __future__ import annotations
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from pathlib import Path
+
+'''
+    Dataset folder watchers for the ingest daemon (scripts/ingest_daemon.py).
+
+    InotifyWatcher asks the Linux kernel for close-write / modify / move-in
+    events on the folder (through libc, no extra dependency); PollingWatcher
+    compares (size, mtime) of every file each poll_interval seconds and works
+    everywhere. open_watcher() returns the first one available. Both report
+    paths with one of `suffixes`; neither reads file contents.
+
+    Debouncer turns a burst of events for a file being written into a single
+    ingest: a path is due once it has been quiet for `quiet` seconds, or
+    `max_wait` after its first event, so a file that keeps growing is still
+    ingested as it lands.
+'''
+
+DATASET_SUFFIXES = (".json", ".jsonl")
+POLL_INTERVAL = 5.0
+
+# <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+_WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+_EVENT = struct.Struct("iIII")
+_READ_SIZE = 64 * 1024
+
+
+def scan(directory: Path, suffixes=DATASET_SUFFIXES) -> dict[Path, tuple[int, int]]:
+    """(size, mtime_ns) of every dataset file directly in `directory`."""
+    found = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith(suffixes) and not entry.name.startswith(".") and entry.is_file():
+                stat = entry.stat()
+                found[Path(entry.path)] = (stat.st_size, stat.st_mtime_ns)
+    return found
+
+
+class InotifyWatcher:
+    backend = "inotify"
+
+    def __init__(self, directory: str | Path, suffixes=DATASET_SUFFIXES):
+        self.directory = Path(directory).resolve()
+        self.suffixes = tuple(suffixes)
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self._fd, os.fsencode(self.directory), _WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, f"inotify_add_watch failed for {self.directory}")
+
+    def poll(self, timeout: float) -> set[Path]:
+        """Paths changed since the last call, waiting up to `timeout` seconds for the first event."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+        changed = set()
+        while True:
+            try:
+                data = os.read(self._fd, _READ_SIZE)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = _EVENT.unpack_from(data, offset)
+                name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+                offset += _EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    # The kernel dropped events: fall back to a full listing once
+                    changed.update(scan(self.directory, self.suffixes))
+                    continue
+                name = os.fsdecode(name)
+                if name.endswith(self.suffixes) and not name.startswith("."):
+                    changed.add(self.directory / name)
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    backend = "polling"
+
+    def __init__(self, directory: str | Path, suffixes=DATASET_SUFFIXES, poll_interval: float = POLL_INTERVAL):
+        self.directory = Path(directory).resolve()
+        self.suffixes = tuple(suffixes)
+        self.poll_interval = poll_interval
+        self._seen = scan(self.directory, self.suffixes)
+        self._next_scan = time.monotonic() + poll_interval
+
+    def poll(self, timeout: float) -> set[Path]:
+        wait = self._next_scan - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return set()
+        time.sleep(max(wait, 0))
+        self._next_scan = time.monotonic() + self.poll_interval
+        current = scan(self.directory, self.suffixes)
+        changed = {path for path, stat in current.items() if self._seen.get(path) != stat}
+        self._seen = current
+        return changed
+
+    def close(self):
+        pass
+
+
+def open_watcher(directory: str | Path, suffixes=DATASET_SUFFIXES, poll_interval: float = POLL_INTERVAL,
+                 polling: bool = False):
+    """An InotifyWatcher where the platform has inotify, else (or with polling=True) a PollingWatcher."""
+    if not polling:
+        try:
+            return InotifyWatcher(directory, suffixes)
+        except (OSError, AttributeError):
+            # Not Linux, or out of inotify instances / watches
+            pass
+    return PollingWatcher(directory, suffixes, poll_interval)
+
+
+class Debouncer:
+    """Pending paths, each due after `quiet` seconds without events or `max_wait` after its first one."""
+
+    def __init__(self, quiet: float = 2.0, max_wait: float = 30.0):
+        self.quiet = quiet
+        self.max_wait = max_wait
+        self._first: dict[Path, float] = {}
+        self._last: dict[Path, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._first)
+
+    def touch(self, path: Path, now: float | None = None):
+        now = time.monotonic() if now is None else now
+        self._first.setdefault(path, now)
+        self._last[path] = now
+
+    def _due_at(self, path: Path) -> float:
+        return min(self._last[path] + self.quiet, self._first[path] + self.max_wait)
+
+    def due(self, limit: int | None = None, now: float | None = None) -> list[Path]:
+        """Remove and return up to `limit` due paths, oldest first; the rest stay pending."""
+        now = time.monotonic() if now is None else now
+        ready = sorted((path for path in self._first if self._due_at(path) <= now), key=self._first.get)
+        ready = ready[:limit] if limit is not None else ready
+        for path in ready:
+            del self._first[path], self._last[path]
+        return ready
+
+    def next_due(self, now: float | None = None) -> float | None:
+        """Seconds until the next path is due (0 if one already is); None when nothing is pending."""
+        if not self._first:
+            return None
+        now = time.monotonic() if now is None else now
+        return max(min(self._due_at(path) for path in self._first) - now, 0.0)
@@ -0,0 +1,2 @@
+# matching package initializer
+# Cross-store product matching (MinHash / LSH entity resolution).
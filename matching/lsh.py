@@ -0,0 +1,296 @@
+from __future__ import annotations
+import re
+import zlib
+from dataclasses import dataclass
+from typing import Iterator
+
+import numpy as np
+
+'''
+    Cross-store product matching with MinHash signatures and banded LSH.
+
+    A product is described by its title tokens, its brand (first title word),
+    the quantity phrases in its title (a number and the word after it) and
+    its normalized quantity. Titles become 64-value MinHash signatures;
+    each signature is cut into 16 bands of 4 values, and every band is hashed
+    together with the product's block (brand + normalized unit) into a band
+    key. Only products sharing a band key are ever compared, so matching a
+    batch costs one lookup per band instead of a scan of the catalog.
+
+    Candidate pairs are then verified: different stores, same brand and unit,
+    quantities within QTY_TOLERANCE, quantity phrases that do not contradict
+    each other (one set contains the other: "6 Mega Rolls" fits "6 Mega
+    Rolls = 24 Regular Rolls", "24 Mega Rolls" does not), and title Jaccard
+    above MATCH_THRESHOLD (TITLE_ONLY_THRESHOLD when a quantity is unknown):
+    the signature estimate prefilters and the exact token sets decide.
+    Verified pairs are merged into clusters with union-find.
+
+    Everything here is DB-free; ProductRepository stores signatures, band
+    keys and cluster ids so each ingest batch is matched incrementally.
+'''
+
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+MATCH_THRESHOLD = 0.6
+TITLE_ONLY_THRESHOLD = 0.8
+QTY_TOLERANCE = 0.05
+# Margin on the MinHash estimate so true matches are not lost to estimation noise
+ESTIMATE_SLACK = 0.15
+# Band buckets larger than this are skipped: they hold products that only share
+# brand/category words, and comparing them all is quadratic
+MAX_BUCKET = 200
+# Candidate pairs expanded and verified per step in match_catalog
+PAIR_CHUNK = 2_000_000
+SEED = 1729
+# Products hashed per vectorized step (bounds the tokens x NUM_PERM temporary)
+MINHASH_BLOCK = 20000
+
+# Universal hashing (a * x + b) mod p over 32-bit token hashes: a * x fits in uint64
+_PRIME = 4294967291  # largest prime below 2**32
+_rng = np.random.default_rng(SEED)
+_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)
+# Odd 64-bit multipliers for combining a band's values into one key
+_BAND_MIX = _rng.integers(1, 2 ** 63, ROWS_PER_BAND + 2, dtype=np.uint64) | np.uint64(1)
+EMPTY = np.uint32(0xFFFFFFFF)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+# Filler and unit words say nothing about which product it is
+STOPWORDS = frozenset({
+    "a", "an", "and", "the", "with", "for", "of", "in", "to", "by", "per", "x", "each", "ea",
+    "pack", "packs", "pk", "count", "ct", "oz", "fl", "ml", "l", "lb", "lbs", "g", "kg",
+    "roll", "rolls", "sheet", "sheets", "bar", "bars", "tablet", "tablets",
+})
+
+
+def tokenize(title: str | None) -> list[str]:
+    return TOKEN_PATTERN.findall((title or "").lower())
+
+
+def title_features(title: str | None) -> tuple[str, set[str], frozenset[str]]:
+    """(brand, token set, quantity phrases) for a title; the brand is its first word."""
+    words = tokenize(title)
+    brand = words[0] if words else ""
+    tokens = {w for w in words if w not in STOPWORDS and not w.isdigit()}
+    quantities = frozenset(
+        f"{int(w)} {words[i + 1] if i + 1 < len(words) else ''}".rstrip()
+        for i, w in enumerate(words) if w.isdigit()
+    )
+    return brand, tokens, quantities
+
+
+def _token_hash(token: str) -> int:
+    return zlib.crc32(token.encode("utf-8"))
+
+
+@dataclass
+class MatchFeatures:
+    """Matching inputs for a batch of products, one array entry per product."""
+    stores: np.ndarray       # object, lower-case store
+    brands: np.ndarray       # object
+    units: np.ndarray        # object, normalized unit or ""
+    qty: np.ndarray          # float, NaN when unknown
+    quantities: np.ndarray   # object, frozenset of title quantity phrases ("6 mega")
+    tokens: np.ndarray       # object, title token set
+    signatures: np.ndarray   # (n, NUM_PERM) uint32; all EMPTY when the title has no tokens
+
+    def __len__(self) -> int:
+        return len(self.stores)
+
+    @property
+    def valid(self) -> np.ndarray:
+        return self.signatures[:, 0] != EMPTY
+
+    @classmethod
+    def from_products(cls, stores, titles, qtys, units) -> "MatchFeatures":
+        brands, token_sets, quantities = zip(*(title_features(t) for t in titles)) if titles else ((), (), ())
+        return cls(
+            stores=np.array([(s or "").lower() for s in stores], dtype=object),
+            brands=_object_array(brands),
+            units=np.array([u or "" for u in units], dtype=object),
+            qty=np.array([q if q else np.nan for q in qtys], dtype=float),
+            quantities=_object_array(quantities),
+            tokens=_object_array(token_sets),
+            signatures=minhash(token_sets),
+        )
+
+    @classmethod
+    def from_stored(cls, stores, titles, units, qtys, blobs) -> "MatchFeatures":
+        """Rebuild features from stored columns (signature bytes from signature_bytes())."""
+        signatures = np.frombuffer(b"".join(blobs), dtype="<u4").reshape(len(blobs), NUM_PERM) \
+            if blobs else np.empty((0, NUM_PERM), dtype=np.uint32)
+        features = [title_features(t) for t in titles]
+        return cls(
+            stores=np.array([(s or "").lower() for s in stores], dtype=object),
+            brands=_object_array([f[0] for f in features]),
+            units=np.array([u or "" for u in units], dtype=object),
+            qty=np.array([q if q else np.nan for q in qtys], dtype=float),
+            quantities=_object_array([f[2] for f in features]),
+            tokens=_object_array([f[1] for f in features]),
+            signatures=signatures.astype(np.uint32),
+        )
+
+    def signature_bytes(self, i: int) -> bytes:
+        return self.signatures[i].astype("<u4").tobytes()
+
+
+def _object_array(values) -> np.ndarray:
+    # np.array would turn a list of frozensets into a 2-D array or fail
+    out = np.empty(len(values), dtype=object)
+    out[:] = list(values)
+    return out
+
+
+def _quantities_agree(a: frozenset, b: frozenset) -> bool:
+    return a <= b or b <= a
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def minhash(token_sets) -> np.ndarray:
+    """MinHash signatures for a batch of token sets, vectorized per MINHASH_BLOCK products."""
+    token_sets = list(token_sets)
+    out = np.full((len(token_sets), NUM_PERM), EMPTY, dtype=np.uint32)
+    for start in range(0, len(token_sets), MINHASH_BLOCK):
+        block = token_sets[start:start + MINHASH_BLOCK]
+        lengths = np.array([len(tokens) for tokens in block], dtype=np.int64)
+        nonempty = np.flatnonzero(lengths)
+        if not len(nonempty):
+            continue
+        hashes = np.fromiter((_token_hash(t) for i in nonempty for t in block[i]),
+                             dtype=np.uint64, count=int(lengths.sum()))
+        permuted = (hashes[:, None] * _A + _B) % np.uint64(_PRIME)          # (tokens, NUM_PERM)
+        starts = np.concatenate(([0], np.cumsum(lengths[nonempty])[:-1]))
+        out[start + nonempty] = np.minimum.reduceat(permuted, starts, axis=0).astype(np.uint32)
+    return out
+
+
+def band_keys(features: MatchFeatures) -> np.ndarray:
+    """(n, BANDS) int64 LSH keys; a key covers the block (brand, unit) and one signature band."""
+    n = len(features)
+    blocks = np.fromiter((zlib.crc32(f"{b}|{u}".encode("utf-8")) for b, u in zip(features.brands, features.units)),
+                         dtype=np.uint64, count=n)
+    bands = features.signatures.astype(np.uint64).reshape(n, BANDS, ROWS_PER_BAND)
+    keys = blocks[:, None] * _BAND_MIX[0] + np.arange(BANDS, dtype=np.uint64)[None, :] * _BAND_MIX[1]
+    for r in range(ROWS_PER_BAND):
+        keys = keys + bands[:, :, r] * _BAND_MIX[r + 2]
+    # Final avalanche so nearby inputs do not share high bits
+    keys ^= keys >> np.uint64(31)
+    return keys.view(np.int64)
+
+
+def verify(left: MatchFeatures, li: np.ndarray, right: MatchFeatures, rj: np.ndarray) -> np.ndarray:
+    """Boolean mask: which candidate pairs (left[li[k]], right[rj[k]]) are the same product."""
+    # The signature estimate (std ~0.06 at 64 permutations) only prefilters;
+    # survivors are checked on exact title Jaccard
+    similarity = (left.signatures[li] == right.signatures[rj]).mean(axis=1) + ESTIMATE_SLACK
+    qa, qb = left.qty[li], right.qty[rj]
+    both_qty = ~np.isnan(qa) & ~np.isnan(qb)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        same_qty = np.abs(qa - qb) <= QTY_TOLERANCE * np.maximum(qa, qb)
+    mask = (
+        (left.stores[li] != right.stores[rj])
+        & (left.brands[li] == right.brands[rj])
+        & (left.units[li] == right.units[rj])
+        & left.valid[li] & right.valid[rj]
+        & np.where(both_qty, same_qty & (similarity >= MATCH_THRESHOLD), similarity >= TITLE_ONLY_THRESHOLD)
+    )
+    # Set comparisons are per pair; only run them on the survivors
+    survivors = np.flatnonzero(mask)
+    mask[survivors] = [
+        _quantities_agree(left.quantities[i], right.quantities[j])
+        and _jaccard(left.tokens[i], right.tokens[j]) >= (MATCH_THRESHOLD if known else TITLE_ONLY_THRESHOLD)
+        for i, j, known in zip(li[survivors].tolist(), rj[survivors].tolist(), both_qty[survivors].tolist())
+    ]
+    return mask
+
+
+class UnionFind:
+    """Disjoint sets over hashable ids; the smallest id names its set, so results are deterministic."""
+
+    def __init__(self):
+        self.parent = {}
+
+    def add(self, item):
+        self.parent.setdefault(item, item)
+
+    def find(self, item):
+        self.add(item)
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            if rb < ra:
+                ra, rb = rb, ra
+            self.parent[rb] = ra
+
+
+def _dedupe_pairs(li: np.ndarray, rj: np.ndarray, n: int) -> tuple[np.ndarray, np.ndarray]:
+    li, rj = np.minimum(li, rj), np.maximum(li, rj)
+    # Sort + adjacent compare: much faster than np.unique's hash path on millions of pairs
+    pairs = np.sort(li * n + rj)
+    pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))]
+    return pairs // n, pairs % n
+
+
+def iter_candidate_pairs(keys: np.ndarray, max_bucket: int | None = MAX_BUCKET,
+                         chunk_pairs: int = PAIR_CHUNK) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    """Index pairs (i < j) sharing a band key, in chunks of about chunk_pairs.
+
+    Pairs are deduplicated within a chunk only; a pair sharing several bands
+    may reappear in a later chunk.
+    """
+    n = len(keys)
+    flat_keys = keys.ravel()
+    flat_rows = np.repeat(np.arange(n, dtype=np.int64), keys.shape[1] if keys.ndim == 2 else 1)
+    order = np.argsort(flat_keys, kind="stable")
+    sorted_keys, rows = flat_keys[order], flat_rows[order]
+    del flat_keys, flat_rows, order
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(sorted_keys)) + 1))
+    sizes = np.diff(np.append(starts, len(sorted_keys)))
+
+    # Most buckets hold two or three products: expand all buckets of one size at once
+    keep = (sizes > 1) & ((sizes <= max_bucket) if max_bucket else True)
+    for size in np.unique(sizes[keep]).tolist():
+        a, b = np.triu_indices(size, 1)
+        bucket_starts = starts[sizes == size]
+        step = max(1, chunk_pairs // len(a))
+        for offset in range(0, len(bucket_starts), step):
+            members = rows[bucket_starts[offset:offset + step, None] + np.arange(size)]   # (buckets, size)
+            yield _dedupe_pairs(members[:, a].ravel(), members[:, b].ravel(), n)
+
+
+def candidate_pairs(keys: np.ndarray, max_bucket: int | None = MAX_BUCKET) -> tuple[np.ndarray, np.ndarray]:
+    """Index pairs (i < j) that share at least one band key, within one batch."""
+    chunks = list(iter_candidate_pairs(keys, max_bucket))
+    if not chunks:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return _dedupe_pairs(np.concatenate([c[0] for c in chunks]), np.concatenate([c[1] for c in chunks]), len(keys))
+
+
+def match_catalog(product_keys: list[str], features: MatchFeatures,
+                  max_bucket: int | None = MAX_BUCKET) -> dict[str, str]:
+    """Cluster a whole catalog in memory; returns product_key -> cluster id.
+
+    Candidate pairs are verified chunk by chunk, so memory stays bounded by
+    PAIR_CHUNK rather than by the total number of candidates.
+    """
+    rows = np.flatnonzero(features.valid)
+    clusters = UnionFind()
+    for key in product_keys:
+        clusters.add(key)
+    for li, rj in iter_candidate_pairs(band_keys(features)[rows], max_bucket):
+        li, rj = rows[li], rows[rj]
+        matched = verify(features, li, features, rj)
+        for i, j in zip(li[matched].tolist(), rj[matched].tolist()):
+            clusters.union(product_keys[i], product_keys[j])
+    return {key: clusters.find(key) for key in product_keys}
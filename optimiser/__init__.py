@@ -0,0 +1,2 @@
+# optimiser package initializer
+# Basket optimisation over normalized catalog offers.
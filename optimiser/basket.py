@@ -0,0 +1,316 @@
+from __future__ import annotations
+import math
+from collections import defaultdict
+from dataclasses import dataclass, field
+from itertools import combinations
+from typing import Iterable
+
+import numpy as np
+
+from transformers.unit_converter import UNIT_MAP
+
+'''
+    Basket optimiser: the cheapest way to buy a shopping list across stores.
+
+    A list item asks for a quantity of a category in normalized units (g, ml,
+    unit - the same units unit_converter produces). Each store sells that
+    category in packs; covering a quantity means buying whole packs whose sizes
+    add up to at least the requested amount.
+
+    Solving happens in two layers:
+    1. Per (category, unit, store) the catalog keeps a Pareto frontier of packs:
+       a pack that is no larger and no cheaper than another one can never be
+       part of a cheapest cover, so it is dropped up front. The cheapest cover
+       of a quantity is then found exactly by branch and bound over pack counts
+       and memoized, giving an item x store cost matrix.
+    2. Store subsets (up to max_stores) are scored against that matrix, best
+       lower bound first, and the search stops once no remaining subset can
+       beat the best plan found. Within a subset every item goes to its
+       cheapest store; free-shipping thresholds are then topped up greedily by
+       moving items when that costs less than the shipping fee.
+
+    Everything except the free-shipping top-up is exact.
+'''
+
+# Relative slack when comparing float quantities (18 x 29.5735 ml vs 532.3 ml)
+QTY_EPSILON = 1e-9
+
+
+@dataclass(frozen=True)
+class Offer:
+    store: str
+    category: str
+    title: str
+    qty: float          # pack size in normalized units
+    unit: str           # normalized unit: g / ml / unit
+    price: float
+    url: str | None = None
+
+    @property
+    def unit_price(self) -> float:
+        return self.price / self.qty
+
+
+@dataclass(frozen=True)
+class ListItem:
+    category: str
+    quantity: float
+    unit: str
+
+    def normalized(self) -> ListItem:
+        """Express the quantity in unit_converter's normalized unit (2 kg -> 2000 g)."""
+        target, factor = UNIT_MAP.get(self.unit.lower().strip(), (self.unit, 1))
+        return ListItem(self.category, self.quantity * factor, target)
+
+
+@dataclass(frozen=True)
+class StorePolicy:
+    store: str
+    fee: float = 0.0                       # charged once if anything is bought there
+    shipping_fee: float = 0.0
+    free_shipping_threshold: float | None = None
+
+
+@dataclass
+class BasketLine:
+    item: ListItem
+    store: str
+    packs: list[tuple[Offer, int]]
+    cost: float
+
+
+@dataclass
+class BasketPlan:
+    lines: list[BasketLine] = field(default_factory=list)
+    missing: list[ListItem] = field(default_factory=list)
+    # store -> {"subtotal", "fee", "shipping"}
+    store_totals: dict[str, dict] = field(default_factory=dict)
+    total: float = 0.0
+
+
+# ----------------------------
+# Per-store pack covers
+# ----------------------------
+
+def pareto_frontier(offers: Iterable[Offer]) -> list[Offer]:
+    """Drop packs that another pack beats on both size and price."""
+    frontier = []
+    cheapest = math.inf
+    # Largest first; for equal sizes the cheapest comes first and shadows the rest
+    for offer in sorted(offers, key=lambda o: (-o.qty, o.price)):
+        if offer.price < cheapest:
+            frontier.append(offer)
+            cheapest = offer.price
+    return frontier
+
+
+def cheapest_cover(frontier: list[Offer], quantity: float) -> tuple[float, list[tuple[Offer, int]]] | None:
+    """
+    Exact minimum-cost multiset of packs with total size >= quantity.
+
+    Branch and bound over packs in increasing unit price: after fixing the
+    counts of the first i packs, cost + remaining * unit_price[i] is a lower
+    bound, since no later pack is cheaper per unit.
+    """
+    if not frontier:
+        return None
+    if quantity <= 0:
+        return 0.0, []
+
+    offers = sorted(frontier, key=lambda o: (o.unit_price, -o.qty))
+    unit_prices = [o.unit_price for o in offers]
+    last = len(offers) - 1
+    slack = quantity * QTY_EPSILON
+
+    best_cost = math.inf
+    best_counts: list[int] = []
+    counts = [0] * len(offers)
+
+    def search(i: int, remaining: float, cost: float):
+        nonlocal best_cost, best_counts
+        offer = offers[i]
+        needed = max(math.ceil((remaining - slack) / offer.qty), 0)
+        # A single last pack type must cover everything that is left
+        lowest = needed if i == last else 0
+        for count in range(needed, lowest - 1, -1):
+            spent = cost + count * offer.price
+            left = remaining - count * offer.qty
+            counts[i] = count
+            if left <= slack:
+                if spent < best_cost:
+                    best_cost, best_counts = spent, counts[:]
+                continue
+            # Fewer of this pack only raises the bound for the rest
+            if spent + left * unit_prices[i + 1] >= best_cost:
+                break
+            search(i + 1, left, spent)
+        counts[i] = 0
+
+    search(0, quantity, 0.0)
+    packs = [(offer, n) for offer, n in zip(offers, best_counts) if n]
+    return best_cost, packs
+
+
+class Catalog:
+    """Offers grouped by (category, unit, store), reduced to their Pareto frontiers."""
+
+    def __init__(self, offers: Iterable[Offer]):
+        groups = defaultdict(list)
+        for offer in offers:
+            if offer.qty and offer.qty > 0 and offer.price and offer.price > 0:
+                groups[(offer.category, offer.unit, offer.store)].append(offer)
+
+        self.frontiers = {key: pareto_frontier(group) for key, group in groups.items()}
+        self.stores = sorted({store for _, _, store in self.frontiers})
+        self._covers = {}
+
+    @classmethod
+    def from_repository(cls, repo, categories: Iterable[str]) -> Catalog:
+        """Build a catalog from each category's current prices."""
+        offers = []
+        for category in categories:
+            for row in repo.get_current_prices_by_product(category):
+                if row["normalized_unit_qty"] is None or row["price"] is None:
+                    continue
+                offers.append(Offer(
+                    store=row["store_name"],
+                    category=category,
+                    title=row["product_name"],
+                    qty=row["normalized_unit_qty"],
+                    unit=row["normalized_unit"],
+                    price=row["price"],
+                    url=row["product_url"],
+                ))
+        return cls(offers)
+
+    def cover(self, item: ListItem, store: str):
+        """Memoized cheapest_cover for `item` at `store`; None if the store lacks it."""
+        key = (item.category, item.unit, store, item.quantity)
+        if key not in self._covers:
+            frontier = self.frontiers.get((item.category, item.unit, store))
+            self._covers[key] = cheapest_cover(frontier, item.quantity) if frontier else None
+        return self._covers[key]
+
+
+# ----------------------------
+# Store selection
+# ----------------------------
+
+def _bill(assignment: np.ndarray, cost: np.ndarray, subset: tuple[int, ...],
+          policies: list[StorePolicy]) -> tuple[float, dict[int, float]]:
+    subtotals = {s: 0.0 for s in subset}
+    for i, s in enumerate(assignment):
+        if s >= 0:
+            subtotals[s] += cost[i, s]
+    subtotals = {s: v for s, v in subtotals.items() if v > 0}
+
+    total = 0.0
+    for s, subtotal in subtotals.items():
+        policy = policies[s]
+        total += subtotal + policy.fee
+        if policy.free_shipping_threshold is None or subtotal < policy.free_shipping_threshold:
+            total += policy.shipping_fee
+    return total, subtotals
+
+
+def _top_up_shipping(assignment: np.ndarray, cost: np.ndarray, subset: tuple[int, ...],
+                     policies: list[StorePolicy]) -> np.ndarray:
+    """Greedily move items into stores that are just short of free shipping."""
+    for s in subset:
+        policy = policies[s]
+        if policy.free_shipping_threshold is None or not policy.shipping_fee:
+            continue
+        total, subtotals = _bill(assignment, cost, subset, policies)
+        subtotal = subtotals.get(s, 0.0)
+        if subtotal == 0 or subtotal >= policy.free_shipping_threshold:
+            continue
+
+        # Cheapest extra spend per dollar that lands at this store
+        moves = [
+            ((cost[i, s] - cost[i, t]) / cost[i, s], i)
+            for i, t in enumerate(assignment)
+            if t >= 0 and t != s and np.isfinite(cost[i, s])
+        ]
+        trial = assignment.copy()
+        for _, i in sorted(moves):
+            if subtotal >= policy.free_shipping_threshold:
+                break
+            trial[i] = s
+            subtotal += cost[i, s]
+
+        if subtotal >= policy.free_shipping_threshold:
+            trial_total, _ = _bill(trial, cost, subset, policies)
+            if trial_total < total:
+                assignment = trial
+    return assignment
+
+
+def solve(items: Iterable[ListItem], catalog: Catalog,
+          policies: Iterable[StorePolicy] = (), max_stores: int | None = None) -> BasketPlan:
+    """
+    Cheapest plan for `items` using at most `max_stores` stores.
+
+    Plans that cover more items always win; among those, the lowest total
+    (packs + store fees + shipping) wins. Items no store carries end up in
+    BasketPlan.missing.
+    """
+    items = [item.normalized() for item in items]
+    stores = catalog.stores
+    by_store = {p.store: p for p in policies}
+    store_policies = [by_store.get(store, StorePolicy(store)) for store in stores]
+    max_stores = min(max_stores or len(stores), len(stores))
+
+    cost = np.full((len(items), len(stores)), np.inf)
+    for i, item in enumerate(items):
+        for s, store in enumerate(stores):
+            found = catalog.cover(item, store)
+            if found is not None:
+                cost[i, s] = found[0]
+    fees = np.array([p.fee for p in store_policies])
+
+    # Rank subsets by (missing items, lower bound on total)
+    candidates = []
+    for size in range(1, max_stores + 1):
+        for subset in combinations(range(len(stores)), size):
+            cheapest = cost[:, subset].min(axis=1)
+            covered = np.isfinite(cheapest)
+            lower = cheapest[covered].sum() + (fees[list(subset)].min() if covered.any() else 0.0)
+            candidates.append((int((~covered).sum()), float(lower), subset))
+    candidates.sort(key=lambda c: (c[0], c[1]))
+
+    best = None
+    for missing, lower, subset in candidates:
+        if best is not None and (missing > best[0] or lower >= best[1]):
+            break
+        sub = cost[:, subset]
+        picks = np.asarray(subset)[sub.argmin(axis=1)]
+        assignment = np.where(np.isfinite(sub.min(axis=1)), picks, -1)
+        assignment = _top_up_shipping(assignment, cost, subset, store_policies)
+        total, _ = _bill(assignment, cost, subset, store_policies)
+        if best is None or (missing, total) < (best[0], best[1]):
+            best = (missing, total, subset, assignment)
+
+    plan = BasketPlan()
+    if best is None:
+        plan.missing = items
+        return plan
+
+    _, total, subset, assignment = best
+    _, subtotals = _bill(assignment, cost, subset, store_policies)
+    for i, s in enumerate(assignment):
+        if s < 0:
+            plan.missing.append(items[i])
+            continue
+        found_cost, packs = catalog.cover(items[i], stores[s])
+        plan.lines.append(BasketLine(items[i], stores[s], packs, found_cost))
+
+    for s, subtotal in subtotals.items():
+        policy = store_policies[s]
+        free = policy.free_shipping_threshold is not None and subtotal >= policy.free_shipping_threshold
+        plan.store_totals[stores[s]] = {
+            "subtotal": round(subtotal, 2),
+            "fee": policy.fee,
+            "shipping": 0.0 if free else policy.shipping_fee,
+        }
+    plan.total = round(total, 2)
+    return plan
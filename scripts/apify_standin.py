@@ -0,0 +1,188 @@
+# scripts/apify_standin.py
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from ingest.reader import iter_records
+
+'''
+    Local stand-in for the Apify dataset API, for exercising ingest/fetch.py
+    without network access or a token.
+
+    Every file in dataset/ becomes a dataset (its file name without
+    "dataset_" and ".json") and the newest file of each scraper becomes that
+    actor's last run. --synthetic N adds synthetic-amazon/-target/-walmart
+    datasets and actors (see synthetic_data.py). Endpoints:
+
+        GET /v2/datasets/<id>/items?offset=&limit=&fields=   (X-Apify-Pagination-* headers)
+        GET /v2/acts/<actor>/runs/last
+
+    --fail-rate, --latency and --max-rps inject 503s, slow responses and
+    429 + Retry-After responses to exercise retries and backoff.
+
+        python scripts/apify_standin.py --port 8765 --fail-rate 0.1
+        python scripts/run_ingest_pipeline.py --apify-url http://127.0.0.1:8765/v2 \\
+            --apify amazon=actor:Amazon-crawler --apify target=actor:target-product-search-scraper
+'''
+
+FILE_PATTERN = re.compile(r"^dataset_(?P<actor>.+?)_(?P<stamp>\d{4}-\d{2}-\d{2}_[\d-]+)$")
+DEFAULT_PAGE_LIMIT = 1000
+
+
+def load_fixtures(dataset_dir: Path, synthetic_rows: int = 0) -> tuple[dict[str, list[dict]], dict[str, str]]:
+    """Datasets by id, and actor -> id of its newest dataset."""
+    datasets, actors, stamps = {}, {}, {}
+    for file in sorted(dataset_dir.glob("*.json")):
+        dataset_id = file.stem.removeprefix("dataset_")
+        datasets[dataset_id] = list(iter_records(file))
+        match = FILE_PATTERN.match(file.stem)
+        if match and match["stamp"] >= stamps.get(match["actor"], ""):
+            actors[match["actor"]] = dataset_id
+            stamps[match["actor"]] = match["stamp"]
+
+    if synthetic_rows:
+        from scripts.synthetic_data import generate
+        for store, records in generate(synthetic_rows).items():
+            datasets[f"synthetic-{store}"] = records
+            actors[f"synthetic-{store}"] = f"synthetic-{store}"
+    return datasets, actors
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, datasets: dict, actors: dict, fail_rate: float = 0.0,
+                 latency: float = 0.0, max_rps: float = 0.0, seed: int = 0):
+        super().__init__(address, StandInHandler)
+        self.datasets = datasets
+        self.actors = actors
+        self.fail_rate = fail_rate
+        self.latency = latency
+        self.max_rps = max_rps
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_requests = 0
+        self.stats = {"requests": 0, "failed": 0, "throttled": 0, "items": 0}
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v2"
+
+    def admit(self) -> str | None:
+        """Decide this request's fate: None to serve it, or "throttled" / "failed"."""
+        with self.lock:
+            self.stats["requests"] += 1
+            now = time.monotonic()
+            if now - self.window_start >= 1.0:
+                self.window_start, self.window_requests = now, 0
+            self.window_requests += 1
+            if self.max_rps and self.window_requests > self.max_rps:
+                self.stats["throttled"] += 1
+                return "throttled"
+            if self.rng.random() < self.fail_rate:
+                self.stats["failed"] += 1
+                return "failed"
+            return None
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status: int, body, headers: dict | None = None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, str(value))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        parts = url.path.strip("/").split("/")
+
+        if server.latency:
+            time.sleep(server.latency)
+        fate = server.admit()
+        if fate == "throttled":
+            return self.send_json(429, {"error": {"type": "rate-limit-exceeded"}}, {"Retry-After": "1"})
+        if fate == "failed":
+            return self.send_json(503, {"error": {"type": "server-error"}})
+
+        if len(parts) == 4 and parts[:2] == ["v2", "datasets"] and parts[3] == "items":
+            records = server.datasets.get(parts[2])
+            if records is None:
+                return self.send_json(404, {"error": {"type": "record-not-found"}})
+            offset = int(params.get("offset", ["0"])[0])
+            limit = int(params.get("limit", [str(DEFAULT_PAGE_LIMIT)])[0])
+            page = records[offset:offset + limit]
+            if "fields" in params:
+                fields = params["fields"][0].split(",")
+                page = [{key: item[key] for key in fields if key in item} for item in page]
+            with server.lock:
+                server.stats["items"] += len(page)
+            return self.send_json(200, page, {
+                "X-Apify-Pagination-Total": len(records),
+                "X-Apify-Pagination-Offset": offset,
+                "X-Apify-Pagination-Limit": limit,
+                "X-Apify-Pagination-Count": len(page),
+            })
+
+        if len(parts) == 5 and parts[:2] == ["v2", "acts"] and parts[3:] == ["runs", "last"]:
+            dataset_id = server.actors.get(parts[2])
+            if dataset_id is None:
+                return self.send_json(404, {"error": {"type": "record-not-found"}})
+            return self.send_json(200, {"data": {"status": "SUCCEEDED", "defaultDatasetId": dataset_id}})
+
+        self.send_json(404, {"error": {"type": "page-not-found"}})
+
+
+def serve(dataset_dir: Path = project_root / "dataset", host: str = "127.0.0.1", port: int = 0,
+          synthetic_rows: int = 0, **options) -> StandInServer:
+    """Start the stand-in on a background thread (port 0 picks a free port); call shutdown() to stop."""
+    datasets, actors = load_fixtures(Path(dataset_dir), synthetic_rows)
+    server = StandInServer((host, port), datasets, actors, **options)
+    threading.Thread(target=server.serve_forever, name="apify-standin", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve dataset/ files through an Apify-compatible dataset API.")
+    parser.add_argument("--dataset-dir", default=str(project_root / "dataset"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--synthetic", type=int, default=0, metavar="ROWS",
+                        help="also serve ROWS synthetic records as synthetic-<store> datasets")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--max-rps", type=float, default=0.0, help="answer 429 above this many requests/s")
+    args = parser.parse_args()
+
+    server = serve(Path(args.dataset_dir), args.host, args.port, args.synthetic,
+                   fail_rate=args.fail_rate, latency=args.latency, max_rps=args.max_rps)
+    print(f"Serving {len(server.datasets)} datasets at {server.url}")
+    for actor, dataset_id in sorted(server.actors.items()):
+        print(f"  actor {actor} -> {dataset_id} ({len(server.datasets[dataset_id])} items)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"\n{server.stats}")
@@ -0,0 +1,100 @@
+# scripts/bench_alerts.py
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+'''
+    Ingest throughput with and without the price-drop alert stage.
+
+    Each mode runs in a fresh subprocess against a throwaway SQLite DB: a first
+    snapshot of ROWS products, then a second one where DROP_SHARE of them got
+    cheaper. Reports rows/sec for the second snapshot and the alerts written.
+'''
+
+ROWS = 100_000
+DROP_SHARE = 0.1
+WATCHLIST = [
+    {"keyword": "paper towel", "min_drop_pct": 5},
+    {"keyword": "protein bar", "min_drop_pct": 10, "store": "amazon"},
+    {"keyword": "", "min_drop_pct": 30, "name": "big drops"},
+]
+KEYWORDS = ["paper towel", "protein bar", "toilet paper", "chicken breast"]
+
+
+def snapshot(seed: int, drops: bool) -> list[dict]:
+    rng = random.Random(seed)
+    rows = []
+    for i in range(ROWS):
+        price = round(5 + (i % 97) * 0.25, 2)
+        if drops and rng.random() < DROP_SHARE:
+            price = round(price * rng.uniform(0.5, 0.97), 2)
+        qty = 6 + i % 12
+        rows.append({
+            "title": f"{KEYWORDS[i % len(KEYWORDS)]} item {i}",
+            "price": price,
+            "unit": f"{qty} count",
+            "normalized_unit_qty": qty,
+            "normalized_unit": "unit",
+            "price_per_unit": round(price / qty, 4),
+            "price_per_unit_status": "ok",
+            "store": "amazon",
+            "url": f"https://www.amazon.com/dp/B{i:09d}",
+        })
+    return rows
+
+
+def run_child(mode: str, out_dir: str):
+    from db.session import SessionLocal
+    from db.repository import AlertRepository, ProductRepository
+    from ingest.alerts import AlertStage, JsonlSink, OutboxSink, WatchRule
+
+    alerts = None
+    if mode == "outbox":
+        alerts = AlertStage([WatchRule(**rule) for rule in WATCHLIST], OutboxSink())
+    elif mode == "jsonl":
+        alerts = AlertStage([WatchRule(**rule) for rule in WATCHLIST], JsonlSink(Path(out_dir) / "alerts.jsonl"))
+
+    db = SessionLocal()
+    repo = ProductRepository(db, alerts=alerts)
+    repo.insert_products(snapshot(1, drops=False))
+    second = snapshot(1, drops=True)
+    start = time.perf_counter()
+    repo.insert_products(second)
+    elapsed = time.perf_counter() - start
+
+    written = 0
+    if mode == "outbox":
+        written = len(AlertRepository(db).pending(limit=ROWS))
+    elif mode == "jsonl":
+        with open(Path(out_dir) / "alerts.jsonl", encoding="utf-8") as f:
+            written = sum(1 for _ in f)
+    db.close()
+    print(json.dumps({"rows_per_sec": round(len(second) / elapsed), "alerts": written}))
+
+
+def run_benchmark():
+    print(f"{'mode':>8} {'rows/sec':>10} {'alerts':>8}")
+    for mode in ("off", "outbox", "jsonl"):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, DB_URL=f"sqlite:///{Path(tmp) / 'alerts.db'}")
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", mode, tmp],
+                env=env, capture_output=True, text=True, check=True,
+            )
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{mode:>8} {result['rows_per_sec']:>10} {result['alerts']:>8}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        run_child(sys.argv[2], sys.argv[3])
+    else:
+        run_benchmark()
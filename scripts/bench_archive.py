@@ -0,0 +1,130 @@
+# scripts/bench_archive.py
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+'''
+    Parquet archive vs OLTP database for long-range analytics.
+
+    Writes DAYS daily snapshots of PRODUCTS synthetic products into a
+    throwaway SQLite DB, rebuilds latest prices and rollups, backfills the
+    Parquet archive from that history (export_archive), then times a
+    year-wide price history and store comparison from each source, plus the
+    raw products-table scan the archive replaces.
+'''
+
+PRODUCTS = 2_000
+DAYS = 365
+CATEGORIES = ["Toilet Paper", "Protein Bar", "Paper Towel"]
+
+
+def catalog_rows(products: int, seed: int) -> list[dict]:
+    """Converted, classified rows for `products` synthetic listings with a price."""
+    from scripts.synthetic_data import iter_records
+    from transformers.categories import classify_rows
+    from transformers.cleaner import clean_all
+    from transformers.unit_converter import convert_rows
+
+    catalog = []
+    for store, record in iter_records(products, seed, products):
+        catalog.extend(clean_all([record], store))
+    catalog = convert_rows([row for row in catalog if row["price"]])
+    classify_rows(catalog)
+    return catalog
+
+
+def snapshot_rows(products: int, days: int, seed: int):
+    catalog = catalog_rows(products, seed)
+    rng = random.Random(seed)
+    first_day = datetime(2025, 1, 1, 6)
+    for day in range(days):
+        timestamp = first_day + timedelta(days=day)
+        rows = []
+        for row in catalog:
+            price = round(row["price"] * rng.uniform(0.97, 1.03), 2)
+            ppu = price / row["normalized_unit_qty"] if row["normalized_unit_qty"] else None
+            rows.append({**row, "id": f"{day}-{len(rows)}", "price": price,
+                         "price_per_unit": ppu, "timestamp": timestamp})
+        yield rows
+
+
+def timed(label: str, fn, repeat: int = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"  {label:<44} {best * 1000:>9.1f} ms  ({len(value)} rows)")
+    return value
+
+
+def main(products: int, days: int, seed: int):
+    tmp = Path(tempfile.mkdtemp(prefix="bench_archive_"))
+    os.environ["DB_URL"] = f"sqlite:///{tmp / 'bench.db'}"
+    from sqlalchemy import func
+    from db.models import Product
+    from db.repository import ProductRepository
+    from db.session import SessionLocal
+    from ingest.archive import ParquetArchive
+
+    archive = ParquetArchive(tmp / "archive")
+    db = SessionLocal()
+    repo = ProductRepository(db, archive=archive)
+
+    # insert_products stamps rows with now(); history needs its own timestamps
+    total = 0
+    for rows in snapshot_rows(products, days, seed):
+        total += repo.insert_history(rows)
+    repo.rebuild_latest_prices()
+    repo.rebuild_price_rollups()
+
+    start = time.perf_counter()
+    repo.export_archive()
+    files = list(archive.root.rglob("*.parquet"))
+    size_mb = sum(f.stat().st_size for f in files) / 1024 / 1024
+    db_mb = (tmp / "bench.db").stat().st_size / 1024 / 1024
+    print(f"{total} rows ({products} products x {days} days): DB {db_mb:.1f} MB; "
+          f"archived in {time.perf_counter() - start:.1f}s to {len(files)} files, {size_mb:.1f} MB")
+
+    start = time.perf_counter()
+    archive.compact()
+    print(f"Compacted archive in {time.perf_counter() - start:.2f}s")
+
+    year_start = datetime(2025, 1, 1)
+    year_end = year_start + timedelta(days=days - 1)
+    for category in CATEGORIES:
+        print(f"\n{category!r}")
+        db_rows = timed("price_history week (db rollups)",
+                        lambda: repo.get_price_history(category, "week", start=year_start, end=year_end))
+        pq_rows = timed("price_history week (archive)",
+                        lambda: repo.get_price_history(category, "week", source="archive",
+                                                       start=year_start, end=year_end))
+        assert len(db_rows) == len(pq_rows), (len(db_rows), len(pq_rows))
+        timed("store_comparison (db rollups)", lambda: repo.get_store_comparison(category))
+        timed("store_comparison (archive)", lambda: repo.get_store_comparison(category, source="archive"))
+        timed("store_comparison (raw products scan)", lambda: (
+            db.query(Product.store, func.avg(Product.price_per_unit))
+            .filter(Product.title.ilike(f"%{category}%"), Product.price_per_unit > 0)
+            .group_by(Product.store).all()
+        ))
+
+    db.close()
+    shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark archive-backed analytics against the DB.")
+    parser.add_argument("--products", type=int, default=PRODUCTS)
+    parser.add_argument("--days", type=int, default=DAYS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(args.products, args.days, args.seed)
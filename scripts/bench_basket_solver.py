@@ -0,0 +1,95 @@
+# scripts/bench_basket_solver.py
+import random
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from optimiser.basket import Catalog, ListItem, Offer, StorePolicy, solve
+
+'''
+    Basket solver benchmark over synthetic catalogs.
+
+    Builds catalogs of categories x stores x offers with realistic pack sizes
+    (bulk discounts plus noise), then times catalog construction (Pareto
+    frontiers) and solving shopping lists under fees, free-shipping thresholds
+    and a store limit.
+'''
+
+UNITS = {"g": [100, 250, 454, 500, 907, 1000, 1361, 2000, 2268], "ml": [355, 500, 1000, 1893, 3785], "unit": [1, 4, 6, 12, 24, 36, 48]}
+SCENARIOS = [
+    # categories, stores, offers per (category, store), list items
+    (20, 5, 200, 50),
+    (50, 8, 200, 100),
+    (100, 8, 100, 200),
+]
+REPEATS = 5
+
+
+def synthetic_catalog(rng: random.Random, categories: int, stores: int, offers: int):
+    store_names = [f"store{s}" for s in range(stores)]
+    all_offers = []
+    units = {}
+    for c in range(categories):
+        category = f"category{c}"
+        unit = rng.choice(list(UNITS))
+        units[category] = unit
+        base = rng.uniform(0.002, 0.05) if unit != "unit" else rng.uniform(0.2, 3.0)
+        for store in store_names:
+            markup = rng.uniform(0.85, 1.2)
+            for n in range(offers):
+                qty = rng.choice(UNITS[unit]) * rng.choice([1, 1, 1, 2, 3])
+                # Bigger packs are cheaper per unit, with noise
+                unit_price = base * markup * qty ** -0.08 * rng.uniform(0.9, 1.15)
+                all_offers.append(Offer(store, category, f"{category} {store} #{n}", qty, unit,
+                                        round(qty * unit_price, 2)))
+    policies = [
+        StorePolicy(store, fee=rng.choice([0.0, 0.0, 2.99]), shipping_fee=rng.choice([0.0, 5.99, 7.99]),
+                    free_shipping_threshold=rng.choice([None, 35.0, 50.0]))
+        for store in store_names
+    ]
+    return all_offers, units, policies
+
+
+def shopping_list(rng: random.Random, units: dict[str, str], size: int) -> list[ListItem]:
+    categories = list(units)
+    items = []
+    for _ in range(size):
+        category = rng.choice(categories)
+        unit = units[category]
+        items.append(ListItem(category, rng.choice(UNITS[unit]) * rng.randint(1, 4), unit))
+    return items
+
+
+def run_benchmark(seed: int = 7):
+    print(f"{'categories':>10} {'stores':>6} {'offers':>8} {'items':>6} "
+          f"{'frontier':>9} {'build ms':>9} {'cold ms':>8} {'warm ms':>8} {'total $':>9}")
+    for categories, stores, offers, size in SCENARIOS:
+        rng = random.Random(seed)
+        all_offers, units, policies = synthetic_catalog(rng, categories, stores, offers)
+
+        start = time.perf_counter()
+        catalog = Catalog(all_offers)
+        build_ms = (time.perf_counter() - start) * 1000
+        frontier = sum(len(f) for f in catalog.frontiers.values())
+
+        cold, warm = [], []
+        for r in range(REPEATS):
+            items = shopping_list(random.Random(seed + r), units, size)
+            # Fresh catalog: the first solve pays for every pack cover
+            fresh = Catalog(all_offers)
+            start = time.perf_counter()
+            plan = solve(items, fresh, policies, max_stores=3)
+            cold.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            solve(items, fresh, policies, max_stores=3)
+            warm.append((time.perf_counter() - start) * 1000)
+
+        print(f"{categories:>10} {stores:>6} {len(all_offers):>8} {size:>6} {frontier:>9} "
+              f"{build_ms:>9.1f} {max(cold):>8.1f} {max(warm):>8.1f} {plan.total:>9.2f}")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 7)
@@ -0,0 +1,106 @@
+# scripts/bench_forecast.py
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+'''
+    Forecast refresh benchmark.
+
+    1. Engine only: batched Holt fit (full parameter grid) and a one-day
+       incremental update over SERIES synthetic series.
+    2. End to end on a throwaway SQLite DB: initial fit from HISTORY_DAYS of
+       daily rollups, then the nightly refresh after one more day arrives.
+'''
+
+SERIES = 100_000
+HISTORY_DAYS = 30
+BATCH = 20_000
+
+
+def synthetic_prices(rng: np.random.Generator, series: int, days: int) -> np.ndarray:
+    base = rng.uniform(0.01, 2.0, size=(series, 1))
+    drift = rng.normal(0, 0.002, size=(series, 1)) * np.arange(days)
+    noise = rng.normal(0, 0.02, size=(series, days))
+    prices = base * (1 + drift + noise)
+    # Not every product is scraped every day
+    prices[rng.random((series, days)) < 0.2] = np.nan
+    return prices
+
+
+def bench_engine(rng: np.random.Generator):
+    from forecast.holt import holt_fit, holt_update
+
+    prices = synthetic_prices(rng, SERIES, HISTORY_DAYS + 1)
+    start = time.perf_counter()
+    fitted = [holt_fit(prices[i:i + BATCH, :HISTORY_DAYS], 0) for i in range(0, SERIES, BATCH)]
+    fit_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for (alpha, beta, state, _), i in zip(fitted, range(0, SERIES, BATCH)):
+        holt_update(state, alpha, beta, prices[i:i + BATCH, HISTORY_DAYS:], HISTORY_DAYS)
+    update_s = time.perf_counter() - start
+    print(f"engine: fit {SERIES} x {HISTORY_DAYS}d in {fit_s:.2f}s, one-day update in {update_s:.3f}s")
+
+
+def write_rollups(db, prices: np.ndarray, first_day: datetime, day_offset: int):
+    from db.models import PriceRollup
+    from sqlalchemy import insert
+
+    rows = []
+    series, days = np.nonzero(~np.isnan(prices))
+    for s, d, value in zip(series.tolist(), days.tolist(), prices[series, days].tolist()):
+        rows.append({
+            "resolution": "day",
+            "product_key": f"amazon:{s:07d}",
+            "bucket_start": first_day + timedelta(days=day_offset + d),
+            "store": "amazon",
+            "min_ppu": value,
+            "max_ppu": value,
+            "sum_ppu": value,
+            "samples": 1,
+        })
+    for offset in range(0, len(rows), 50_000):
+        db.execute(insert(PriceRollup.__table__), rows[offset:offset + 50_000])
+    db.commit()
+    return len(rows)
+
+
+def bench_db(rng: np.random.Generator):
+    from db.session import SessionLocal
+    from db.repository import ProductRepository
+
+    prices = synthetic_prices(rng, SERIES, HISTORY_DAYS + 1)
+    first_day = datetime(2025, 1, 1)
+    db = SessionLocal()
+    repo = ProductRepository(db)
+
+    rows = write_rollups(db, prices[:, :HISTORY_DAYS], first_day, 0)
+    start = time.perf_counter()
+    fitted = repo.refresh_forecasts()
+    print(f"db: initial fit of {fitted} series ({rows} day buckets) in {time.perf_counter() - start:.2f}s")
+
+    write_rollups(db, prices[:, HISTORY_DAYS:], first_day, HISTORY_DAYS)
+    start = time.perf_counter()
+    updated = repo.refresh_forecasts()
+    print(f"db: nightly refresh of {updated} series in {time.perf_counter() - start:.2f}s")
+    db.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 2 and sys.argv[1] == "--db-child":
+        bench_db(np.random.default_rng(1))
+    else:
+        bench_engine(np.random.default_rng(0))
+        with tempfile.TemporaryDirectory() as tmp:
+            # DB_URL is read at import time, so the DB run gets its own process
+            env = dict(os.environ, DB_URL=f"sqlite:///{Path(tmp) / 'forecast.db'}")
+            subprocess.run([sys.executable, __file__, "--db-child"], env=env, check=True)
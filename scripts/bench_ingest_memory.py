@@ -0,0 +1,89 @@
+# scripts/bench_ingest_memory.py
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+'''
+    Peak-RSS benchmark: eager (json.load + clean_all) vs streaming ingest.
+
+    Each measurement runs in a fresh subprocess against a throwaway SQLite DB,
+    so ru_maxrss reflects only that run.
+'''
+
+SIZES = [10_000, 50_000, 200_000]
+
+
+def write_synthetic_file(dataset_dir: Path, out_path: Path, rows: int):
+    """Cycle the sample Amazon records (which carry long descriptions) up to `rows`."""
+    samples = []
+    for file in sorted(dataset_dir.glob("*Amazon*.json")):
+        with open(file, "r", encoding="utf-8") as f:
+            samples.extend(json.load(f))
+
+    with open(out_path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for i in range(rows):
+            if i:
+                f.write(",\n")
+            json.dump(samples[i % len(samples)], f)
+        f.write("]")
+
+
+def run_child(mode: str, file_path: str):
+    from scripts.run_ingest_pipeline import convert_all, ingest_file, load_json
+    from transformers.cleaner import clean_all
+    from db.session import SessionLocal
+    from db.repository import ProductRepository
+
+    db = SessionLocal()
+    repo = ProductRepository(db)
+    if mode == "eager":
+        converted = convert_all(clean_all(load_json(file_path), "amazon"))
+        repo.insert_products(converted)
+        inserted = len(converted)
+    else:
+        inserted = ingest_file(repo, file_path, "amazon")
+    db.close()
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"rows": inserted, "peak_rss_mb": round(peak_kb / 1024, 1)}))
+
+
+def measure(mode: str, file_path: Path, db_path: Path) -> dict:
+    env = dict(os.environ, DB_URL=f"sqlite:///{db_path}")
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", mode, str(file_path)],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(dataset_dir: str):
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        print(f"{'rows':>8} {'file MB':>8} {'eager MB':>9} {'stream MB':>10}")
+        for rows in SIZES:
+            data_file = tmp_path / f"synthetic_{rows}.json"
+            write_synthetic_file(Path(dataset_dir), data_file, rows)
+            size_mb = data_file.stat().st_size / 1024 / 1024
+
+            eager = measure("eager", data_file, tmp_path / f"eager_{rows}.db")
+            stream = measure("stream", data_file, tmp_path / f"stream_{rows}.db")
+            print(f"{rows:>8} {size_mb:>8.1f} {eager['peak_rss_mb']:>9.1f} {stream['peak_rss_mb']:>10.1f}")
+            data_file.unlink()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        run_child(sys.argv[2], sys.argv[3])
+    elif len(sys.argv) == 2:
+        run_benchmark(sys.argv[1])
+    else:
+        print("Usage: python bench_ingest_memory.py <dataset_folder>")
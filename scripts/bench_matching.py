@@ -0,0 +1,155 @@
+# scripts/bench_matching.py
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+'''
+    Cross-store matching benchmark on a synthetic catalog with known answers.
+
+    Each base product (brand + model words + category + pack size) is listed
+    at one to three stores under a title variant: words dropped or added,
+    different separators, store-specific filler. Same-brand siblings that
+    differ only in pack size act as near-miss distractors.
+
+    1. In memory: match_catalog over --sizes listings, with pairwise
+       precision / recall against the planted clusters.
+    2. Incremental: the first --db-rows listings ingested in batches through
+       ProductRepository(matching=True) on a throwaway SQLite DB, against the
+       same ingest with matching off.
+'''
+
+DEFAULT_SIZES = [100_000, 1_000_000]
+DB_ROWS = 100_000
+BATCH = 5000
+STORES = ("amazon", "target", "walmart")
+BRANDS = ("Charmin", "Bounty", "Kirkland", "Perdue", "Quest", "LaCroix", "Cascade", "Viva",
+          "Scott", "Cottonelle", "Brawny", "Tyson", "Clif", "Kind", "Bubly", "Finish")
+CATEGORIES = {
+    "Toilet Paper": ("unit", "Mega Rolls"),
+    "Paper Towels": ("unit", "Double Rolls"),
+    "Protein Bars": ("unit", "Count"),
+    "Chicken Breasts": ("g", "oz"),
+    "Sparkling Water": ("ml", "fl oz"),
+    "Dishwasher Pods": ("unit", "Count"),
+}
+SIZES = (4, 6, 8, 12, 16, 18, 24, 30, 32, 36, 48)
+FILLER = {"amazon": ("Pack", "Bulk"), "target": ("-", "Select"), "walmart": ("2-Ply", "Value")}
+
+
+def make_vocabulary(rng: random.Random, size: int = 20000) -> list[str]:
+    consonants, vowels = "bcdfghklmnprstvz", "aeiou"
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(consonants) + rng.choice(vowels) for _ in range(rng.randint(2, 4))).title())
+    return sorted(words)
+
+
+def listings(n: int, seed: int = 0):
+    """(product_key, store, title, qty, unit, true_cluster) for n listings."""
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(rng)
+    out = []
+    base = 0
+    while len(out) < n:
+        brand = rng.choice(BRANDS)
+        category = rng.choice(list(CATEGORIES))
+        unit, unit_words = CATEGORIES[category]
+        model = rng.sample(vocabulary, 3)
+        # Siblings: same line in other pack sizes (distractors for each other)
+        for size in rng.sample(SIZES, rng.randint(1, 3)):
+            base += 1
+            for store in rng.sample(STORES, rng.randint(1, 3)):
+                words = list(model)
+                if rng.random() < 0.3:
+                    words.pop(rng.randrange(len(words)))
+                if rng.random() < 0.5:
+                    words.append(rng.choice(FILLER[store]))
+                separator = rng.choice((", ", " - ", " "))
+                title = f"{brand} {' '.join(words)} {category}{separator}{size} {unit_words}"
+                out.append((f"{store}:{base}:{len(out)}", store, title, float(size), unit, base))
+                if len(out) >= n:
+                    return out
+    return out
+
+
+def pairwise_scores(predicted: dict, truth: dict) -> tuple[float, float]:
+    def pairs(counts):
+        return sum(c * (c - 1) // 2 for c in counts.values())
+    both = pairs(Counter((predicted[k], truth[k]) for k in truth))
+    found, actual = pairs(Counter(predicted.values())), pairs(Counter(truth.values()))
+    return (both / found if found else 1.0), (both / actual if actual else 1.0)
+
+
+def bench_memory(sizes: list[int], seed: int):
+    from matching.lsh import MatchFeatures, match_catalog
+
+    for n in sizes:
+        items = listings(n, seed)
+        keys = [item[0] for item in items]
+        truth = {item[0]: item[5] for item in items}
+        start = time.perf_counter()
+        features = MatchFeatures.from_products([i[1] for i in items], [i[2] for i in items],
+                                               [i[3] for i in items], [i[4] for i in items])
+        del items
+        featurize_s = time.perf_counter() - start
+        clusters = match_catalog(keys, features)
+        total_s = time.perf_counter() - start
+        del features
+        precision, recall = pairwise_scores(clusters, truth)
+        multi = sum(1 for c in Counter(clusters.values()).values() if c > 1)
+        print(f"in memory  {n:>9} listings: {total_s:6.1f}s ({featurize_s:.1f}s MinHash), "
+              f"{n / total_s:>9.0f}/s, {multi} clusters, precision {precision:.3f}, recall {recall:.3f}")
+
+
+def bench_incremental(rows: int, seed: int):
+    items = listings(rows, seed)
+    data = [
+        {"title": title, "price": 9.99, "unit": None, "normalized_unit_qty": qty, "normalized_unit": unit,
+         "price_per_unit": 9.99 / qty, "price_per_unit_status": "OK", "store": store.title(),
+         "url": f"https://example.com/{store}/{key}"}
+        for key, store, title, qty, unit, _ in items
+    ]
+    for matching in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            os.environ["DB_URL"] = f"sqlite:///{Path(tmp) / 'bench.db'}"
+            import db.session
+            import importlib
+            importlib.reload(db.session)
+            from db.repository import ProductRepository
+            from db.models import ProductMatch
+            from transformers.identity import product_key
+            session = db.session.SessionLocal()
+            repo = ProductRepository(session, matching=matching)
+            start = time.perf_counter()
+            for offset in range(0, len(data), BATCH):
+                repo.insert_products(data[offset:offset + BATCH], chunk_size=BATCH)
+            seconds = time.perf_counter() - start
+            label = "matching on " if matching else "matching off"
+            print(f"incremental {label}: {rows} rows in {seconds:.1f}s ({rows / seconds:.0f} rows/s)")
+            if matching:
+                predicted = dict(session.query(ProductMatch.product_key, ProductMatch.cluster_id))
+                truth = {product_key(row["store"], row["url"], row["title"]): item[5]
+                         for row, item in zip(data, items)}
+                precision, recall = pairwise_scores(predicted, truth)
+                print(f"  incremental precision {precision:.3f}, recall {recall:.3f}")
+            session.close()
+            db.session.engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark cross-store product matching.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--db-rows", type=int, default=DB_ROWS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    bench_memory(args.sizes, args.seed)
+    if args.db_rows:
+        bench_incremental(args.db_rows, args.seed)
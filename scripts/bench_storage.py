@@ -0,0 +1,146 @@
+# scripts/bench_storage.py
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+'''
+    Legacy `products` table vs the compact and interval history layouts
+    (db.compact).
+
+    For each layout, in a fresh subprocess against a throwaway SQLite DB:
+    writes SCRAPES weekly snapshots of PRODUCTS synthetic products, where
+    each week about --change-rate of the prices move
+    (ProductRepository.insert_history), ingests one more scrape through the
+    full insert_products path, then reports stored history rows, file /
+    table / index sizes, and times the history reads that go through
+    `products`: a four-week range aggregate, a whole-history aggregate,
+    per-product history (get_latest_prices_by_product) and ranked search.
+'''
+
+PRODUCTS = 20_000
+SCRAPES = 30
+LAYOUTS = ["legacy", "compact", "intervals"]
+KEYWORD = "Protein Bar"
+# Share of prices that change from one weekly scrape to the next
+CHANGE_RATE = 0.1
+CADENCE = timedelta(days=7)
+
+
+def weekly_snapshots(products: int, scrapes: int, change_rate: float, seed: int):
+    from scripts.bench_archive import catalog_rows
+
+    catalog = catalog_rows(products, seed)
+    rng = random.Random(seed)
+    first = datetime(2025, 1, 1, 6)
+    for week in range(scrapes):
+        timestamp = first + week * CADENCE
+        for row in catalog:
+            if week and rng.random() < change_rate:
+                row["price"] = round(row["price"] * rng.uniform(0.85, 1.15), 2)
+            qty = row["normalized_unit_qty"]
+            row["price_per_unit"] = row["price"] / qty if qty else None
+        yield [{**row, "id": f"{week}-{i}", "timestamp": timestamp} for i, row in enumerate(catalog)]
+
+
+def run_layout(products: int, scrapes: int, change_rate: float, seed: int) -> dict:
+    from sqlalchemy import func, select
+    from db.models import Product
+    from db.repository import ProductRepository
+    from db.session import SessionLocal
+    from scripts.migrate_compact import STORED_ROWS, storage_report
+
+    db = SessionLocal()
+    repo = ProductRepository(db)
+    result = {"layout": repo.layout}
+
+    written, history_seconds = 0, 0.0
+    for week, rows in enumerate(weekly_snapshots(products, scrapes + 1, change_rate, seed)):
+        if week == scrapes:
+            # The extra scrape goes through the ingest path below
+            last_rows = rows
+            break
+        start = time.perf_counter()
+        written += repo.insert_history(rows)
+        history_seconds += time.perf_counter() - start
+    result["history_rows"] = written
+    result["history_rows_per_sec"] = round(written / history_seconds)
+    result["stored_rows"] = db.execute(select(func.count()).select_from(STORED_ROWS[repo.layout])).scalar()
+
+    start = time.perf_counter()
+    repo.insert_products(last_rows)
+    result["ingest_rows_per_sec"] = round(len(last_rows) / (time.perf_counter() - start))
+
+    report = storage_report(db.get_bind())
+    result.update({f"{kind}_mb": round(report[kind] / 1e6, 2) for kind in ("file", "tables", "indexes", "search")})
+
+    range_start = datetime(2025, 1, 1) + (scrapes // 2) * CADENCE
+    month = (
+        select(Product.store, func.avg(Product.price_per_unit), func.count())
+        .where(Product.timestamp >= range_start, Product.timestamp < range_start + 4 * CADENCE)
+        .group_by(Product.store)
+    )
+    everything = select(Product.store, func.avg(Product.price_per_unit), func.count()).group_by(Product.store)
+    queries = {
+        "month_range_ms": lambda: db.execute(month).all(),
+        "full_history_ms": lambda: db.execute(everything).all(),
+        "product_history_ms": lambda: repo.get_latest_prices_by_product(KEYWORD),
+        "search_ms": lambda: repo.search_products("protein bar chocolate", 50),
+    }
+    for name, query in queries.items():
+        best = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            query()
+            best = min(best, time.perf_counter() - start)
+        result[name] = round(best * 1000, 1)
+    db.close()
+    return result
+
+
+def run_child(layout: str, products: int, scrapes: int, change_rate: float, seed: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DB_URL=f"sqlite:///{Path(tmp) / 'bench.db'}", DB_HISTORY_LAYOUT=layout)
+        command = [sys.executable, __file__, "--child", "--products", str(products), "--scrapes", str(scrapes),
+                   "--change-rate", str(change_rate), "--seed", str(seed)]
+        out = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the legacy and compact snapshot history layouts.")
+    parser.add_argument("--products", type=int, default=PRODUCTS)
+    parser.add_argument("--scrapes", type=int, default=SCRAPES)
+    parser.add_argument("--change-rate", type=float, default=CHANGE_RATE)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_layout(args.products, args.scrapes, args.change_rate, args.seed), default=str))
+        return
+
+    results = [run_child(layout, args.products, args.scrapes, args.change_rate, args.seed) for layout in LAYOUTS]
+    print(f"{args.products} products x {args.scrapes} weekly scrapes, {args.change_rate:.0%} of prices change "
+          f"per scrape ({results[0]['history_rows']} snapshot rows)\n")
+    # Ratios are against the legacy layout
+    print(f"{'':<24}" + "".join(f"{r['layout']:>12}" for r in results)
+          + "".join(f"{r['layout'] + ' x':>14}" for r in results[1:]))
+    for key in ("stored_rows", "history_rows_per_sec", "ingest_rows_per_sec", "file_mb", "tables_mb", "indexes_mb",
+                "search_mb", "month_range_ms", "full_history_ms", "product_history_ms", "search_ms"):
+        legacy = results[0][key]
+        ratios = "".join(f"{r[key] / legacy:>13.2f}x" if legacy else f"{'':>14}" for r in results[1:])
+        print(f"{key:<24}" + "".join(f"{r[key]:>12}" for r in results) + ratios)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# scripts/bench_suite.py
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+'''
+    End-to-end benchmark suite over synthetic dumps (see synthetic_data.py).
+
+    For each size it times, and separately measures peak traced memory for:
+    clean_all, parse_unit_text, convert_row, convert_rows, classify_rows, insert_products,
+    get_latest_prices_by_product and the dashboard data-load path (the
+    repository calls app.py makes on a cache miss).
+
+    Every size runs in fresh subprocesses against a throwaway SQLite DB: one
+    for timings and one under tracemalloc for memory, so tracing overhead never
+    shows up in the timings. Results go to bench_results/<time>-<commit>.json;
+    --compare prints the change against an earlier results file.
+
+    Before timing anything, convert_rows is checked against convert_row row
+    for row (synthetic records plus PARITY_PRICE_BATCHES); the suite stops
+    on a mismatch.
+'''
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+# Title keywords for get_latest_prices_by_product; also the dashboard's categories
+KEYWORDS = ["Toilet Paper", "Protein Bar", "Paper Towel", "Chicken Breast"]
+# Slower than the baseline by more than this factor is flagged
+REGRESSION_FACTOR = 1.2
+# Price columns pandas would not store as object (all strings -> str dtype, etc.)
+PARITY_PRICE_BATCHES = [
+    ["1.99", "x", "2"],
+    ["1.99", None, "x"],
+    [1.5, None, "x", 2],
+    [None, None],
+]
+
+
+def convert_parity_mismatches(rows: int, seed: int) -> list[dict]:
+    """Rows where convert_rows disagrees with convert_row."""
+    from scripts.synthetic_data import generate
+    from transformers.cleaner import clean_all
+    from transformers.unit_converter import convert_row, convert_rows
+
+    batches = [[row for store, records in generate(rows, seed).items() for row in clean_all(records, store)]]
+    batches += [[{"unit": "12 oz", "price": price} for price in prices] for prices in PARITY_PRICE_BATCHES]
+    mismatches = []
+    for batch in batches:
+        expected = [convert_row(dict(row)) for row in batch]
+        try:
+            converted = convert_rows([dict(row) for row in batch])
+        except Exception as e:
+            mismatches.append({"batch": batch[:3], "error": f"{type(e).__name__}: {e}"})
+            continue
+        mismatches += [got for got, want in zip(converted, expected) if got != want]
+    return mismatches
+
+
+def run_stages(rows: int, seed: int, trace: bool) -> list[dict]:
+    from scripts.synthetic_data import generate
+    from transformers.categories import classify_rows
+    from transformers.cleaner import clean_all
+    from transformers.unit_converter import _parse_normalized, convert_row, convert_rows, parse_unit_text
+    from db.session import SessionLocal
+    from db.repository import ProductRepository
+
+    results = []
+
+    def stage(name: str, fn, count: int):
+        if trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        value = fn()
+        seconds = time.perf_counter() - start
+        result = {"stage": name, "rows": rows, "items": count, "seconds": round(seconds, 6),
+                  "items_per_sec": round(count / seconds, 1) if seconds else None}
+        if trace:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            result = {"stage": name, "rows": rows, "peak_mb": round(peak / 1024 / 1024, 2)}
+        results.append(result)
+        return value
+
+    raw = generate(rows, seed)
+    cleaned = stage("clean_all", lambda: [row for store, records in raw.items()
+                                          for row in clean_all(records, store)], rows)
+    del raw
+
+    units = [row["unit"] for row in cleaned]
+    _parse_normalized.cache_clear()
+    stage("parse_unit_text", lambda: [parse_unit_text(unit) for unit in units if unit], len(units))
+    stage("convert_row", lambda: [convert_row(dict(row)) for row in cleaned], len(cleaned))
+    converted = stage("convert_rows", lambda: convert_rows([dict(row) for row in cleaned]), len(cleaned))
+    stage("classify_rows", lambda: classify_rows(converted), len(converted))
+
+    db = SessionLocal()
+    repo = ProductRepository(db)
+    stage("insert_products", lambda: repo.insert_products(converted), len(converted))
+
+    stage("get_latest_prices_by_product",
+          lambda: [repo.get_latest_prices_by_product(keyword) for keyword in KEYWORDS], len(KEYWORDS))
+
+    def dashboard_load():
+        for category in KEYWORDS:
+            repo.get_data_version()
+            repo.get_ranking_summary(category)
+            repo.get_ranking_page(category, limit=10)
+            repo.get_price_history(category, resolution="day")
+            repo.get_price_forecast(category)
+
+    stage("dashboard_load", dashboard_load, len(KEYWORDS))
+    db.close()
+    return results
+
+
+def run_child(rows: int, seed: int, trace: bool) -> list[dict]:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DB_URL=f"sqlite:///{Path(tmp) / 'bench.db'}")
+        command = [sys.executable, __file__, "--child", str(rows), "--seed", str(seed)]
+        if trace:
+            command.append("--trace")
+        out = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=project_root,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def merge(timings: list[dict], memory: list[dict]) -> list[dict]:
+    peaks = {(m["stage"], m["rows"]): m["peak_mb"] for m in memory}
+    return [{**t, "peak_mb": peaks.get((t["stage"], t["rows"]))} for t in timings]
+
+
+def compare(results: list[dict], baseline_path: str):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["stage"], r["rows"]): r for r in json.load(f)["results"]}
+
+    print(f"\nvs {baseline_path}")
+    print(f"{'stage':<30} {'rows':>9} {'before s':>10} {'after s':>10} {'ratio':>7}")
+    for r in results:
+        before = baseline.get((r["stage"], r["rows"]))
+        if not before or not before["seconds"]:
+            continue
+        ratio = r["seconds"] / before["seconds"]
+        flag = "  REGRESSION" if ratio > REGRESSION_FACTOR else ""
+        print(f"{r['stage']:<30} {r['rows']:>9} {before['seconds']:>10.4f} {r['seconds']:>10.4f} {ratio:>6.2f}x{flag}")
+
+
+def run_suite(sizes: list[int], seed: int, out_dir: str, memory: bool, baseline: str | None):
+    mismatches = convert_parity_mismatches(min(sizes), seed)
+    if mismatches:
+        print(f"❌ {len(mismatches)} rows convert differently in convert_rows, e.g. {mismatches[0]!r}")
+        return
+
+    results = []
+    for rows in sizes:
+        timings = run_child(rows, seed, trace=False)
+        results.extend(merge(timings, run_child(rows, seed, trace=True) if memory else []))
+
+    print(f"{'stage':<30} {'rows':>9} {'seconds':>10} {'items/s':>12} {'peak MB':>9}")
+    for r in results:
+        peak = "-" if r["peak_mb"] is None else f"{r['peak_mb']:.1f}"
+        print(f"{r['stage']:<30} {r['rows']:>9} {r['seconds']:>10.4f} {r['items_per_sec'] or 0:>12.1f} {peak:>9}")
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "commit": commit,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "sizes": sizes,
+        },
+        "results": results,
+    }
+    out_path = Path(out_dir) / f"{datetime.now():%Y%m%d-%H%M%S}-{commit or 'nogit'}.json"
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {out_path}")
+
+    if baseline:
+        compare(results, baseline)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark clean/convert/insert/query stages on synthetic data.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="total synthetic records per run (10^3 .. 10^7)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=str(project_root / "bench_results"),
+                        help="directory for the JSON results file")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--compare", metavar="RESULTS_JSON", help="earlier results file to compare against")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--trace", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_stages(args.child, args.seed, args.trace)))
+    else:
+        run_suite(args.sizes, args.seed, args.out, not args.no_memory, args.compare)
@@ -0,0 +1,117 @@
+# scripts/bench_unit_parser.py
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from transformers.unit_converter import UNIT_MAP, parse_unit_text, _parse_normalized
+
+
+def parse_unit_text_baseline(unit_str: str | None) -> tuple[float | None, str | None]:
+    """The original three-regex parser, kept here as the benchmark baseline."""
+    if not unit_str:
+        return None, None
+
+    unit_str = unit_str.lower()
+
+    multi_match = re.search(
+        r"(\d+)\s*[xX]\s*(\d+(\.\d+)?)\s*(oz|fl oz|g|kg|ml|l|count|ct|bars|packs|tablets|sheets|rolls)",
+        unit_str
+    )
+    if multi_match:
+        total_quantity = float(multi_match.group(1)) * float(multi_match.group(2))
+        raw_unit = multi_match.group(4)
+        std_unit, factor = UNIT_MAP[raw_unit]
+        return round(total_quantity * factor, 2), std_unit
+
+    pack_match = re.search(
+        r"(\d+)\s*pack[s]?\s*(of)?\s*(\d+(\.\d+)?)\s*(oz|fl oz|g|kg|ml|l|count|ct|bars|tablets|sheets|rolls)",
+        unit_str
+    )
+    if pack_match:
+        total_quantity = float(pack_match.group(1)) * float(pack_match.group(3))
+        raw_unit = pack_match.group(5)
+        std_unit, factor = UNIT_MAP[raw_unit]
+        return round(total_quantity * factor, 2), std_unit
+
+    single_match = re.search(
+        r"([\d,.]+)\s*(oz|fl oz|g|kg|ml|l|count|ct|bars|packs|tablets|sheets|rolls)",
+        unit_str
+    )
+    if single_match:
+        quantity = float(single_match.group(1).replace(",", ""))
+        raw_unit = single_match.group(2)
+        std_unit, factor = UNIT_MAP[raw_unit]
+        return round(quantity * factor, 2), std_unit
+
+    return None, None
+
+
+def load_titles(dataset_dir: Path) -> list[str]:
+    titles = []
+    for file in sorted(dataset_dir.glob("*.json")):
+        with open(file, "r", encoding="utf-8") as f:
+            for item in json.load(f):
+                title = item.get("title") or item.get("name")
+                if title:
+                    titles.append(title)
+    return titles
+
+
+def safe_parse(fn, text):
+    try:
+        return fn(text)
+    except ValueError as e:
+        return type(e).__name__
+
+
+def titles_per_second(fn, titles: list[str]) -> float:
+    start = time.perf_counter()
+    for title in titles:
+        safe_parse(fn, title)
+    return len(titles) / (time.perf_counter() - start)
+
+
+def run_benchmark(dataset_dir: str, rows: int):
+    titles = load_titles(Path(dataset_dir))
+    if not titles:
+        print(f"No titles found in {dataset_dir}")
+        return
+
+    # Nightly scrapes repeat the same catalogue, so cycle the sample titles
+    workload = (titles * (rows // len(titles) + 1))[:rows]
+
+    mismatches = [
+        t for t in titles
+        if safe_parse(parse_unit_text_baseline, t) != safe_parse(parse_unit_text, t)
+    ]
+    if mismatches:
+        print(f"❌ {len(mismatches)} titles parse differently, e.g. {mismatches[0]!r}")
+        return
+
+    baseline = titles_per_second(parse_unit_text_baseline, workload)
+
+    def uncached(text):
+        return _parse_normalized.__wrapped__(text.lower().strip()) if text else (None, None)
+
+    compiled = titles_per_second(uncached, workload)
+
+    _parse_normalized.cache_clear()
+    cached = titles_per_second(parse_unit_text, workload)
+
+    print(f"Titles: {len(workload)} ({len(titles)} distinct)")
+    print(f"  baseline (3x re.search): {baseline:>12,.0f} titles/s")
+    print(f"  compiled grammar:        {compiled:>12,.0f} titles/s ({compiled / baseline:.2f}x)")
+    print(f"  compiled + LRU cache:    {cached:>12,.0f} titles/s ({cached / baseline:.2f}x)")
+    print(f"  cache: {_parse_normalized.cache_info()}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python bench_unit_parser.py <dataset_folder> [rows]")
+    else:
+        run_benchmark(sys.argv[1], int(sys.argv[2]) if len(sys.argv) == 3 else 1_000_000)
@@ -0,0 +1,166 @@
+# scripts/check_fetch.py
+import argparse
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from ingest.fetch import DatasetSource, FetchError, iter_dataset_pages, resolve_sources
+from scripts.apify_standin import FILE_PATTERN, serve
+from transformers.cleaner import adapter_for_filename
+
+'''
+    End-to-end check of ingest/fetch.py against the local Apify stand-in.
+
+    Serves dataset/ through scripts/apify_standin.py with injected 503s
+    (--fail-rate) and 429s (--max-rps), then checks that:
+
+        every dataset comes back through iter_dataset_pages identical to
+        its file, in order (whole items and projected to the adapter's fields)
+        an actor source resolves to the default dataset of its newest file,
+        both in iter_dataset_pages and in resolve_sources
+        an unknown dataset or actor raises FetchError
+        closing the page iterator early stops the fetch thread and its requests
+
+    Prints one ❌ line per failed check and exits non-zero if any failed.
+
+        python scripts/check_fetch.py --fail-rate 0.3 --page-size 7
+'''
+
+FAIL_RATE = 0.3
+MAX_RPS = 10
+PAGE_SIZE = 7
+# Enough that a 0.3 fail rate practically never exhausts a request's retries
+MAX_RETRIES = 12
+
+
+class Checks:
+    def __init__(self):
+        self.passed = 0
+        self.failed = 0
+
+    def expect(self, condition: bool, message: str):
+        if condition:
+            self.passed += 1
+        else:
+            self.failed += 1
+            print(f"❌ {message}")
+
+
+def load_file(path: Path) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def first_difference(got: list[dict], expected: list[dict]) -> str:
+    for index, (a, b) in enumerate(zip(got, expected)):
+        if a != b:
+            return f"item {index} differs"
+    return f"{len(got)} items, expected {len(expected)}"
+
+
+def fetch_all(source: DatasetSource, fields=None, **fetcher_kwargs) -> list[dict]:
+    return [item for page in iter_dataset_pages(source, fields, **fetcher_kwargs) for item in page]
+
+
+def check_datasets(checks: Checks, files: list[Path], fetcher_kwargs: dict):
+    for file in files:
+        adapter = adapter_for_filename(file.name)
+        source = DatasetSource(adapter.name, dataset_id=file.stem.removeprefix("dataset_"))
+        expected = load_file(file)
+
+        got = fetch_all(source, **fetcher_kwargs)
+        checks.expect(got == expected, f"{file.name}: {first_difference(got, expected)}")
+
+        got = fetch_all(source, adapter.fields, **fetcher_kwargs)
+        projected = [adapter.project(item) for item in expected]
+        checks.expect(got == projected, f"{file.name} (fields): {first_difference(got, projected)}")
+
+
+def check_actors(checks: Checks, files: list[Path], fetcher_kwargs: dict):
+    newest = {}
+    for file in files:
+        match = FILE_PATTERN.match(file.stem)
+        if match and match["stamp"] >= newest.get(match["actor"], (None, ""))[1]:
+            newest[match["actor"]] = (file, match["stamp"])
+
+    sources = [DatasetSource(adapter_for_filename(file.name).name, actor_id=actor)
+               for actor, (file, _) in sorted(newest.items())]
+    resolved = resolve_sources(sources, **fetcher_kwargs)
+    for source, pinned in zip(sources, resolved):
+        file = newest[source.actor_id][0]
+        checks.expect(pinned.dataset_id == file.stem.removeprefix("dataset_"),
+                      f"actor {source.actor_id} resolved to {pinned.dataset_id}, expected {file.name}")
+        got, expected = fetch_all(source, **fetcher_kwargs), load_file(file)
+        checks.expect(got == expected, f"actor {source.actor_id}: {first_difference(got, expected)}")
+
+
+def check_not_found(checks: Checks, fetcher_kwargs: dict):
+    for source in (DatasetSource("amazon", dataset_id="no-such-dataset"),
+                   DatasetSource("amazon", actor_id="no-such-actor")):
+        try:
+            fetch_all(source, **fetcher_kwargs)
+        except FetchError as e:
+            checks.expect("404" in str(e), f"{source.label}: FetchError without the status: {e}")
+        except Exception as e:
+            checks.expect(False, f"{source.label}: {type(e).__name__} instead of FetchError: {e}")
+        else:
+            checks.expect(False, f"{source.label}: no FetchError for a missing resource")
+
+
+def check_early_close(checks: Checks, server, files: list[Path], fetcher_kwargs: dict):
+    file = max(files, key=lambda f: len(load_file(f)))
+    source = DatasetSource(adapter_for_filename(file.name).name, dataset_id=file.stem.removeprefix("dataset_"))
+    pages = iter_dataset_pages(source, prefetch=1, **{**fetcher_kwargs, "page_size": 1})
+    first = next(pages)
+    checks.expect(first == load_file(file)[:1], f"early close: first page of {file.name} differs")
+
+    started = time.monotonic()
+    pages.close()
+    fetchers = [t for t in threading.enumerate() if t.name.startswith("apify-fetch-")]
+    checks.expect(not fetchers, "early close: fetch thread still running after close()")
+    checks.expect(time.monotonic() - started < 5, "early close: close() took over 5s")
+
+    requests = server.stats["requests"]
+    time.sleep(0.5)
+    checks.expect(server.stats["requests"] == requests, "early close: requests continued after close()")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check ingest/fetch.py against the local Apify stand-in.")
+    parser.add_argument("--dataset-dir", default=str(project_root / "dataset"))
+    parser.add_argument("--fail-rate", type=float, default=FAIL_RATE, help="fraction of requests answered with 503")
+    parser.add_argument("--max-rps", type=float, default=MAX_RPS, help="answer 429 above this many requests/s")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    dataset_dir = Path(args.dataset_dir)
+    files = [f for f in sorted(dataset_dir.glob("*.json")) if adapter_for_filename(f.name)]
+    server = serve(dataset_dir, fail_rate=args.fail_rate, max_rps=args.max_rps, seed=args.seed)
+    fetcher_kwargs = {"base_url": server.url, "page_size": args.page_size, "concurrency": args.concurrency,
+                      "rate": 1000.0, "max_retries": MAX_RETRIES}
+
+    checks = Checks()
+    start = time.perf_counter()
+    try:
+        check_datasets(checks, files, fetcher_kwargs)
+        check_actors(checks, files, fetcher_kwargs)
+        check_not_found(checks, fetcher_kwargs)
+        check_early_close(checks, server, files, fetcher_kwargs)
+    finally:
+        server.shutdown()
+
+    print(f"{checks.passed} checks passed, {checks.failed} failed over {len(files)} datasets "
+          f"in {time.perf_counter() - start:.1f}s")
+    print(f"  stand-in: {server.stats}")
+    sys.exit(1 if checks.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
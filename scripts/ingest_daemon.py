@@ -0,0 +1,304 @@
+# scripts/ingest_daemon.py
+import argparse
+import json
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from ingest.alerts import AlertStage, JsonlSink, OutboxSink, load_watchlist
+from ingest.archive import ParquetArchive
+from ingest.manifest import fingerprint, hash_file, is_unchanged
+from ingest.metrics import RunMetrics
+from ingest.reader import DEFAULT_CHUNK_SIZE
+from ingest.stages import iter_converted_chunks
+from ingest.watcher import POLL_INTERVAL, Debouncer, open_watcher, scan
+from db.session import SessionLocal
+from db.repository import BulkInsertError, ManifestRepository, ProductRepository
+from scripts.run_ingest_pipeline import iter_inserted, refresh_forecasts, resume_point
+from transformers.cleaner import adapter_for_filename
+
+'''
+    Resident ingest service: watches a dataset folder and ingests files as
+    they land, instead of a cron-run run_ingest_pipeline.py.
+
+        python scripts/ingest_daemon.py dataset/ [--status-file ingest_status.json]
+
+    The main thread turns folder events (inotify, or polling where that is
+    unavailable; see ingest.watcher) into debounced paths and feeds them to
+    one DB writer thread through a bounded queue; paths that do not fit stay
+    pending (one entry per file) until the writer catches up. The process
+    imports, creates tables and resolves store adapters once, and the writer
+    keeps its session, pooled connection and repository caches across files.
+
+    Each file is read from its last checkpoint (ingest_progress), which is
+    committed in the same transaction as the chunk it counts, so a restart
+    (or crash) resumes after the last committed chunk. A file whose end does
+    not parse yet (still being written) is ingested up to its last complete
+    chunk and picked up again on its next change; once a file parses to its
+    end it gets a manifest entry, like a cron run would write. Files are
+    expected to be written once or appended to: one that grows after being
+    ingested continues from its checkpoint; one that shrinks, or no longer
+    starts with the bytes its checkpoint covered, starts over.
+
+    Forecasts are refreshed when the queue is idle, at most every
+    --forecast-interval seconds. SIGTERM / SIGINT stop after the current
+    chunk commits. Every --heartbeat seconds the status file (JSON, replaced
+    atomically) reports the state, queue depths, the file in progress, per-
+    result file counts, rows, stage timings and the last error.
+'''
+
+STATUS_FILE = "ingest_status.json"
+HEARTBEAT = 5.0
+DEBOUNCE = 2.0
+MAX_WAIT = 30.0
+QUEUE_SIZE = 64
+FORECAST_INTERVAL = 600.0
+# Longest the main loop sleeps, so shutdown and heartbeats stay prompt
+TICK = 1.0
+
+
+def ingest_resumable(repo: ProductRepository, manifest: ManifestRepository, path: Path, store: str,
+                     chunk_size: int = DEFAULT_CHUNK_SIZE, metrics: RunMetrics | None = None,
+                     stop: threading.Event | None = None, on_chunk=None) -> tuple[str, str | None]:
+    """
+    Ingest what `path` holds beyond its last checkpoint; returns (result, detail).
+
+    result is "ingested" (parsed to its end; manifest written), "partial"
+    (the end does not parse yet; detail says why), "skipped" (unchanged
+    since its manifest entry) or "stopped" (stop was set between chunks).
+    on_chunk(records, rows, added) runs after each committed chunk.
+    """
+    fp = fingerprint(path)
+    unchanged, content_hash = is_unchanged(manifest.get(fp.path), fp)
+    if unchanged:
+        return "skipped", None
+
+    records, rows = resume_point(manifest, fp)
+    chunks = iter_converted_chunks(fp.path, store, chunk_size, metrics=metrics, skip=records)
+    try:
+        for records, rows, added in iter_inserted(repo, chunks, chunk_size, metrics, fp, records, rows):
+            if on_chunk:
+                on_chunk(records, rows, added)
+            if stop is not None and stop.is_set():
+                return "stopped", None
+    except BulkInsertError:
+        raise
+    except Exception as e:
+        # Most likely a record still being written; committed chunks stay
+        message = (str(e).splitlines() or [""])[0]
+        return "partial", f"{type(e).__name__}: {message}"
+
+    manifest.record(fp.path, fp.size, fp.mtime, content_hash or hash_file(fp.path), rows)
+    return "ingested", None
+
+
+class IngestDaemon:
+    """Folder watcher (main thread) + single DB writer thread; see the module docstring."""
+
+    def __init__(self, dataset_dir: str | Path, status_file: str | Path = STATUS_FILE,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, queue_size: int = QUEUE_SIZE,
+                 debounce: float = DEBOUNCE, max_wait: float = MAX_WAIT, poll_interval: float = POLL_INTERVAL,
+                 polling: bool = False, heartbeat: float = HEARTBEAT,
+                 forecast_interval: float = FORECAST_INTERVAL, alerts=None, archive=None, matching: bool = False):
+        self.dataset_dir = Path(dataset_dir).resolve()
+        self.status_file = Path(status_file)
+        self.chunk_size = chunk_size
+        self.debouncer = Debouncer(debounce, max_wait)
+        self.poll_interval = poll_interval
+        self.polling = polling
+        self.heartbeat = heartbeat
+        self.forecast_interval = forecast_interval
+        self.alerts = alerts
+        self.archive = archive
+        self.matching = matching
+
+        self.stop = threading.Event()
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.metrics = RunMetrics()
+        self._queued = set()
+        self._lock = threading.Lock()
+        self.status = {
+            "pid": os.getpid(),
+            "state": "starting",
+            "dataset": str(self.dataset_dir),
+            "watcher": None,
+            "started_at": datetime.now(),
+            "current": None,
+            "files": {"ingested": 0, "partial": 0, "skipped": 0, "failed": 0, "stopped": 0},
+            "rows": 0,
+            "last_file": None,
+            "last_error": None,
+            "forecasts_at": None,
+        }
+
+    @staticmethod
+    def is_dataset(path: Path) -> bool:
+        return adapter_for_filename(path.name) is not None
+
+    def run(self):
+        watcher = open_watcher(self.dataset_dir, poll_interval=self.poll_interval, polling=self.polling)
+        self.status["watcher"] = watcher.backend
+        # Backlog: files new, changed or half-ingested since the last run (the manifest skips the rest)
+        for path in scan(self.dataset_dir):
+            if self.is_dataset(path):
+                self.debouncer.touch(path)
+        print(f"Watching {self.dataset_dir} ({watcher.backend}), {len(self.debouncer)} files to check", flush=True)
+
+        writer = threading.Thread(target=self._write_loop, name="ingest-writer")
+        writer.start()
+        self._set(state="idle")
+        next_beat = 0.0
+        try:
+            while not self.stop.is_set():
+                if not writer.is_alive():
+                    raise RuntimeError("DB writer thread exited unexpectedly")
+                wait = self.debouncer.next_due()
+                for path in watcher.poll(TICK if wait is None else min(wait, TICK)):
+                    if self.is_dataset(path):
+                        self.debouncer.touch(path)
+                self._enqueue_due()
+                if time.monotonic() >= next_beat:
+                    self.write_status()
+                    next_beat = time.monotonic() + self.heartbeat
+        finally:
+            self.stop.set()
+            self._set(state="stopping")
+            self.write_status()
+            writer.join()
+            watcher.close()
+            self._set(state="stopped", current=None)
+            self.write_status()
+            print("Stopped", flush=True)
+
+    def _enqueue_due(self):
+        # Only as many as fit: the rest stay pending in the debouncer, one entry per file
+        free = self.queue.maxsize - self.queue.qsize()
+        for path in self.debouncer.due(limit=free):
+            with self._lock:
+                if path in self._queued:
+                    # Still waiting for the writer, which will read the file as it is then
+                    continue
+                self._queued.add(path)
+            self.queue.put_nowait(path)
+
+    def _write_loop(self):
+        db = SessionLocal()
+        repo = ProductRepository(db, alerts=self.alerts, archive=self.archive, matching=self.matching)
+        manifest = ManifestRepository(db)
+        new_rows, last_forecast = 0, time.monotonic()
+        try:
+            while not self.stop.is_set():
+                try:
+                    path = self.queue.get(timeout=TICK)
+                except queue.Empty:
+                    if new_rows and time.monotonic() - last_forecast >= self.forecast_interval:
+                        refresh_forecasts(metrics=self.metrics)
+                        new_rows, last_forecast = 0, time.monotonic()
+                        self._set(forecasts_at=datetime.now())
+                    continue
+                with self._lock:
+                    self._queued.discard(path)
+                new_rows += self._ingest(repo, manifest, path)
+                # Back to the pool (which keeps it open) between files
+                db.close()
+        finally:
+            db.close()
+
+    def _ingest(self, repo: ProductRepository, manifest: ManifestRepository, path: Path) -> int:
+        store = adapter_for_filename(path.name).name
+        current = {"path": str(path), "store": store, "records": 0, "rows": 0, "added": 0}
+        self._set(state="ingesting", current=current)
+
+        def on_chunk(records: int, rows: int, added: int):
+            with self._lock:
+                current.update(records=records, rows=rows, added=current["added"] + added)
+                self.status["rows"] += added
+
+        started = time.perf_counter()
+        try:
+            result, detail = ingest_resumable(repo, manifest, path, store, self.chunk_size, self.metrics,
+                                              self.stop, on_chunk)
+        except Exception as e:
+            # Retried on the file's next change (or the next start)
+            result, detail = "failed", f"{type(e).__name__}: {e}"
+
+        with self._lock:
+            self.status["files"][result] += 1
+            self.status["last_file"] = {"path": str(path), "result": result, "rows": current["added"],
+                                        "seconds": round(time.perf_counter() - started, 3), "at": datetime.now()}
+            if result in ("partial", "failed"):
+                self.status["last_error"] = {"path": str(path), "error": detail, "at": datetime.now()}
+            self.status.update(state="idle", current=None)
+        if result != "skipped":
+            print(f" {path.name}: {result}, {current['added']} rows" + (f" ({detail})" if detail else ""),
+                  flush=True)
+        return current["added"]
+
+    def _set(self, **fields):
+        with self._lock:
+            self.status.update(fields)
+
+    def write_status(self):
+        with self._lock:
+            status = {**self.status, "heartbeat_at": datetime.now(), "pending": len(self.debouncer),
+                      "queued": self.queue.qsize(), "queue_size": self.queue.maxsize,
+                      "stages": self.metrics.to_dict()["stages"]}
+            content = json.dumps(status, indent=2, default=str)
+        self.status_file.parent.mkdir(parents=True, exist_ok=True)
+        # Readers (monitoring) never see a half-written file
+        tmp = self.status_file.with_name(f".{self.status_file.name}.{os.getpid()}.tmp")
+        tmp.write_text(content, encoding="utf-8")
+        os.replace(tmp, self.status_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch a dataset folder and ingest files as they land.")
+    parser.add_argument("dataset_folder")
+    parser.add_argument("--status-file", default=STATUS_FILE,
+                        help=f"heartbeat / status JSON, rewritten every --heartbeat seconds (default: {STATUS_FILE})")
+    parser.add_argument("--heartbeat", type=float, default=HEARTBEAT, help="seconds between status writes")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE,
+                        help="seconds a file must be quiet before it is ingested")
+    parser.add_argument("--max-wait", type=float, default=MAX_WAIT,
+                        help="ingest a file that keeps changing at most this long after its first change")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="files waiting for the DB writer")
+    parser.add_argument("--polling", action="store_true", help="poll the folder instead of using inotify")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL, help="seconds between polls")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="records per transaction and checkpoint")
+    parser.add_argument("--forecast-interval", type=float, default=FORECAST_INTERVAL,
+                        help="refresh forecasts at most this often, when idle after new rows")
+    parser.add_argument("--match-products", action="store_true",
+                        help="match new products into cross-store clusters as they are ingested")
+    parser.add_argument("--watchlist", help="JSON list of price-drop rules; matching drops are written as alerts")
+    parser.add_argument("--alerts-jsonl", help="append alerts to this JSON Lines file instead of alert_outbox")
+    parser.add_argument("--archive", metavar="DIR", help="also append ingested rows to a Parquet archive")
+    args = parser.parse_args()
+    if not Path(args.dataset_folder).is_dir():
+        parser.error(f"not a directory: {args.dataset_folder}")
+
+    alerts = None
+    if args.watchlist:
+        sink = JsonlSink(args.alerts_jsonl) if args.alerts_jsonl else OutboxSink()
+        alerts = AlertStage(load_watchlist(args.watchlist), sink)
+
+    daemon = IngestDaemon(args.dataset_folder, args.status_file, args.chunk_size, args.queue_size,
+                          args.debounce, args.max_wait, args.poll_interval, args.polling, args.heartbeat,
+                          args.forecast_interval, alerts=alerts,
+                          archive=ParquetArchive(args.archive) if args.archive else None,
+                          matching=args.match_products)
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: daemon.stop.set())
+    daemon.run()
+
+
+if __name__ == "__main__":
+    main()
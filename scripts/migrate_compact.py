@@ -0,0 +1,229 @@
+# scripts/migrate_compact.py
+import argparse
+import shutil
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm import sessionmaker
+
+from db.compact import (COMPACT, DIMENSION_TABLES, INTERVALS, LAYOUT_TABLES, LEGACY, create_history_view,
+                        create_layout_tables, forget_layout, history_layout, history_writer)
+from db.models import LatestPrice, PriceFact, PriceInterval, Product
+from db.search import drop_search_index, ensure_search_index
+from db.session import engine
+from transformers.identity import product_key
+
+'''
+    Convert a database's snapshot history to one of the normalized layouts
+    (see db.compact), in place.
+
+        python scripts/migrate_compact.py                      # legacy -> compact (DB_URL or ./basket.db)
+        python scripts/migrate_compact.py --layout intervals   # any layout -> change-only intervals
+        python scripts/migrate_compact.py --keep-legacy        # keep a legacy table as products_legacy
+
+    Steps: the current history (the legacy table, or the `products` view of
+    another normalized layout) is read in timestamp order, in ranges of about
+    --batch-size rows, and appended through the target layout's writer with
+    one commit per range. latest_prices rows are then appended once more
+    (a no-op for history) so each product gets its newest title / url / unit
+    / category and latest_prices.product_id points at the new ids. Finally
+    the old tables and search index are replaced by the new `products` view
+    and a search index over dim_products.
+
+    On SQLite the file is copied to <db>.bak first (--no-backup skips it) and
+    table / index sizes are reported before and after (needs the dbstat
+    virtual table). Snapshots of the same product sharing one timestamp (one
+    day, for intervals) are collapsed to the last one; the counts printed at
+    the end show the effect.
+'''
+
+DEFAULT_BATCH = 20000
+
+# History tables each layout's writer fills, for the summary
+STORED_ROWS = {LEGACY: Product.__table__, COMPACT: PriceFact.__table__, INTERVALS: PriceInterval.__table__}
+
+
+def storage_report(engine) -> dict | None:
+    """Bytes per category of b-tree on SQLite: table data, indexes, search index; None elsewhere."""
+    if engine.dialect.name != "sqlite":
+        return None
+    with engine.connect() as conn:
+        try:
+            sizes = dict(conn.exec_driver_sql("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name").all())
+        except Exception:
+            return None
+        kinds = dict(conn.exec_driver_sql("SELECT name, type FROM sqlite_master").all())
+        page_size = conn.exec_driver_sql("PRAGMA page_size").scalar()
+        pages = conn.exec_driver_sql("PRAGMA page_count").scalar()
+
+    report = {"file": page_size * pages, "tables": 0, "indexes": 0, "search": 0, "by_name": sizes}
+    for name, size in sizes.items():
+        if name.startswith("products_fts"):
+            report["search"] += size
+        elif kinds.get(name) == "index" or name.startswith("sqlite_autoindex"):
+            report["indexes"] += size
+        else:
+            report["tables"] += size
+    return report
+
+
+def print_report(label: str, report: dict | None):
+    if report is None:
+        print(f"{label}: size report unavailable (not SQLite, or no dbstat)")
+        return
+    print(f"{label}: file {report['file'] / 1e6:.2f} MB | tables {report['tables'] / 1e6:.2f} MB | "
+          f"indexes {report['indexes'] / 1e6:.2f} MB | search {report['search'] / 1e6:.2f} MB")
+    history = {table.name for tables in LAYOUT_TABLES.values() for table in tables}
+    for name, size in sorted(report["by_name"].items()):
+        if name in history or name.startswith("ix_price_") or name.startswith("ix_scrape"):
+            print(f"    {name:<32} {size / 1e6:10.2f} MB")
+
+
+def time_ranges(db, batch_size: int) -> list:
+    """(first, last) timestamp ranges of about batch_size history rows each, oldest first."""
+    table = Product.__table__
+    counts = db.execute(
+        select(table.c.timestamp, func.count()).where(table.c.timestamp.isnot(None))
+        .group_by(table.c.timestamp).order_by(table.c.timestamp)
+    ).all()
+    ranges, first, size = [], None, 0
+    for timestamp, rows in counts:
+        if first is None:
+            first = timestamp
+        size += rows
+        if size >= batch_size:
+            ranges.append((first, timestamp))
+            first, size = None, 0
+    if first is not None:
+        ranges.append((first, counts[-1][0]))
+    return ranges
+
+
+def copy_history(db, writer, batch_size: int) -> int:
+    """Append the current history to `writer` in time order; returns rows read."""
+    table = Product.__table__
+    columns = [c for c in table.columns if c.name != "id"]
+    copied = 0
+    started = time.perf_counter()
+
+    batches = [table.c.timestamp.is_(None)]
+    batches += [table.c.timestamp.between(first, last) for first, last in time_ranges(db, batch_size)]
+    for where in batches:
+        rows = [dict(r._mapping) for r in db.execute(select(*columns).where(where).order_by(table.c.timestamp))]
+        if not rows:
+            continue
+        writer.append(rows, [product_key(row["store"], row["url"], row["title"]) for row in rows])
+        db.commit()
+        copied += len(rows)
+        print(f"  {copied} rows copied ({copied / (time.perf_counter() - started):,.0f} rows/s)", end="\r")
+    print()
+    return copied
+
+
+def sync_from_latest(db, writer, batch_size: int) -> int:
+    """Re-append latest_prices rows: newest product attributes, and latest_prices.product_id -> new ids."""
+    table = LatestPrice.__table__
+    columns = [c for c in table.columns if c.name != "product_id"]
+    remap = update(table).where(table.c.product_key == bindparam("key")).values(product_id=bindparam("new_id"))
+    synced, last = 0, None
+    while True:
+        page = select(*columns).order_by(table.c.product_key).limit(batch_size)
+        if last is not None:
+            page = page.where(table.c.product_key > last)
+        rows = [dict(r._mapping) for r in db.execute(page)]
+        if not rows:
+            break
+        last = rows[-1]["product_key"]
+        writer.append(rows, [row["product_key"] for row in rows])
+        db.execute(remap, [{"key": row["product_key"], "new_id": row["id"]} for row in rows])
+        db.commit()
+        synced += len(rows)
+    return synced
+
+
+def drop_history(conn, layout: str, keep_legacy: bool):
+    if layout == LEGACY:
+        conn.exec_driver_sql("DROP INDEX IF EXISTS ix_products_migrate_timestamp")
+        if keep_legacy:
+            conn.exec_driver_sql("ALTER TABLE products RENAME TO products_legacy")
+        else:
+            conn.exec_driver_sql("DROP TABLE products")
+        return
+    conn.exec_driver_sql("DROP VIEW products")
+    # Dimension tables are shared by the normalized layouts
+    for table in LAYOUT_TABLES[layout]:
+        if table not in DIMENSION_TABLES:
+            conn.exec_driver_sql(f"DROP TABLE {table.name}")
+
+
+def count(conn, table) -> int:
+    return conn.execute(select(func.count()).select_from(table)).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate snapshot history to a normalized layout")
+    parser.add_argument("--layout", choices=[COMPACT, INTERVALS], default=COMPACT,
+                        help=f"Target layout (default: {COMPACT})")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH,
+                        help=f"History rows per copy batch (default: {DEFAULT_BATCH})")
+    parser.add_argument("--keep-legacy", action="store_true",
+                        help="Rename a legacy products table to products_legacy instead of dropping it")
+    parser.add_argument("--no-backup", action="store_true", help="Skip the SQLite file backup")
+    parser.add_argument("--no-vacuum", action="store_true", help="Skip VACUUM after the migration (SQLite)")
+    args = parser.parse_args()
+
+    source = history_layout(engine)
+    if source == args.layout:
+        print(f"Database already uses the {source} layout; nothing to do.")
+        return
+
+    if engine.dialect.name == "sqlite" and not args.no_backup and engine.url.database:
+        backup = f"{engine.url.database}.bak"
+        shutil.copyfile(engine.url.database, backup)
+        print(f"Backup: {backup}")
+
+    print_report("Before", storage_report(engine))
+
+    create_layout_tables(engine, args.layout)
+    if source == LEGACY:
+        # Range reads by time; dropped with the legacy table
+        with engine.begin() as conn:
+            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_products_migrate_timestamp ON products (timestamp)")
+
+    db = sessionmaker(bind=engine)()
+    try:
+        source_rows = db.execute(select(func.count()).select_from(Product.__table__)).scalar()
+        print(f"Copying {source_rows} {source} snapshot rows into the {args.layout} layout")
+        writer = history_writer(db, args.layout)
+        copy_history(db, writer, args.batch_size)
+        print(f"  {sync_from_latest(db, writer, args.batch_size)} latest prices re-linked")
+    finally:
+        db.close()
+
+    # Swap the old history for the new view (the search index points at the old tables)
+    drop_search_index(engine)
+    with engine.begin() as conn:
+        drop_history(conn, source, args.keep_legacy)
+        create_history_view(conn, args.layout)
+    forget_layout(engine)
+    ensure_search_index(engine)
+
+    with engine.connect() as conn:
+        points = count(conn, Product.__table__)
+        stored = count(conn, STORED_ROWS[args.layout])
+    print(f"Layout: {history_layout(engine)} | {source} rows {source_rows} -> {points} snapshots "
+          f"stored as {stored} {STORED_ROWS[args.layout].name} rows")
+
+    if engine.dialect.name == "sqlite" and not args.no_vacuum:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+    print_report("After", storage_report(engine))
+
+
+if __name__ == "__main__":
+    main()
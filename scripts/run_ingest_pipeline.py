@@ -1,71 +1,385 @@
 # scripts/run_ingest_pipeline.py
+import argparse
+import cProfile
 import json
+import os
+import pstats
 import sys
+import time
+from contextlib import nullcontext
 from pathlib import Path
 
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from transformers.cleaner import clean_all
-from transformers.unit_converter import convert_row
+from ingest.alerts import AlertStage, JsonlSink, OutboxSink, load_watchlist
+from ingest.archive import ParquetArchive
+from ingest.fetch import APIFY_API, DatasetSource, FetchError, iter_dataset_pages, parse_source, resolve_sources
+from ingest.manifest import FileFingerprint, fingerprint, hash_file, is_unchanged
+from ingest.metrics import RunMetrics
+from ingest.parallel import FileTask, run_parallel
+from ingest.reader import DEFAULT_CHUNK_SIZE, iter_chunks
+from ingest.stages import convert_all, convert_chunks, iter_converted_chunks
 from db.session import SessionLocal
-from db.repository import ProductRepository
+from db.repository import BulkInsertError, ManifestRepository, ProductRepository
+from transformers.cleaner import adapter_for_filename, get_adapter
 
 def infer_store_from_filename(filename: str) -> str:
-    name = filename.lower()
-    if "amazon" in name:
-        return "amazon"
-    if "walmart" in name:
-        return "walmart"
-    if "target" in name:
-        return "target"
-    raise ValueError(f"Unknown store for file: {filename}")
+    adapter = adapter_for_filename(filename)
+    if adapter is None:
+        raise ValueError(f"Unknown store for file: {filename}")
+    return adapter.name
 
 
 def load_json(file_path: str):
     with open(file_path, "r", encoding="utf-8") as f:
         return json.load(f)
 
-def run_pipeline_on_dataset_folder(dataset_dir: str):
+def dataset_files(dataset_path: Path) -> list[Path]:
+    return sorted([*dataset_path.glob("*.json"), *dataset_path.glob("*.jsonl")])
+
+def ingest_file(repo: ProductRepository, file_path, store: str,
+                chunk_size: int = DEFAULT_CHUNK_SIZE, vectorized: bool = True,
+                metrics: RunMetrics | None = None, fp: FileFingerprint | None = None,
+                resume: tuple[int, int] = (0, 0)) -> int:
+    """Insert a file's records; returns rows inserted by this call.
+
+    With its fingerprint `fp`, every chunk commits a checkpoint (see
+    iter_inserted) and the records before resume=(records, rows) (see
+    resume_point) are skipped, so a run that failed part way continues
+    where it stopped instead of inserting the committed chunks again.
+    """
+    chunks = iter_converted_chunks(file_path, store, chunk_size, vectorized, metrics, skip=resume[0])
+    return insert_chunks(repo, chunks, chunk_size, metrics, fp, resume)
+
+def ingest_source(repo: ProductRepository, source: DatasetSource,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE, vectorized: bool = True,
+                  metrics: RunMetrics | None = None, **fetch_options) -> int:
+    """Stream an Apify dataset page by page into clean -> convert -> insert."""
+    pages = iter_dataset_pages(source, get_adapter(source.store).fields, **fetch_options)
+    records = (item for page in pages for item in page)
+    chunks = convert_chunks(iter_chunks(records, chunk_size), source.store, vectorized, metrics)
+    return insert_chunks(repo, chunks, chunk_size, metrics)
+
+def insert_chunks(repo: ProductRepository, chunks, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                  metrics: RunMetrics | None = None, fp: FileFingerprint | None = None,
+                  resume: tuple[int, int] = (0, 0)) -> int:
+    return sum(added for _, _, added in iter_inserted(repo, chunks, chunk_size, metrics, fp, *resume))
+
+def iter_inserted(repo: ProductRepository, chunks, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                  metrics: RunMetrics | None = None, fp: FileFingerprint | None = None,
+                  records: int = 0, rows: int = 0):
+    """
+    Insert converted chunks one at a time, yielding (records, rows, added) after each commit.
+
+    With a file fingerprint, each chunk writes an ingest_progress checkpoint
+    (records and rows of the file consumed so far) in its own transaction,
+    so an interrupted or failed run can resume right after it.
+    """
+    inserted = 0
+    # What the checkpoints cover, so a resume can tell an appended file from a replaced one
+    content_hash = hash_file(fp.path, fp.size) if fp is not None else None
+    for chunk_index, converted in enumerate(chunks):
+        # Conversion is one row per record, so records and rows advance together
+        records, rows = records + len(converted), rows + len(converted)
+        checkpoint = None if fp is None else {"path": fp.path, "records": records, "rows": rows,
+                                              "size": fp.size, "content_hash": content_hash}
+        try:
+            with metrics.stage("insert", rows=len(converted)) if metrics else nullcontext():
+                added = repo.insert_products(converted, chunk_size=chunk_size, checkpoint=checkpoint)
+        except BulkInsertError as e:
+            # Re-number relative to the whole file / dataset
+            raise BulkInsertError(chunk_index, inserted + e.row_offset,
+                                  inserted + e.inserted, e.cause) from e.cause
+        inserted += added
+        yield records, rows, added
+
+def resume_point(manifest: ManifestRepository, fp: FileFingerprint) -> tuple[int, int]:
+    """
+    (records, rows) of the file already committed by earlier runs; (0, 0) to start from the top.
+
+    A file that grew since its checkpoint is taken to be appended to, unless
+    it no longer starts with the bytes the checkpoint was taken over (a file
+    replaced or rewritten in place), which is ingested again as new snapshots.
+    """
+    progress = manifest.progress(fp.path)
+    # A file smaller than at its checkpoint was replaced, not appended to
+    if progress is None or fp.size < progress.size:
+        return 0, 0
+    if hash_file(fp.path, progress.size) != progress.content_hash:
+        return 0, 0
+    return progress.records, progress.rows
+
+def plan_files(files: list[Path], manifest: ManifestRepository, force: bool = False) -> tuple[list[FileTask], int]:
+    """Split dataset files into ingest tasks and a count of unchanged (skipped) files."""
+    entries = manifest.load_all()
+    tasks = []
+    skipped = 0
+
+    for file in files:
+        fp = fingerprint(file)
+        content_hash = None
+        if not force:
+            unchanged, content_hash = is_unchanged(entries.get(fp.path), fp)
+            if unchanged:
+                if content_hash is not None:
+                    # Touched but identical: refresh mtime so next run is a stat only
+                    manifest.record(fp.path, fp.size, fp.mtime, content_hash, entries[fp.path].rows)
+                skipped += 1
+                continue
+        # Continue after the chunks an earlier failed run (or the previous
+        # version of an appended-to file) already committed
+        resume = (0, 0) if force else resume_point(manifest, fp)
+        tasks.append(FileTask(fp, infer_store_from_filename(file.name), content_hash, resume))
+
+    return tasks, skipped
+
+def refresh_forecasts(refit: bool = False, metrics: RunMetrics | None = None):
+    db = SessionLocal()
+    start = time.perf_counter()
+    with metrics.stage("forecast") if metrics else nullcontext():
+        updated = ProductRepository(db).refresh_forecasts(refit=refit)
+    db.close()
+    print(f" {'Refit' if refit else 'Updated'} forecasts for {updated} series in {time.perf_counter() - start:.1f}s")
+
+def run_pipeline_on_dataset_folder(dataset_dir: str, vectorized: bool = True,
+                                   chunk_size: int = DEFAULT_CHUNK_SIZE, force: bool = False,
+                                   workers: int = 0, refit_forecasts: bool = False,
+                                   alerts: AlertStage | None = None,
+                                   archive: ParquetArchive | None = None,
+                                   matching: bool = False,
+                                   metrics: RunMetrics | None = None):
     dataset_path = Path(dataset_dir)
+    metrics = metrics or RunMetrics()
 
     db = SessionLocal()
-    repo = ProductRepository(db)
+    repo = ProductRepository(db, alerts=alerts, archive=archive, matching=matching)
+    manifest = ManifestRepository(db)
+    tasks, skipped = plan_files(dataset_files(dataset_path), manifest, force)
 
-    for file in dataset_path.glob("*.json"):
-        store = infer_store_from_filename(file.name)
-        print(f"\n Processing {file.name} ({store})")
+    if workers and tasks:
+        # The writer process owns the DB from here on
+        db.close()
+        print(f"\n Processing {len(tasks)} files with {workers} workers")
+        summary = run_parallel(tasks, workers, chunk_size, vectorized, alerts=alerts, archive=archive,
+                               matching=matching)
+        metrics.merge(summary["metrics"])
+        for task in tasks:
+            path = task.fingerprint.path
+            if path in summary["failed"]:
+                print(f"❌ {Path(path).name}: {summary['failed'][path]}")
+                metrics.record_file(path, task.store, "failed", summary["inserted"].get(path, 0),
+                                    summary["failed"][path])
+            else:
+                metrics.record_file(path, task.store, "ingested", summary["inserted"].get(path, 0))
+        print(f" Inserted {sum(summary['inserted'].values())} records")
+    else:
+        for task in tasks:
+            file = Path(task.fingerprint.path)
+            print(f"\n Processing {file.name} ({task.store})")
 
-        raw_data = load_json(file)
-        cleaned = clean_all(raw_data, store)
-        converted = [convert_row(item) for item in cleaned]
+            fp = task.fingerprint
+            content_hash = task.content_hash or hash_file(file)
+            if task.resume[0]:
+                print(f" Resuming after {task.resume[0]} records already ingested")
+            try:
+                inserted = ingest_file(repo, file, task.store, chunk_size, vectorized, metrics, fp, task.resume)
+            except BulkInsertError as e:
+                print(f"❌ {file.name}: {e}")
+                metrics.record_file(file, task.store, "failed", e.inserted, str(e))
+                continue
+            manifest.record(fp.path, fp.size, fp.mtime, content_hash, task.resume[1] + inserted)
+            metrics.record_file(file, task.store, "ingested", inserted)
+            print(f" Inserted {inserted} records")
 
-        repo.insert_products(converted)
-        print(f" Inserted {len(converted)} records")
+    metrics.skipped += skipped
+    if skipped:
+        print(f"\n Skipped {skipped} unchanged files (use --force to re-ingest)")
 
     db.close()
 
-def run_pipeline(file_path: str, store: str):
-    print(f"Loading raw data from: {file_path}")
-    raw_data = load_json(file_path)
+    # Forecasts only change when new snapshots arrived
+    if tasks or refit_forecasts:
+        refresh_forecasts(refit=refit_forecasts, metrics=metrics)
 
-    print(f"Cleaning data for store: {store}")
-    cleaned = clean_all(raw_data, store)
+    metrics.finish()
+    return metrics
 
-    print("Converting units and computing price_per_unit")
-    converted = [convert_row(item) for item in cleaned]
+def run_pipeline_on_apify(sources: list[DatasetSource], token: str | None = None,
+                          base_url: str = APIFY_API, vectorized: bool = True,
+                          chunk_size: int = DEFAULT_CHUNK_SIZE, force: bool = False,
+                          refit_forecasts: bool = False, alerts: AlertStage | None = None,
+                          archive: ParquetArchive | None = None, matching: bool = False,
+                          metrics: RunMetrics | None = None, **fetch_options):
+    """Ingest Apify datasets straight from the API; datasets already in the manifest are skipped."""
+    metrics = metrics or RunMetrics()
+    fetch_options = dict(fetch_options, token=token, base_url=base_url)
+
+    db = SessionLocal()
+    repo = ProductRepository(db, alerts=alerts, archive=archive, matching=matching)
+    manifest = ManifestRepository(db)
+    entries = manifest.load_all()
+
+    ingested = 0
+    with metrics.stage("fetch"):
+        sources = resolve_sources(sources, **fetch_options)
+    for source in sources:
+        if source.label in entries and not force:
+            metrics.skipped += 1
+            print(f"\n Skipping {source.label} ({source.store}): already ingested (use --force to re-ingest)")
+            continue
+
+        print(f"\n Fetching {source.label} ({source.store})")
+        try:
+            inserted = ingest_source(repo, source, chunk_size, vectorized, metrics, **fetch_options)
+        except (BulkInsertError, FetchError) as e:
+            print(f"❌ {source.label}: {e}")
+            metrics.record_file(source.label, source.store, "failed", getattr(e, "inserted", 0), str(e))
+            continue
+        # Datasets of finished runs are immutable: the item count is enough of a fingerprint
+        manifest.record(source.label, inserted, 0.0, None, inserted)
+        metrics.record_file(source.label, source.store, "ingested", inserted)
+        ingested += 1
+        print(f" Inserted {inserted} records")
+
+    db.close()
+
+    if ingested or refit_forecasts:
+        refresh_forecasts(refit=refit_forecasts, metrics=metrics)
+
+    metrics.finish()
+    return metrics
+
+def print_stage_summary(metrics: RunMetrics):
+    report = metrics.to_dict()
+    print(f"\n{'stage':<10} {'wall s':>9} {'cpu s':>9} {'rows':>10} {'rows/s':>11}")
+    for name, stage in report["stages"].items():
+        print(f"{name:<10} {stage['wall_seconds']:>9.3f} {stage['cpu_seconds']:>9.3f} "
+              f"{stage['rows']:>10} {stage['rows_per_sec'] or 0:>11.0f}")
+    statuses = ", ".join(f"{k}={v}" for k, v in sorted(report["price_per_unit_status"].items()))
+    if statuses:
+        print(f" price_per_unit_status: {statuses}")
+    if report["unparsed_units"]["count"]:
+        print(f" {report['unparsed_units']['count']} rows with an unparsed unit, e.g. "
+              f"{report['unparsed_units']['sample'][0]['title']!r}")
+
+def run_pipeline(file_path: str, store: str, vectorized: bool = True,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE):
+    print(f"Streaming {file_path} ({store}) in chunks of {chunk_size}")
 
-    print(f"Inserting {len(converted)} items into DB...")
     db = SessionLocal()
     repo = ProductRepository(db)
-    repo.insert_products(converted)
+    inserted = ingest_file(repo, file_path, store, chunk_size, vectorized)
     db.close()
 
-    print("Done!")
+    print(f"Done! Inserted {inserted} items into DB")
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python run_ingest_pipeline.py <dataset_folder>")
-    else:
-        run_pipeline_on_dataset_folder(sys.argv[1])
+    parser = argparse.ArgumentParser(description="Ingest Apify dataset files into the DB.")
+    parser.add_argument("dataset_folder", nargs="?",
+                        help="folder of downloaded dataset dumps (optional with --apify)")
+    parser.add_argument("--force", action="store_true",
+                        help="re-ingest files even if the manifest says they are unchanged")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="parse/convert files in N processes with a single DB writer (0 = serial)")
+    parser.add_argument("--rebuild-latest", action="store_true",
+                        help="recompute the latest_prices table from the full history first")
+    parser.add_argument("--rebuild-rollups", action="store_true",
+                        help="recompute the day/week price rollups from the full history first")
+    parser.add_argument("--rebuild-categories", action="store_true",
+                        help="reclassify every stored title (after changing transformers/categories.py) first")
+    parser.add_argument("--match-products", action="store_true",
+                        help="match new products into cross-store clusters as they are ingested")
+    parser.add_argument("--rebuild-matches", action="store_true",
+                        help="recompute every cross-store match cluster from latest_prices first")
+    parser.add_argument("--refit-forecasts", action="store_true",
+                        help="refit every price forecast from its full history instead of updating it")
+    parser.add_argument("--watchlist",
+                        help="JSON list of price-drop rules; matching drops are written as alerts")
+    parser.add_argument("--alerts-jsonl",
+                        help="append alerts to this JSON Lines file instead of the alert_outbox table")
+    parser.add_argument("--apify", metavar="STORE=DATASET", action="append", default=[],
+                        help="fetch a dataset from the Apify API instead of a folder, e.g. "
+                             "amazon=<datasetId> or target=actor:<actorId> (last run); repeatable")
+    parser.add_argument("--apify-url", default=os.environ.get("APIFY_API_URL", APIFY_API),
+                        help="Apify API base URL (a local stand-in server when testing)")
+    parser.add_argument("--fetch-concurrency", type=int, default=4,
+                        help="dataset pages in flight per Apify dataset")
+    parser.add_argument("--fetch-rate", type=float, default=20.0,
+                        help="max Apify requests per second")
+    parser.add_argument("--archive", metavar="DIR",
+                        help="also append ingested rows to a Parquet archive (store/scrape_date partitions)")
+    parser.add_argument("--backfill-archive", action="store_true",
+                        help="write the existing products history to --archive first")
+    parser.add_argument("--compact-archive", action="store_true",
+                        help="merge each archive partition's files into one after ingesting")
+    parser.add_argument("--report-json", metavar="PATH",
+                        help="write a JSON run report (stage timings, status counts, unparsed units)")
+    parser.add_argument("--prom-textfile", metavar="PATH",
+                        help="write run metrics for the Prometheus node_exporter textfile collector")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="run under cProfile and save the stats to PATH")
+    args = parser.parse_args()
+    if not args.dataset_folder and not args.apify:
+        parser.error("give a dataset_folder and/or --apify sources")
+    try:
+        sources = [parse_source(spec) for spec in args.apify]
+        for source in sources:
+            get_adapter(source.store)
+    except ValueError as e:
+        parser.error(str(e))
+
+    alerts = None
+    if args.watchlist:
+        sink = JsonlSink(args.alerts_jsonl) if args.alerts_jsonl else OutboxSink()
+        alerts = AlertStage(load_watchlist(args.watchlist), sink)
+
+    archive = ParquetArchive(args.archive) if args.archive else None
+    if (args.backfill_archive or args.compact_archive) and not archive:
+        parser.error("--backfill-archive/--compact-archive need --archive DIR")
+    if args.backfill_archive:
+        db = SessionLocal()
+        print(f"Archived {ProductRepository(db, archive=archive).export_archive()} history rows to {args.archive}")
+        db.close()
+
+    if args.rebuild_latest or args.rebuild_rollups or args.rebuild_categories or args.rebuild_matches:
+        db = SessionLocal()
+        repo = ProductRepository(db)
+        if args.rebuild_latest:
+            print(f"Rebuilt latest prices for {repo.rebuild_latest_prices()} products")
+        if args.rebuild_rollups:
+            print(f"Rebuilt {repo.rebuild_price_rollups()} price rollup buckets")
+        if args.rebuild_categories:
+            print(f"Rebuilt categories: {repo.rebuild_categories()} rows changed")
+        if args.rebuild_matches:
+            print(f"Rebuilt product matches: {repo.rebuild_matches()} clusters span 2+ stores")
+        db.close()
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+    metrics = RunMetrics()
+    if sources:
+        # APIFY_TOKEN stays out of argv (and so out of `ps` output)
+        run_pipeline_on_apify(sources, os.environ.get("APIFY_TOKEN"), args.apify_url,
+                              force=args.force, refit_forecasts=args.refit_forecasts and not args.dataset_folder,
+                              alerts=alerts, archive=archive, matching=args.match_products, metrics=metrics,
+                              concurrency=args.fetch_concurrency, rate=args.fetch_rate)
+    if args.dataset_folder:
+        metrics = run_pipeline_on_dataset_folder(args.dataset_folder, force=args.force, workers=args.workers,
+                                                 refit_forecasts=args.refit_forecasts, alerts=alerts,
+                                                 archive=archive, matching=args.match_products,
+                                                 metrics=metrics)
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+
+    if args.compact_archive:
+        print(f"Compacted {archive.compact()} archive partitions")
 
+    print_stage_summary(metrics)
+    if args.report_json:
+        metrics.write_json(args.report_json)
+    if args.prom_textfile:
+        metrics.write_prometheus(args.prom_textfile)
@@ -0,0 +1,229 @@
+# scripts/stress_concurrency.py
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+'''
+    Dashboard read latency while ingest is writing (see db.concurrency).
+
+    For each mode, against a throwaway SQLite DB seeded with --products
+    synthetic products: an ingest process re-inserts the catalog with moved
+    prices in --chunk-size transactions for --duration seconds, while
+    --readers threads replay the dashboard's cache-miss loads (one session
+    per loader, like app.run_query) over the busiest categories.
+
+        delete     rollback journal, readers share the writer's engine, no retries
+        wal        WAL, readers share the writer's engine, no retries
+        snapshot   WAL, readers use ReadSessionLocal, writer retries on locks
+
+    Reported per mode: p50 / p95 / p99 / max read latency, reads/s, reads
+    that failed with a lock error, "torn" reads (a ranking summary whose
+    session saw the data version change under it), ingest rows/s, the
+    writer's transaction p50 / p99 and its lock retries / failed chunks.
+
+        python scripts/stress_concurrency.py --readers 8 --duration 30
+'''
+
+PRODUCTS = 20_000
+READERS = 4
+DURATION = 20.0
+CHUNK_SIZE = 2000
+# Categories the readers cycle through (the largest ones)
+CATEGORIES = 4
+MODES = {
+    # name: (journal mode, readers' session factory in db.session, writer retries)
+    "delete": ("DELETE", "SessionLocal", False),
+    "wal": ("WAL", "SessionLocal", False),
+    "snapshot": ("WAL", "ReadSessionLocal", True),
+}
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def latency_summary(prefix: str, seconds: list[float]) -> dict:
+    return {f"{prefix}_{name}_ms": round(percentile(seconds, q) * 1000, 1) if seconds else None
+            for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99), ("max", 1.0))}
+
+
+def run_ingest(products: int, duration: float, chunk_size: int, retry: bool, seed: int):
+    """Ingest role: insert re-priced copies of the catalog, one transaction per chunk, for `duration` seconds."""
+    from db.concurrency import RetryPolicy
+    from db.repository import BulkInsertError, ProductRepository
+    from db.session import SessionLocal
+    from scripts.bench_archive import catalog_rows
+
+    catalog = catalog_rows(products, seed)
+    rng = random.Random(seed + 1)
+    db = SessionLocal()
+    repo = ProductRepository(db, retry=RetryPolicy() if retry else RetryPolicy(attempts=1))
+    print("ready", flush=True)
+
+    written, failed, commits = 0, 0, []
+    start = time.perf_counter()
+    deadline = start + duration
+    while time.perf_counter() < deadline:
+        for row in catalog:
+            if rng.random() < 0.1:
+                row["price"] = round(row["price"] * rng.uniform(0.9, 1.1), 2)
+                qty = row["normalized_unit_qty"]
+                row["price_per_unit"] = row["price"] / qty if qty else None
+        for offset in range(0, len(catalog), chunk_size):
+            if time.perf_counter() >= deadline:
+                break
+            chunk = catalog[offset:offset + chunk_size]
+            began = time.perf_counter()
+            try:
+                written += repo.insert_products(chunk, chunk_size=chunk_size)
+                commits.append(time.perf_counter() - began)
+            except BulkInsertError:
+                failed += 1
+    elapsed = time.perf_counter() - start
+    db.close()
+    print(json.dumps({
+        "ingest_rows_per_sec": round(written / elapsed),
+        **latency_summary("write_txn", commits),
+        "write_retries": repo.write_retries,
+        "failed_chunks": failed,
+    }))
+
+
+def run_mode(mode: str, products: int, readers: int, duration: float, chunk_size: int, seed: int) -> dict:
+    import db.session
+    from db.concurrency import is_busy_error
+    from db.repository import ProductRepository
+    from scripts.bench_archive import catalog_rows
+
+    _, factory_name, retry = MODES[mode]
+    seed_db = db.session.SessionLocal()
+    seed_repo = ProductRepository(seed_db)
+    seed_repo.insert_products(catalog_rows(products, seed))
+    seed_repo.refresh_forecasts()
+    categories = [row["category"] for row in seed_repo.get_categories()[:CATEGORIES]]
+    journal = seed_db.connection().exec_driver_sql("PRAGMA journal_mode").scalar()
+    seed_db.close()
+
+    command = [sys.executable, __file__, "--ingest", "--products", str(products), "--duration", str(duration),
+               "--chunk-size", str(chunk_size), "--seed", str(seed)] + (["--retry"] if retry else [])
+    ingest = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    if ingest.stdout.readline().strip() != "ready":
+        raise RuntimeError(f"ingest process failed to start (code {ingest.wait()})")
+
+    factory = getattr(db.session, factory_name)
+    loaders = [
+        lambda repo, category: repo.get_data_version(),
+        lambda repo, category: repo.get_ranking_page(category, limit=10),
+        lambda repo, category: repo.get_price_history(category, resolution="day"),
+        lambda repo, category: repo.get_price_forecast(category),
+    ]
+    latencies, stats, lock = [], {"errors": 0, "torn": 0, "summaries": 0}, threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def summary_load(repo, category):
+        # Several queries in one session: did the data change between them?
+        before = repo.get_data_version()
+        repo.get_ranking_summary(category)
+        torn = repo.get_data_version() != before
+        with lock:
+            stats["summaries"] += 1
+            stats["torn"] += torn
+
+    def reader(index: int):
+        rng = random.Random(seed + 100 + index)
+        while time.perf_counter() < deadline:
+            category = rng.choice(categories)
+            for load in [summary_load, *loaders]:
+                session = factory()
+                began = time.perf_counter()
+                try:
+                    load(ProductRepository(session), category)
+                    elapsed = time.perf_counter() - began
+                    with lock:
+                        latencies.append(elapsed)
+                except Exception as e:
+                    if not is_busy_error(e):
+                        raise
+                    with lock:
+                        stats["errors"] += 1
+                finally:
+                    session.close()
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    out, _ = ingest.communicate()
+    if ingest.returncode:
+        raise RuntimeError(f"ingest process exited with code {ingest.returncode}")
+
+    return {
+        "mode": mode,
+        "journal_mode": journal,
+        "reads": len(latencies),
+        "reads_per_sec": round(len(latencies) / duration, 1),
+        **latency_summary("read", latencies),
+        "read_lock_errors": stats["errors"],
+        "torn_summaries": stats["torn"],
+        **json.loads(out.strip().splitlines()[-1]),
+    }
+
+
+def run_child(mode: str, args) -> dict:
+    journal_mode = MODES[mode][0]
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DB_URL=f"sqlite:///{Path(tmp) / 'stress.db'}", DB_SQLITE_JOURNAL_MODE=journal_mode)
+        env.pop("DB_READ_URL", None)
+        command = [sys.executable, __file__, "--child", mode, "--products", str(args.products),
+                   "--readers", str(args.readers), "--duration", str(args.duration),
+                   "--chunk-size", str(args.chunk_size), "--seed", str(args.seed)]
+        out = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress dashboard reads against a concurrent ingest.")
+    parser.add_argument("--products", type=int, default=PRODUCTS)
+    parser.add_argument("--readers", type=int, default=READERS, help=f"Dashboard reader threads (default: {READERS})")
+    parser.add_argument("--duration", type=float, default=DURATION, help="Seconds per mode")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Rows per ingest transaction")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--child", choices=list(MODES), help=argparse.SUPPRESS)
+    parser.add_argument("--ingest", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--retry", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.ingest:
+        run_ingest(args.products, args.duration, args.chunk_size, args.retry, args.seed)
+        return
+    if args.child:
+        result = run_mode(args.child, args.products, args.readers, args.duration, args.chunk_size, args.seed)
+        print(json.dumps(result))
+        return
+
+    results = [run_child(mode, args) for mode in args.modes]
+    print(f"{args.products} products, {args.readers} readers, {args.duration:g}s per mode, "
+          f"ingest chunks of {args.chunk_size} rows\n")
+    print(f"{'':<22}" + "".join(f"{r['mode']:>12}" for r in results))
+    for key in results[0]:
+        if key != "mode":
+            print(f"{key:<22}" + "".join(f"{str(r[key]):>12}" for r in results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# scripts/synthetic_data.py
+import argparse
+import json
+import random
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+'''
+    Synthetic Apify-shaped dumps for benchmarks.
+
+    Records mimic the three scrapers in dataset/ (Amazon crawler, Target search
+    scraper, Walmart detail scraper, including Walmart's flat "priceInfo.price"
+    key) with titles that exercise every unit format the converter knows:
+    "12 x 1000 sheets", "40 pack of 16.9 oz", "1,000 Sheets", "2 kg", and titles
+    with no unit at all.
+
+    Generation is deterministic per seed and streams, so 10^7 records never sit
+    in memory. A catalog of distinct products is drawn first and snapshots cycle
+    through it, so the same product shows up with drifting prices the way
+    repeated scrapes do.
+'''
+
+STORES = ("amazon", "target", "walmart")
+# Distinct products drawn by default; bigger runs repeat them as snapshots
+MAX_PRODUCTS = 200_000
+
+CATEGORIES = {
+    "Toilet Paper": ("rolls", (6, 12, 24, 30, 36), ("sheets", (200, 264, 308, 1000))),
+    "Paper Towel": ("rolls", (2, 6, 8, 12), ("sheets", (52, 110, 138, 165))),
+    "Protein Bar": ("bars", (5, 12, 15, 20), ("oz", (1.76, 2.12, 2.4))),
+    "Chicken Breast": ("oz", (16, 22, 32, 40, 48), ("g", (454, 907, 1361))),
+    "Sparkling Water": ("fl oz", (12, 16.9, 33.8), ("ml", (355, 500, 1000))),
+    "Dishwasher Tablets": ("tablets", (25, 48, 62, 90), ("count", (25, 48, 62, 90))),
+}
+BRANDS = ("Amazon Basics", "Great Value", "up&up", "Charmin", "Bounty", "Kirkland", "Perdue", "Quest", "LaCroix", "Cascade")
+ADJECTIVES = ("Ultra Soft", "Mega", "Family Size", "Original", "Strong", "Organic", "Lightly Breaded", "Zero Sugar", "Value Pack")
+
+
+def unit_phrase(rng: random.Random, category: str) -> str | None:
+    """One of the title unit formats seen in the real dumps."""
+    unit, sizes, (inner_unit, inner_sizes) = CATEGORIES[category]
+    outer = rng.choice(sizes)
+    inner = rng.choice(inner_sizes)
+    style = rng.random()
+    if style < 0.3:
+        return f"{outer} {unit.title()}"
+    if style < 0.45:
+        return f"{rng.randint(2, 12)} x {inner:,} {inner_unit}"
+    if style < 0.6:
+        return f"{rng.randint(2, 40)} pack of {inner} {inner_unit}"
+    if style < 0.7:
+        return f"{outer} {unit}, {inner:,} {inner_unit.title()} per {unit.rstrip('s')}"
+    if style < 0.78:
+        return f"{rng.choice((1, 2, 3))} kg" if inner_unit == "g" else f"{inner:,}{inner_unit}"
+    if style < 0.9:
+        return f"{outer}ct"
+    return None
+
+
+def make_product(rng: random.Random, index: int) -> dict:
+    category = rng.choice(list(CATEGORIES))
+    units = unit_phrase(rng, category)
+    title = f"{rng.choice(BRANDS)} {rng.choice(ADJECTIVES)} {category}"
+    if units:
+        title += f", {units}"
+    return {
+        "index": index,
+        "store": STORES[index % len(STORES)],
+        "title": title,
+        "category": category,
+        "price": round(rng.uniform(2.5, 45.0), 2),
+    }
+
+
+def to_record(product: dict, price: float | None) -> dict:
+    """Shape a catalog product as its store's scraper would."""
+    i = product["index"]
+    title = product["title"]
+    if product["store"] == "amazon":
+        asin = f"B{i:09d}"
+        return {
+            "title": title,
+            "asin": asin,
+            "brand": title.split(" ")[0],
+            "stars": "4.5",
+            "reviewsCount": str(100 + i % 90000),
+            "breadCrumbs": f"Health & Household > {product['category']}",
+            "description": f"Product Description {title}. " * 4,
+            "price": None if price is None else {"value": price, "currency": "$"},
+            "url": f"https://www.amazon.com/dp/{asin}",
+        }
+    if product["store"] == "target":
+        tcin = str(10_000_000 + i)
+        slug = "-".join(title.lower().replace(",", "").split())
+        return {
+            "url": "https://www.target.com/s",
+            "title": title,
+            "tcin": tcin,
+            "price": None if price is None else {"current_retail": price, "formatted_current_price": f"${price:.2f}"},
+            "rating_score": "4.3",
+            "buy_url": f"https://www.target.com/p/{slug}/-/A-{tcin}",
+            "product_classification": {"item_type": {"name": product["category"]}},
+        }
+    return {
+        "availability": "IN_STOCK",
+        "priceInfo.price": None if price is None else f"${price:.2f}",
+        "name": title,
+        "averageRating": "4.5",
+        "sellerName": "Walmart.com",
+    }
+
+
+def iter_records(rows: int, seed: int = 0, products: int | None = None) -> Iterator[tuple[str, dict]]:
+    """Yield (store, record) pairs, cycling through `products` distinct products."""
+    rng = random.Random(seed)
+    products = products or min(max(rows // 4, 1), MAX_PRODUCTS)
+    catalog = [make_product(rng, i) for i in range(products)]
+
+    for n in range(rows):
+        product = catalog[n % len(catalog)]
+        # Prices drift between snapshots; a few are missing like in real scrapes
+        price = None if rng.random() < 0.02 else round(product["price"] * rng.uniform(0.97, 1.03), 2)
+        yield product["store"], to_record(product, price)
+
+
+def generate(rows: int, seed: int = 0) -> dict[str, list[dict]]:
+    """In-memory records per store (for benchmarks at modest sizes)."""
+    by_store = {store: [] for store in STORES}
+    for store, record in iter_records(rows, seed):
+        by_store[store].append(record)
+    return by_store
+
+
+def write_dumps(out_dir: str | Path, rows: int, seed: int = 0, jsonl: bool = False) -> list[Path]:
+    """Stream `rows` records into one dump per store, named like the Apify files."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    names = {
+        "amazon": "dataset_Amazon-crawler",
+        "target": "dataset_target-product-search-scraper",
+        "walmart": "dataset_walmart-product-detail-scraper",
+    }
+    suffix = "jsonl" if jsonl else "json"
+    paths = {store: out_dir / f"{names[store]}_synthetic_{stamp}.{suffix}" for store in STORES}
+    files = {store: open(path, "w", encoding="utf-8") for store, path in paths.items()}
+    first = {store: True for store in STORES}
+    try:
+        if not jsonl:
+            for f in files.values():
+                f.write("[")
+        for store, record in iter_records(rows, seed):
+            f = files[store]
+            if jsonl:
+                f.write(json.dumps(record) + "\n")
+            else:
+                f.write(("" if first[store] else ",\n") + json.dumps(record))
+                first[store] = False
+        if not jsonl:
+            for f in files.values():
+                f.write("]")
+    finally:
+        for f in files.values():
+            f.close()
+    return list(paths.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic Amazon/Target/Walmart dumps.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--rows", type=int, default=10_000, help="total records across the three stores")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--jsonl", action="store_true", help="write JSON Lines instead of JSON arrays")
+    args = parser.parse_args()
+
+    for path in write_dumps(args.out_dir, args.rows, args.seed, args.jsonl):
+        print(f"{path} ({path.stat().st_size / 1024 / 1024:.1f} MB)")
@@ -0,0 +1,106 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Dict, Iterable
+import html
+import re
+
+'''
+    Product categories assigned once per title at ingest time.
+
+    Each category is a rule: compiled include patterns (any may match) and
+    exclude patterns (none may match), tried in registration order, first
+    match wins. Titles that match no rule get category None.
+
+    The category is stored on every products / latest_prices row, so the
+    dashboard selects a category with an indexed equality lookup instead of
+    substring-scanning titles. Adding a category means registering a rule
+    and rebuilding stored categories (run_ingest_pipeline --rebuild-categories):
+
+        register_category(CategoryRule("Dish Soap", include=(r"dish(washing)? (soap|liquid)",)))
+'''
+
+
+@dataclass(frozen=True)
+class CategoryRule:
+    name: str                                   # stored value and dashboard label
+    include: tuple[str, ...]                    # regexes over the lower-cased title
+    exclude: tuple[str, ...] = ()
+    _include: re.Pattern = field(init=False, repr=False, compare=False)
+    _exclude: re.Pattern | None = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # One alternation per side, compiled once
+        object.__setattr__(self, "_include", re.compile("|".join(f"(?:{p})" for p in self.include)))
+        object.__setattr__(self, "_exclude",
+                           re.compile("|".join(f"(?:{p})" for p in self.exclude)) if self.exclude else None)
+
+    def matches(self, text: str) -> bool:
+        return self._include.search(text) is not None and (self._exclude is None or self._exclude.search(text) is None)
+
+
+CATEGORIES: Dict[str, CategoryRule] = {}
+# lower-cased name -> registered name, for case-insensitive lookups
+_CANONICAL: Dict[str, str] = {}
+
+
+def register_category(rule: CategoryRule) -> CategoryRule:
+    CATEGORIES[rule.name] = rule
+    _CANONICAL[rule.name.lower()] = rule.name
+    return rule
+
+
+def canonical_category(name: str) -> str:
+    """The registered spelling of a category name ("toilet paper" -> "Toilet Paper"); unknown names pass through."""
+    return _CANONICAL.get(name.strip().lower(), name)
+
+
+def classify_title(title: str | None) -> str | None:
+    if not title:
+        return None
+    text = (html.unescape(title) if "&" in title else title).lower()
+    for rule in CATEGORIES.values():
+        if rule.matches(text):
+            return rule.name
+    return None
+
+
+def classify_rows(rows: Iterable[dict]) -> None:
+    """Set row["category"] from row["title"], in place."""
+    for row in rows:
+        row["category"] = classify_title(row.get("title"))
+
+
+_NOT_PAPER = (r"\breusable\b", r"\bwashable\b", r"\bholders?\b", r"\bstand\b", r"\bcloth (roll|napkin)s?\b")
+
+register_category(CategoryRule(
+    "Toilet Paper",
+    include=(r"\btoilet (paper|tissue)\b", r"\bbath tissue\b"),
+    exclude=_NOT_PAPER,
+))
+register_category(CategoryRule(
+    "Paper Towel",
+    include=(r"\bpaper[ -]towels?\b", r"\b(multifold|hand) towels?\b", r"\bhand towel rolls?\b"),
+    exclude=_NOT_PAPER,
+))
+register_category(CategoryRule(
+    "Protein Bar",
+    include=(r"\bprotein\b.*\bbars?\b", r"\bbars?\b.*\bprotein\b", r"\bnutrition bars?\b"),
+    exclude=(r"\bpowder\b", r"\bshakes?\b", r"\bcereal\b"),
+))
+register_category(CategoryRule(
+    "Chicken Breast",
+    include=(r"\bchicken breasts?\b", r"\bchicken (breast )?(tenderloins?|fillets?|cutlets?)\b"),
+    exclude=(r"\bin water\b", r"\bcanned\b", r"\blunch meat\b", r"\bdeli\b", r"\bbroth\b", r"\bsoup\b",
+             r"\b(dog|cat|pet)s?\b", r"\bseasoning\b"),
+))
+register_category(CategoryRule(
+    "Sparkling Water",
+    include=(r"\bsparkling (mineral |spring )?water\b", r"\bseltzer\b", r"\bcarbonated water\b"),
+    exclude=(r"\bmakers?\b", r"\bmachines?\b", r"\bsyrups?\b", r"\bco2\b"),
+))
+register_category(CategoryRule(
+    "Dishwasher Tablets",
+    include=(r"\bdishwasher (detergent )?(tablets|pods|pacs|packs|tabs)\b", r"\bdish(washer)? (pods|tablets)\b",
+             r"\bactionpacs?\b"),
+    exclude=(r"\bcleaner\b", r"\brinse aid\b", r"\bsalt\b"),
+))
@@ -1,7 +1,24 @@
 from __future__ import annotations
-from typing import List, Dict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List
 import re
 
+'''
+    Store adapters: one per retailer, each turning a raw scraped record into
+    the common row shape (title, price, unit, store, url).
+
+    An adapter also declares the raw top-level fields its cleaner reads, so
+    readers can project records down to those fields (dropping descriptions,
+    reviews and images early) and the Apify fetcher can ask the API for only
+    those fields. The adapter is resolved once per batch, not per record.
+
+    Adding a retailer means writing its clean function and registering it:
+
+        register_adapter(StoreAdapter("costco", clean_costco,
+                                      fields=("name", "price", "url"),
+                                      filename_hints=("costco",)))
+'''
+
 
 def clean_amazon(item: dict) -> dict:
     # price field can be None (explicit null) in some datasets; guard against that
@@ -32,12 +49,13 @@ def clean_target(item: dict) -> dict:
 
 def clean_walmart(item: dict) -> dict:
     title = item.get("name")
-    # priceInfo may be missing or price may be None
-    price_info = item.get("priceInfo") or {}
-    price_str = price_info.get("price") or "$0"
+    # Apify exports flatten priceInfo to a "priceInfo.price" key; older dumps nest it
+    price_str = item.get("priceInfo.price")
+    if price_str is None:
+        price_str = (item.get("priceInfo") or {}).get("price")
     try:
-        price = float(str(price_str).replace("$", ""))
-    except (ValueError, TypeError):
+        price = float(str(price_str).replace("$", "").replace(",", "")) if price_str is not None else None
+    except ValueError:
         price = None
     unit = extract_unit(title)
     return {
@@ -45,25 +63,71 @@ def clean_walmart(item: dict) -> dict:
         "price": price,
         "unit": unit,
         "store": "Walmart",
-        "url": None  # optional, depends if URL is scraped
+        "url": item.get("url")
     }
 
 
+# Match things like "12 rolls", "1000 sheets", "20 bars", etc.
+UNIT_PATTERN = re.compile(r"(\d+(,\d+)?\s*(rolls|bars|count|sheets|packs|tablets|oz|ml|ct))")
+
+
 def extract_unit(text: str | None) -> str | None:
     if not text:
         return None
-    # Match things like "12 rolls", "1000 sheets", "20 bars", etc.
-    match = re.search(r"(\d+(,\d+)?\s*(rolls|bars|count|sheets|packs|tablets|oz|ml|ct))", text.lower())
+    match = UNIT_PATTERN.search(text.lower())
     return match.group(0) if match else None
 
 
-def clean_all(raw_data: List[dict], store: str) -> List[dict]:
-    cleaned = []
+# ---- adapter registry ----
+
+@dataclass(frozen=True)
+class StoreAdapter:
+    name: str                                   # registry key, lower-case ("amazon")
+    clean: Callable[[dict], dict]
+    fields: tuple[str, ...]                     # raw top-level keys `clean` reads
+    filename_hints: tuple[str, ...] = ()        # substrings identifying the store's dump files
+
+    def project(self, item: dict) -> dict:
+        """Keep only the fields this adapter reads."""
+        return {key: item[key] for key in self.fields if key in item}
+
+
+ADAPTERS: Dict[str, StoreAdapter] = {}
+
+
+def register_adapter(adapter: StoreAdapter) -> StoreAdapter:
+    ADAPTERS[adapter.name.lower()] = adapter
+    return adapter
+
+
+def get_adapter(store: str) -> StoreAdapter:
+    try:
+        return ADAPTERS[store.lower()]
+    except KeyError:
+        raise ValueError(f"No store adapter registered for {store!r}; known: {sorted(ADAPTERS)}") from None
+
+
+def adapter_for_filename(filename: str) -> StoreAdapter | None:
+    name = filename.lower()
+    for adapter in ADAPTERS.values():
+        if any(hint in name for hint in adapter.filename_hints):
+            return adapter
+    return None
+
+
+register_adapter(StoreAdapter("amazon", clean_amazon, ("title", "price", "url"), ("amazon",)))
+register_adapter(StoreAdapter("target", clean_target, ("title", "price", "buy_url"), ("target",)))
+register_adapter(StoreAdapter("walmart", clean_walmart, ("name", "priceInfo.price", "priceInfo", "url"),
+                              ("walmart",)))
+
+
+def iter_clean(raw_data: Iterable[dict], store: str) -> Iterator[dict]:
+    """Generator version of clean_all for streamed records."""
+    clean = get_adapter(store).clean
     for item in raw_data:
-        if store.lower() == "amazon":
-            cleaned.append(clean_amazon(item))
-        elif store.lower() == "target":
-            cleaned.append(clean_target(item))
-        elif store.lower() == "walmart":
-            cleaned.append(clean_walmart(item))
-    return cleaned
+        yield clean(item)
+
+
+def clean_all(raw_data: List[dict], store: str) -> List[dict]:
+    clean = get_adapter(store).clean
+    return [clean(item) for item in raw_data]
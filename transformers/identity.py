@@ -0,0 +1,24 @@
+from __future__ import annotations
+import re
+
+'''
+    Stable product identity across scrapes: store + retailer SKU when the URL
+    carries one (Amazon ASIN, Target TCIN), else the URL, else the title.
+'''
+
+SKU_PATTERNS = {
+    "amazon": re.compile(r"/(?:dp|gp/product)/([A-Z0-9]{10})", re.IGNORECASE),
+    "target": re.compile(r"/A-(\d+)"),
+    "walmart": re.compile(r"/ip/(?:[^/]+/)?(\d+)"),
+}
+
+
+def product_key(store: str | None, url: str | None, title: str | None) -> str:
+    store = (store or "").lower()
+    if url:
+        pattern = SKU_PATTERNS.get(store)
+        match = pattern.search(url) if pattern else None
+        if match:
+            return f"{store}:{match.group(1).upper()}"
+        return f"{store}:url:{url.split('?')[0]}"
+    return f"{store}:title:{' '.join((title or '').lower().split())}"
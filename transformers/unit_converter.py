@@ -1,5 +1,9 @@
 from __future__ import annotations
 import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
 
 # Expand:
 # 1. multiple unit parsing, e.g. "5 packs of 6 rolls" or "40 x 16.9 oz"
@@ -24,73 +28,74 @@ UNIT_MAP = {
     "rolls": ("unit", 1)
 }
 
-def parse_unit_text(unit_str: str | None) -> tuple[float | None, str | None]:
-    if not unit_str:
-        return None, None
-
-    unit_str = unit_str.lower()
+# Alternation order matters: at a given position the regex engine tries the
+# units left to right, exactly like the original three-pattern parser did.
+_UNITS = r"oz|fl oz|g|kg|ml|l|count|ct|bars|packs|tablets|sheets|rolls"
+_PACK_UNITS = r"oz|fl oz|g|kg|ml|l|count|ct|bars|tablets|sheets|rolls"
+
+# One grammar, one scan:
+# 1. multi-pack:  24 x 2 oz
+# 2. pack of:     40 pack of 16.9 oz
+# 3. single unit: 1,000 sheets
+# Each alternative sits inside a lookahead so every start position is tested
+# (matches may overlap), and the scan keeps the first hit of each form. The
+# leading character-class lookahead lets the engine skip non-numeric positions.
+UNIT_GRAMMAR = re.compile(
+    r"(?=[\d,.])(?=(?:"
+    rf"(?P<m_outer>\d+)\s*[xX]\s*(?P<m_inner>\d+(?:\.\d+)?)\s*(?P<m_unit>{_UNITS})"
+    rf"|(?P<p_outer>\d+)\s*packs?\s*(?:of)?\s*(?P<p_inner>\d+(?:\.\d+)?)\s*(?P<p_unit>{_PACK_UNITS})"
+    rf"|(?P<s_qty>[\d,.]+)\s*(?P<s_unit>{_UNITS})"
+    r"))"
+)
+
+# Titles repeat heavily across nightly scrapes; keep the hot set in memory.
+PARSE_CACHE_SIZE = 65536
+
+
+def _normalize(quantity: float, raw_unit: str) -> tuple[float, str]:
+    if raw_unit in UNIT_MAP:
+        std_unit, factor = UNIT_MAP[raw_unit]
+        return round(quantity * factor, 2), std_unit
+    return quantity, raw_unit
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_normalized(text: str) -> tuple[float | None, str | None]:
+    pack = None
+    single = None
+    for match in UNIT_GRAMMAR.finditer(text):
+        if match.group("m_unit"):
+            # Multi-pack wins wherever it appears, no need to keep scanning
+            outer = float(match.group("m_outer"))
+            inner = float(match.group("m_inner"))
+            return _normalize(outer * inner, match.group("m_unit"))
+        if match.group("p_unit"):
+            if pack is None:
+                pack = match
+        elif single is None:
+            single = match
+
+    if pack is not None:
+        outer = float(pack.group("p_outer"))
+        inner = float(pack.group("p_inner"))
+        return _normalize(outer * inner, pack.group("p_unit"))
+
+    if single is not None:
+        quantity = float(single.group("s_qty").replace(",", ""))
+        return _normalize(quantity, single.group("s_unit"))
 
-    # ----------------------------
-    # 1 Pattern: 24 x 2 oz
-    # ----------------------------
-    multi_match = re.search(
-        r"(\d+)\s*[xX]\s*(\d+(\.\d+)?)\s*(oz|fl oz|g|kg|ml|l|count|ct|bars|packs|tablets|sheets|rolls)",
-        unit_str
-    )
-
-    if multi_match:
-        outer = float(multi_match.group(1))
-        inner = float(multi_match.group(2))
-        raw_unit = multi_match.group(4)
-
-        total_quantity = outer * inner
-
-        if raw_unit in UNIT_MAP:
-            std_unit, factor = UNIT_MAP[raw_unit]
-            return round(total_quantity * factor, 2), std_unit
-        else:
-            return total_quantity, raw_unit
-
-    # ----------------------------
-    # 2 Pattern: 40 pack of 16.9 oz
-    # ----------------------------
-    pack_match = re.search(
-        r"(\d+)\s*pack[s]?\s*(of)?\s*(\d+(\.\d+)?)\s*(oz|fl oz|g|kg|ml|l|count|ct|bars|tablets|sheets|rolls)",
-        unit_str
-    )
-
-    if pack_match:
-        outer = float(pack_match.group(1))
-        inner = float(pack_match.group(3))
-        raw_unit = pack_match.group(5)
-
-        total_quantity = outer * inner
-
-        if raw_unit in UNIT_MAP:
-            std_unit, factor = UNIT_MAP[raw_unit]
-            return round(total_quantity * factor, 2), std_unit
-        else:
-            return total_quantity, raw_unit
-
-    # ----------------------------
-    # 3 Fallback: single unit
-    # ----------------------------
-    single_match = re.search(
-        r"([\d,.]+)\s*(oz|fl oz|g|kg|ml|l|count|ct|bars|packs|tablets|sheets|rolls)",
-        unit_str
-    )
+    return None, None
 
-    if single_match:
-        quantity = float(single_match.group(1).replace(",", ""))
-        raw_unit = single_match.group(2)
 
-        if raw_unit in UNIT_MAP:
-            std_unit, factor = UNIT_MAP[raw_unit]
-            return round(quantity * factor, 2), std_unit
-        else:
-            return quantity, raw_unit
+def parse_unit_text(unit_str: str | None) -> tuple[float | None, str | None]:
+    """
+    Parse a unit/title string into (normalized quantity, standard unit).
 
-    return None, None
+    Results are memoized on the lowercased, stripped text.
+    """
+    if not unit_str:
+        return None, None
+    return _parse_normalized(unit_str.lower().strip())
 
 
 def convert_row(row: dict) -> dict:
@@ -118,3 +123,130 @@ def convert_row(row: dict) -> dict:
     row["price_per_unit"] = round(price / qty, 3)
     row["price_per_unit_status"] = "OK"
     return row
+
+
+# ----------------------------
+# Batch (DataFrame) conversion
+# ----------------------------
+def _round_like_python(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """
+    np.round() that returns exactly what round(x, ndigits) would.
+
+    NumPy rounds the scaled product, which can land on the other side of a
+    .5 tie than Python's exact decimal rounding. Only values whose scaled
+    fraction sits next to a tie (or that are too large to scale exactly) are
+    re-rounded in Python.
+    """
+    scale = 10.0 ** ndigits
+    scaled = values * scale
+    rounded = np.rint(scaled) / scale
+
+    with np.errstate(invalid="ignore"):
+        frac = np.abs(scaled - np.floor(scaled) - 0.5)
+        suspect = (frac <= 1e-9 * np.maximum(np.abs(scaled), 1.0)) | (np.abs(scaled) >= 2.0 ** 52)
+    suspect &= np.isfinite(values)
+
+    for i in np.flatnonzero(suspect):
+        rounded[i] = round(float(values[i]), ndigits)
+    return rounded
+
+
+def convert_columns(units, prices) -> dict[str, np.ndarray]:
+    """
+    Column-wise convert_row: parse a column of unit strings and a column of
+    prices into normalized_unit_qty, normalized_unit, price_per_unit and
+    price_per_unit_status arrays (object dtype, None where missing).
+
+    Each distinct unit string is parsed once. Non-numeric price columns
+    (object, or pandas' str dtype) follow convert_row exactly; in numeric
+    price columns NaN counts as a missing price, since that is how pandas
+    stores None.
+    """
+    units = pd.Series(units, dtype=object)
+    if not isinstance(prices, pd.Series):
+        # Inferring a dtype would turn a column of strings and None into str / NaN
+        prices = pd.Series(prices, dtype=object)
+    elif not pd.api.types.is_numeric_dtype(prices) and prices.dtype != object:
+        prices = prices.astype(object).where(prices.notna(), None)
+    n = len(units)
+
+    codes, uniques = pd.factorize(units)
+    parsed = [parse_unit_text(u) for u in uniques]
+    # Code -1 (missing unit) indexes the trailing (None, None) entry
+    parsed.append((None, None))
+    qty = np.array([q for q, _ in parsed], dtype=object)[codes]
+    unit = np.array([u for _, u in parsed], dtype=object)[codes]
+    qty_f = np.array([np.nan if q is None else q for q, _ in parsed], dtype=float)[codes]
+
+    if not pd.api.types.is_numeric_dtype(prices):
+        values = prices.to_numpy(dtype=object)
+        # Classify by type once per distinct type, not once per row
+        type_codes, types = pd.factorize(np.array(list(map(type, values)), dtype=object))
+        missing_price = np.array([t is type(None) for t in types], dtype=bool)[type_codes]
+        numeric = np.array([issubclass(t, (int, float)) for t in types], dtype=bool)[type_codes]
+        price_f = np.full(n, np.nan)
+        price_f[numeric] = values[numeric].astype(float)
+    else:
+        price_f = prices.to_numpy(dtype=float, na_value=np.nan)
+        missing_price = np.isnan(price_f)
+        numeric = np.ones(n, dtype=bool)
+
+    missing_qty = np.isnan(qty_f) | (qty_f == 0)
+    ok = ~missing_price & ~missing_qty & numeric
+
+    status = np.full(n, "OK", dtype=object)
+    status[~missing_price & missing_qty] = "missing_or_zero_qty"
+    status[~missing_price & ~missing_qty & ~numeric] = "invalid_price_type"
+    status[missing_price] = "missing_price"
+
+    ppu = np.full(n, None, dtype=object)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ppu[ok] = _round_like_python(price_f[ok] / qty_f[ok], 3)
+
+    return {
+        "normalized_unit_qty": qty,
+        "normalized_unit": unit,
+        "price_per_unit": ppu,
+        "price_per_unit_status": status,
+    }
+
+
+def convert_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Batch version of convert_row for a DataFrame of cleaned records.
+
+    Returns a copy with the four normalized columns appended; build the frame
+    with dtype=object to keep None values identical to convert_row.
+    """
+    units = frame["unit"] if "unit" in frame else [None] * len(frame)
+    prices = frame["price"] if "price" in frame else [None] * len(frame)
+
+    out = frame.copy()
+    for column, values in convert_columns(units, prices).items():
+        out[column] = pd.Series(values, index=out.index, dtype=object)
+    return out
+
+
+def convert_rows(rows: list[dict]) -> list[dict]:
+    """
+    Batch version of convert_row for a list of cleaned dicts.
+
+    Runs the column-wise conversion and writes the results back into the
+    same dicts, so the output is identical to [convert_row(r) for r in rows].
+    """
+    columns = convert_columns(
+        [row.get("unit") for row in rows],
+        [row.get("price") for row in rows],
+    )
+    for row, qty, unit, ppu, status in zip(
+        rows,
+        columns["normalized_unit_qty"].tolist(),
+        columns["normalized_unit"].tolist(),
+        columns["price_per_unit"].tolist(),
+        columns["price_per_unit_status"].tolist(),
+    ):
+        row["normalized_unit_qty"] = qty
+        row["normalized_unit"] = unit
+        row["price_per_unit"] = ppu
+        row["price_per_unit_status"] = status
+    return rows